@@ -1,13 +1,30 @@
-from tally_pandl_export import export_pandl_from_tally
-from ledger_sync import sync_ledgers_from_tally
+from tally_pandl_export import (export_pandl_from_tally, is_tally_running, save_export,
+                                cache_status, cached_pandl, cached_pandl_file, cache_pandl)
+from ledger_sync import sync_ledgers_from_tally, ledger_sync_request, apply_ledger_response, open_local_mapping
+import tally_cache
+import pnl_history
+from tally_client import fetch_many
+from chunked_export import ChunkMerger, split_period, CHUNKS
+from mapping_store import open_mapping_store
+import tally_client
 from merge_header_footer import copy_all_parts
+from tally_xml_stream import parse_tally_xml_stream
+from report_defs import REPORTS
+from stream_renderer import write_body_stream, write_final_pnl_stream
+from excel_writers import WRITERS, writer_available
+from print_renderer import write_final_pnl_html, write_final_pnl_pdf, pdf_available
+from template_cache import as_template, load_template
+import instrumentation as instr
 import xml.etree.ElementTree as ET
-from openpyxl import load_workbook
 from openpyxl.styles import numbers, Alignment
 from openpyxl.utils import get_column_letter
 from copy import copy
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
-import pandas as pd
+import argparse
+import json
+import time
 from pathlib import Path
 
 
@@ -19,12 +36,22 @@ xml_file = base_dir / "exports" / "PandL.xml"
 template_file = base_dir / "config" / "template_kannada.xlsx"
 mapping_file = base_dir / "config" / "ledger_mapping.xlsx"
 output_file = base_dir / "output" / "body_PnL.xlsx"
+header_file = base_dir / "config" / "header_template.xlsx"
+footer_file = base_dir / "config" / "footer_template.xlsx"
+
+RENDERERS = ["classic", "stream", "html", "pdf"]
+PRINT_WRITERS = {"html": write_final_pnl_html, "pdf": write_final_pnl_pdf}   # straight to print, no xlsx
 
 
 # ==========================================================
 # 1️⃣ Parse the Tally P&L XML section-wise
 # ==========================================================
 def parse_tally_xml():
+    """
+    DOM parser: loads the whole export in memory. main() uses the streaming
+    tally_xml_stream.parse_tally_xml_stream instead; kept as the reference
+    implementation for benchmarks.
+    """
     tree = ET.parse(xml_file)
     root = tree.getroot()
 
@@ -67,22 +94,37 @@ def parse_tally_xml():
 # 2️⃣ Translation and filtering
 # ==========================================================
 def load_mapping():
-    mapping_df = pd.read_excel(mapping_file)
-    mapping_df.columns = mapping_df.columns.str.strip()
-    mapping_dict = {
-        str(row["EnglishLedger"]).strip().lower(): str(row["KannadaLedger"]).strip()
-        for _, row in mapping_df.iterrows()
-        if pd.notna(row["EnglishLedger"]) and pd.notna(row["KannadaLedger"])
-    }
+    """Normalised English -> Kannada dict from the mapping store (re-imports the xlsx only if edited)."""
+    with open_mapping_store(mapping_file.with_suffix(".db"), mapping_file) as store:
+        mapping_dict = store.as_dict()
+    instr.count("mappings_loaded", len(mapping_dict))
     return mapping_dict
 
 
-def translate_and_filter(data, mapping_dict):
+def translate_and_filter(data, mapping_dict, aggregate=False, unmapped=None, section="", period=""):
+    """
+    (Kannada name, amount) for every mapped, non-zero line; unmapped ledgers are dropped.
+    aggregate=True (sum ledgers listed more than once) and unmapped (an
+    UnmappedReport that collects what was dropped) go through the columnar
+    path in ledger_frame. Plain translation stays a dict loop: with tuples in
+    and tuples out it is as fast as the columnar path (see bench_translate.py).
+    """
+    if aggregate or unmapped is not None:
+        from ledger_frame import translate_frame  # pandas is only imported when needed
+        translated, missing = translate_frame(data, mapping_dict, aggregate)
+        if unmapped is not None:
+            unmapped.add(missing, section, period)
+        instr.count("ledgers_translated", len(translated))
+        instr.count("ledgers_dropped", len(data) - len(translated))
+        return translated
+
     translated = []
     for name, amt in data:
         key = name.strip().lower()
         if key in mapping_dict and amt != 0:
             translated.append((mapping_dict[key], amt))
+    instr.count("ledgers_translated", len(translated))
+    instr.count("ledgers_dropped", len(data) - len(translated))
     return translated
 
 
@@ -107,6 +149,10 @@ def get_month_year_kn(date=None):
 # ==========================================================
 def copy_style(src, dst):
     if src.has_style:
+        if src.parent.parent is dst.parent.parent:
+            # Same workbook: share the style indices instead of re-registering each attribute
+            dst._style = copy(src._style)
+            return
         dst.font = copy(src.font)
         dst.border = copy(src.border)
         dst.fill = copy(src.fill)
@@ -139,6 +185,9 @@ def insert_data(ws, data, start_row, col_name, col_amt, ref_name, ref_amt, sl_no
     if not data:
         return
 
+    instr.count("rows_rendered", len(data))
+    wrap = _alignment_with_wrap(ref_name)
+    name_style = amt_style = None
     for i, (name_kn, amt) in enumerate(data):
         row = start_row + i
         if sl_no_col is not None and ref_sl is not None:
@@ -149,24 +198,55 @@ def insert_data(ws, data, start_row, col_name, col_amt, ref_name, ref_amt, sl_no
         c1.value = name_kn
         c2 = ws.cell(row, col_amt)
         c2.value = amt
+        if name_style is not None:
+            # Every row after the first ends up with the first row's styles
+            c1._style = copy(name_style)
+            c2._style = copy(amt_style)
+            continue
         copy_style(ref_name, c1)
         copy_style(ref_amt, c2)
-        c1.alignment = _alignment_with_wrap(ref_name)
+        c1.alignment = wrap
         c2.number_format = u'₹ #,##0.00'
+        name_style, amt_style = copy(c1._style), copy(c2._style)
 
 
 # ==========================================================
 # 5️⃣ Generate Kannada P&L Excel body
 # ==========================================================
-def generate_kannada_pnl(income, expense, month_year_kn):
-    wb = load_workbook(template_file)
+def generate_kannada_pnl(income, expense, month_year_kn, template=None, output=None, writer=None):
+    """
+    Fill the body template and save it.
+    template/output: path or binary file object; default to template_file/output_file.
+    writer: None or "openpyxl" fills an openpyxl Workbook cell by cell;
+    "xlsxwriter" streams the same sheet in bulk (see excel_writers).
+    """
+    output = output if output is not None else output_file
+    if writer not in (None, "openpyxl"):
+        write_body_stream(income, expense, month_year_kn, output, template, writer)
+    else:
+        wb = build_kannada_body(income, expense, month_year_kn, template)
+        wb.save(output)
+    target = output if isinstance(output, (str, Path)) else "(in memory)"
+    print(f"✅ Kannada Profit & Loss generated successfully → {target}")
+    print(f"   Income Ledgers: {len(income)} | Expense Ledgers: {len(expense)}")
+
+
+def build_kannada_body(income, expense, month_year_kn, template=None):
+    """
+    Fill the body template in memory and return the Workbook (nothing is saved).
+    template: path, binary file object or CompiledTemplate; the compiled form
+    is cached by template_cache, so the xlsx is only parsed when it changes.
+    """
+    template = template if template is not None else template_file
+    tpl = as_template(template)
+    wb = tpl.to_workbook()
     ws = wb.active
 
     # Replace $$monthYear$$ placeholder
-    for row in ws.iter_rows():
-        for cell in row:
-            if str(cell.value).strip() == "$$monthYear$$":
-                cell.value = month_year_kn
+    for r, c in tpl.placeholders:
+        cell = ws.cell(r, c)
+        if str(cell.value).strip() == "$$monthYear$$":
+            cell.value = month_year_kn
 
     start_row = 2
     sl_no_exp_col, sl_no_inc_col = 1, 4   # A, D
@@ -192,49 +272,543 @@ def generate_kannada_pnl(income, expense, month_year_kn):
                 sl_no_col=sl_no_exp_col, ref_sl=ref_exp_name)
     insert_data(ws, income, start_row, inc_name_col, inc_amt_col, ref_inc_name, ref_inc_amt,
                 sl_no_col=sl_no_inc_col, ref_sl=ref_inc_name)
-
-    wb.save(output_file)
-    print(f"✅ Kannada Profit & Loss generated successfully → {output_file}")
-    print(f"   Income Ledgers: {len(income)} | Expense Ledgers: {len(expense)}")
+    return wb
 
 
 # ==========================================================
 # 6️⃣ Main execution flow
 # ==========================================================
-def main():
+def run_interactive(full_sync=False, renderer="classic", debug=False, refresh=False, offline=False,
+                    chunk=None, aggregate=False, unmapped=None, compare=False, writer=None, incremental=False):
     report_date = None  # month/year for report; set from export "To" date
     print("Step 1: Export Profit & Loss XML from Tally")
-    export_result = export_pandl_from_tally()
+    export_result = export_pandl_from_tally(refresh=refresh, offline=offline, chunk=chunk)
     if export_result is None:
         print("Skipping next steps (no XML exported).")
         return
-    _, report_date = export_result
+    _, from_date, report_date = export_result
 
     print("\nStep 2: Sync ledgers before generating report")
-    mapping_df = sync_ledgers_from_tally()
-    if mapping_df is None:
+    with instr.stage("sync"):
+        if offline:
+            print("Offline: using the mapping from the last sync.")
+            mapping_store = open_local_mapping()
+        else:
+            mapping_store = sync_ledgers_from_tally(full=full_sync)
+    if mapping_store is None:
         print("Skipping P&L generation (Tally not reachable).")
         return
 
-    print("\nStep 3: Parse Profit & Loss XML")
-    income, expense = parse_tally_xml()
-    mapping_dict = load_mapping()
-    income = translate_and_filter(income, mapping_dict)
-    expense = translate_and_filter(expense, mapping_dict)
-
-    print("\nStep 4: Generate Kannada Profit & Loss Excel body")
     month_year_kn = get_month_year_kn(report_date)
-    generate_kannada_pnl(income, expense, month_year_kn)
-
-    header_file = base_dir / "config" / "header_template.xlsx"
-    body_file = base_dir / "output" / "body_PnL.xlsx"
-    footer_file = base_dir / "config" / "footer_template.xlsx"
     final_file = base_dir / "output" / "final_PnL.xlsx"
-    copy_all_parts(header_file, body_file, footer_file, final_file, month_year_kn=month_year_kn)
+    if renderer in PRINT_WRITERS:
+        final_file = final_file.with_suffix(f".{renderer}")
+    # --debug-intermediates needs the body and header built, so it always renders in full
+    build = _incremental_build(final_file, {"header": header_file, "body": template_file, "footer": footer_file},
+                               renderer, writer, aggregate, month_year_kn) if incremental and not debug else None
+
+    print("\nStep 3: Parse Profit & Loss XML")
+    with instr.stage("parse"):
+        income, expense = build.parse(xml_file, parse_tally_xml_stream) if build else parse_tally_xml_stream(xml_file)
+    with instr.stage("mapping"):
+        mapping_dict = mapping_store.as_dict()
+        mapping_store.close()
+        instr.count("mappings_loaded", len(mapping_dict))
+    history = pnl_history.open_history()
+    if history is not None:
+        with history:
+            with instr.stage("history"):
+                history.record(from_date, report_date, income, expense, mapping_dict)
+            if compare:
+                _write_comparison(history, from_date, report_date, base_dir / "output" / "comparison.xlsx")
+
+    def translate(income, expense):
+        return (translate_and_filter(income, mapping_dict, aggregate, unmapped, "income"),
+                translate_and_filter(expense, mapping_dict, aggregate, unmapped, "expense"))
+
+    with instr.stage("translate"):
+        income, expense = (build.translate(income, expense, mapping_dict, translate, reuse=unmapped is None)
+                           if build else translate(income, expense))
+
+    def render():
+        if renderer in PRINT_WRITERS:
+            print(f"\nStep 4: Render Kannada Profit & Loss report ({renderer.upper()})")
+            with instr.stage("render"):
+                PRINT_WRITERS[renderer](income, expense, month_year_kn, final_file)
+        elif renderer == "stream":
+            print("\nStep 4: Stream Kannada Profit & Loss report")
+            with instr.stage("render"):
+                write_final_pnl_stream(income, expense, month_year_kn, final_file, writer=writer)
+        else:
+            print("\nStep 4: Generate Kannada Profit & Loss report")
+            with instr.stage("body"):
+                wb_body = build_kannada_body(income, expense, month_year_kn)
+            print(f"   Income Ledgers: {len(income)} | Expense Ledgers: {len(expense)}")
+            with instr.stage("merge"):
+                copy_all_parts(header_file, wb_body, footer_file, final_file, month_year_kn=month_year_kn,
+                               debug_dir=base_dir / "output" if debug else None, writer=writer)
+
+    if build is None:
+        render()
+    else:
+        with instr.stage("build"):
+            _render_incremental(build, income, expense, render)
 
     print("\n All steps completed successfully!")
 
 
+# ==========================================================
+# 7️⃣ Batch mode: many periods, one pipeline
+# ==========================================================
+def parse_period(text):
+    """'DD-MM-YYYY:DD-MM-YYYY' -> (from_date, to_date)."""
+    try:
+        from_str, to_str = text.split(":")
+        from_date = datetime.strptime(from_str.strip(), "%d-%m-%Y")
+        to_date = datetime.strptime(to_str.strip(), "%d-%m-%Y")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid period '{text}'. Use DD-MM-YYYY:DD-MM-YYYY.")
+    if to_date < from_date:
+        raise argparse.ArgumentTypeError(f"Period '{text}' ends before it starts.")
+    return from_date, to_date
+
+
+def load_job_file(path):
+    """
+    Read periods from a JSON job file:
+        {"periods": [{"from": "01-04-2024", "to": "30-04-2024"}, ...]}
+    A bare list of periods is accepted too. Raises argparse.ArgumentTypeError
+    naming the entry that is missing a date or has a bad one.
+    """
+    with open(path, encoding="utf-8") as f:
+        job = json.load(f)
+    try:
+        periods = job["periods"] if isinstance(job, dict) else list(job)
+    except (KeyError, TypeError):
+        raise argparse.ArgumentTypeError(f"{path}: expected {{\"periods\": [...]}} or a list of periods.")
+    parsed = []
+    for n, p in enumerate(periods, 1):
+        try:
+            parsed.append(parse_period(f"{p['from']}:{p['to']}"))
+        except (KeyError, TypeError):
+            raise argparse.ArgumentTypeError(f"{path}: period {n} {json.dumps(p)} needs \"from\" and \"to\" dates.")
+        except argparse.ArgumentTypeError as e:
+            raise argparse.ArgumentTypeError(f"{path}: period {n}: {e}")
+    return parsed
+
+
+def period_label(from_date, to_date):
+    return f"{from_date:%Y%m%d}_{to_date:%Y%m%d}"
+
+
+@contextmanager
+def _timed(timings, stage):
+    t0 = time.perf_counter()
+    try:
+        with instr.stage(stage):
+            yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - t0
+
+
+def _print_timings(setup_timings, period_timings):
+    print("\n⏱️  Stage timings (seconds)")
+    for stage, secs in setup_timings.items():
+        print(f"   [setup] {stage:<10} {secs:8.3f}")
+    for label, timings in period_timings.items():
+        total = sum(timings.values())
+        stages = "  ".join(f"{stage}={secs:.3f}" for stage, secs in timings.items())
+        print(f"   {label}  total={total:.3f}  {stages}")
+
+
+def _write_comparison(history, from_date, to_date, path):
+    """Prior-period / last-year comparison of the period from the local history, as xlsx."""
+    with instr.stage("compare"):
+        path, notes = pnl_history.write_comparison(history, from_date, to_date, path)
+    print(f"📊 Comparison with prior period and last year → {path}")
+    for note in notes:
+        print(f"   ⚠️ {note}")
+    return path
+
+
+def _render_period(from_date, to_date, period_xml, mapping_dict, templates, output_dir, timings,
+                   renderer="classic", aggregate=False, unmapped=None, history=None, compare=False, writer=None,
+                   incremental=False, report=None):
+    """
+    Parse, translate and render one period's export into final_PnL_<label>.xlsx (.html/.pdf).
+    writer: excel_writers backend for the xlsx renderers (default openpyxl).
+    history: a pnl_history.HistoryStore that records the parsed lines; with
+    compare=True comparison_<label>.xlsx is written from it as well (single
+    periods only: run_batch compares once every period is recorded).
+    incremental: skip the stages whose inputs are unchanged since the last
+    build of this report, patching changed rows in place (incremental_build).
+    report: a report_defs.ReportDefinition (default P&L) that parses the
+    export and names final_<stem>_<label>; templates are the report's own.
+    History and comparisons are kept for additive reports (P&L) only.
+    """
+    report = report or REPORTS["pnl"]
+    label = period_label(from_date, to_date)
+    month_year_kn = get_month_year_kn(to_date)
+    final_file = Path(output_dir) / report.final_name(label)
+    if renderer in PRINT_WRITERS:
+        final_file = final_file.with_suffix(f".{renderer}")
+    build = _incremental_build(final_file, templates, renderer, writer, aggregate, month_year_kn) \
+        if incremental else None
+    left, right = report.columns
+
+    with instr.stage(f"{report.key} {label}" if report.key != "pnl" else f"period {label}"):
+        with _timed(timings, "parse"):
+            income, expense = build.parse(period_xml, report.parse) if build else report.parse(period_xml)
+            if history is not None and report.additive:
+                history.record(from_date, to_date, income, expense, mapping_dict)
+
+            def translate(income, expense):
+                return (translate_and_filter(income, mapping_dict, aggregate, unmapped, right, label),
+                        translate_and_filter(expense, mapping_dict, aggregate, unmapped, left, label))
+
+            income, expense = (build.translate(income, expense, mapping_dict, translate, reuse=unmapped is None)
+                               if build else translate(income, expense))
+        if compare and history is not None and report.additive:
+            _write_comparison(history, from_date, to_date, Path(output_dir) / f"comparison_{label}.xlsx")
+
+        def render():
+            if renderer in PRINT_WRITERS:
+                with _timed(timings, "render"):
+                    PRINT_WRITERS[renderer](income, expense, month_year_kn, final_file,
+                                            header_path=templates["header"],
+                                            template_path=templates["body"],
+                                            footer_path=templates["footer"])
+            elif renderer == "stream":
+                with _timed(timings, "render"):
+                    write_final_pnl_stream(income, expense, month_year_kn, final_file,
+                                           header_path=templates["header"],
+                                           template_path=templates["body"],
+                                           footer_path=templates["footer"], writer=writer)
+            else:
+                with _timed(timings, "body"):
+                    wb_body = build_kannada_body(income, expense, month_year_kn, template=templates["body"])
+                with _timed(timings, "merge"):
+                    copy_all_parts(templates["header"], wb_body, templates["footer"], final_file,
+                                   month_year_kn=month_year_kn, writer=writer)
+
+        if build is None:
+            render()
+        else:
+            _render_incremental(build, income, expense, render, timings)
+        return final_file
+
+
+def _incremental_build(final_file, templates, renderer, writer, aggregate, month_year_kn):
+    from incremental_build import IncrementalBuild
+
+    return IncrementalBuild(final_file, templates, aggregate=aggregate, renderer=renderer,
+                            writer=writer or "openpyxl", period=month_year_kn)
+
+
+def _render_incremental(build, income, expense, render, timings=None):
+    """build.render(), reporting a report that was reused or patched instead of rendered."""
+    t0 = time.perf_counter()
+    outcome = build.render(income, expense, render)
+    if outcome != "rendered":
+        if timings is not None:
+            timings["patch"] = time.perf_counter() - t0
+        print(f"♻️ {build.final_file.name}: {outcome}")
+    return outcome
+
+
+def run_batch(periods, output_dir=None, workers=None, full_sync=False, renderer="classic",
+              template_paths=None, exports_dir=None, stats=None, refresh=False, offline=False, chunk=None,
+              aggregate=False, unmapped=None, compare=False, writer=None, incremental=False, reports=None):
+    """
+    Non-interactive: fetch the ledger list and every period's export concurrently
+    over one keep-alive session, sync the mapping once, and render
+    final_PnL_<from>_<to>.xlsx for each period as soon as its export arrives.
+    reports: report_defs keys or ReportDefinitions (default ["pnl"]); every
+    report of every period is requested in the same fetch and rendered in
+    parallel as final_<stem>_<from>_<to>, all with the one synced mapping.
+    Periods whose cached export is still valid are not requested again
+    (refresh=True re-requests them all; offline=True uses only the cache and
+    the last synced mapping, without contacting Tally). chunk="month"/"quarter"
+    requests long periods as sub-ranges (see chunked_export) and adds them up.
+    aggregate / unmapped: see translate_and_filter.
+    Each parsed period is recorded in the P&L history (pnl_history); with
+    compare=True comparison_<label>.xlsx (prior period / last year) is written too,
+    once every period of the batch is recorded.
+    writer: excel_writers backend for the xlsx renderers ("openpyxl" or "xlsxwriter").
+    incremental=True rebuilds only what changed since each report was last
+    built, patching changed rows in place (see incremental_build).
+    template_paths: optional {"header", "body", "footer"} overrides of the config/ P&L templates.
+    stats: optional dict that receives the "setup" and "periods" stage timings.
+    Returns the list of files written.
+    """
+    output_dir = Path(output_dir) if output_dir else base_dir / "output"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    exports_dir = Path(exports_dir) if exports_dir else base_dir / "exports"
+    template_paths = template_paths or {}
+    workers = workers or tally_client.MAX_WORKERS
+    setup_timings, period_timings = {}, {}
+    if stats is not None:
+        stats["setup"], stats["periods"] = setup_timings, period_timings
+    written = []
+
+    if not offline:
+        with _timed(setup_timings, "connect"):
+            if not is_tally_running():
+                print("Unable to connect to Tally. Batch aborted.")
+                return written
+
+    reports = [REPORTS[r] if isinstance(r, str) else r for r in (reports or ["pnl"])]
+    with _timed(setup_timings, "templates"):
+        templates = {}
+        for report in reports:
+            paths = report.templates
+            if report.key == "pnl":
+                paths = {"body": template_file, "header": header_file, "footer": footer_file, **template_paths}
+            templates[report.key] = {part: load_template(paths[part]) for part in ("body", "header", "footer")}
+
+    # one job per report and period; P&L jobs keep the plain period label
+    jobs = {}
+    for f, t in periods:
+        for report in reports:
+            label = period_label(f, t)
+            jobs[label if report.key == "pnl" else f"{report.key}_{label}"] = (report, f, t)
+    for label in jobs:
+        period_timings[label] = {}
+
+    mapping_dict = None
+    waiting = []        # exports that arrived before the ledger list
+    render_futures = {}
+
+    with tally_cache.open_response_cache() or nullcontext() as cache, \
+            pnl_history.open_history() or nullcontext() as history, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render") as render_pool:
+        def submit(label, period_xml):
+            report, f, t = jobs[label]
+            fut = render_pool.submit(_render_period, f, t, period_xml, mapping_dict,
+                                     templates[report.key], output_dir, period_timings[label], renderer,
+                                     aggregate, unmapped, history, False, writer, incremental, report)
+            render_futures[fut] = label
+
+        def on_export(label, content, sub_range):
+            """
+            A period's export (or one of its chunks) arrived: save it and queue the
+            render. A whole-period export comes as the Path it was streamed to.
+            """
+            merger = mergers.get(label)
+            if merger is not None:
+                merger.add(sub_range, content)
+                if not merger.complete:
+                    return
+                content = merger.to_xml()
+            report, f, t = jobs[label]
+            if isinstance(content, Path):
+                period_xml = content
+                print(f"{report.title} XML saved → {period_xml}")
+            else:
+                period_xml = save_export(content, exports_dir / report.export_name(period_label(f, t)),
+                                         report.tally_name)
+            if mapping_dict is None:
+                waiting.append((label, period_xml))
+            else:
+                submit(label, period_xml)
+
+        xml_requests, request_ranges, mergers, dest = {}, {}, {}, {}
+        with _timed(setup_timings, "cache"):
+            status = cache_status(offline) if cache is not None else None
+            for label, (report, f, t) in jobs.items():
+                # only flows over the period (P&L) add up across sub-ranges
+                sub_ranges = split_period(f, t, chunk) if chunk and report.additive else [(f, t)]
+                if len(sub_ranges) > 1:
+                    mergers[label] = ChunkMerger(sub_ranges)
+                export_file = exports_dir / report.export_name(period_label(f, t))
+                for i, (sf, st) in enumerate(sub_ranges, 1):
+                    key = label if len(sub_ranges) == 1 else f"{label}#{i}"
+                    if refresh:
+                        content = None
+                    elif len(sub_ranges) == 1:
+                        # whole periods go file to file; chunks are added up in memory
+                        content = cached_pandl_file(cache, status, sf, st, export_file, offline, report.tally_name)
+                    else:
+                        content = cached_pandl(cache, status, sf, st, offline, report.tally_name)
+                    if content is not None:
+                        on_export(label, content, (sf, st))
+                    elif offline:
+                        print(f"❌ No cached export for {key}; run once without --offline.")
+                    else:
+                        xml_requests[key] = report.request(sf, st)
+                        request_ranges[key] = (label, (sf, st))
+                        if len(sub_ranges) == 1:
+                            dest[key] = export_file
+
+        if offline:
+            with _timed(setup_timings, "mapping"):
+                with open_local_mapping() as mapping_store:
+                    mapping_dict = mapping_store.as_dict()
+                instr.count("mappings_loaded", len(mapping_dict))
+            for label, period_xml in waiting:
+                submit(label, period_xml)
+            waiting.clear()
+        else:
+            ledger_request, since_alter_id = ledger_sync_request(full_sync)
+            xml_requests = {"ledgers": ledger_request, **xml_requests}
+
+        fetch_started = time.perf_counter()
+        for key, content, error in fetch_many(xml_requests, max_workers=workers, dest=dest):
+            elapsed = time.perf_counter() - fetch_started
+            if error is not None:
+                print(f"❌ Request '{key}' failed: {error}")
+                if key == "ledgers":
+                    print("Skipping report generation (Tally not reachable).")
+                    break
+                continue
+
+            if key == "ledgers":
+                setup_timings["sync"] = elapsed
+                with _timed(setup_timings, "mapping"):
+                    with apply_ledger_response(content, since_alter_id) as mapping_store:
+                        mapping_dict = mapping_store.as_dict()
+                    instr.count("mappings_loaded", len(mapping_dict))
+                for label, period_xml in waiting:
+                    submit(label, period_xml)
+                waiting.clear()
+                continue
+
+            label, sub_range = request_ranges[key]
+            period_timings[label]["fetch"] = elapsed
+            cache_pandl(cache, status, *sub_range, content, jobs[label][0].tally_name)
+            on_export(label, content, sub_range)
+
+        rendered = set()
+        for fut in as_completed(render_futures):
+            label = render_futures[fut]
+            try:
+                written.append(fut.result())
+                rendered.add(label)
+            except Exception as e:
+                print(f"❌ Rendering {label} failed: {e}")
+
+        # A comparison reads earlier periods from the history, so it waits until every period is recorded
+        if compare and history is not None:
+            for f, t in sorted((f, t) for label, (report, f, t) in jobs.items()
+                               if report.additive and label in rendered):
+                try:
+                    _write_comparison(history, f, t, output_dir / f"comparison_{period_label(f, t)}.xlsx")
+                except Exception as e:
+                    print(f"❌ Comparison {period_label(f, t)} failed: {e}")
+
+    _print_timings(setup_timings, period_timings)
+    print(f"\n Batch completed: {len(written)}/{len(jobs)} reports written.")
+    return sorted(written)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(
+        description="VEGA - Tally P&L to Kannada Excel. Without arguments, runs interactively.")
+    ap.add_argument("--period", type=parse_period, action="append", default=[],
+                    metavar="DD-MM-YYYY:DD-MM-YYYY", help="period to export (repeatable)")
+    ap.add_argument("--job-file", help="JSON file listing periods (see load_job_file)")
+    ap.add_argument("--report", choices=list(REPORTS), action="append", default=[],
+                    help="report to render per period (repeatable, default pnl): all requested reports are "
+                         "fetched concurrently in one Tally session and rendered in parallel (batch mode)")
+    ap.add_argument("--output-dir", help="where to write final_PnL_<period>.xlsx (default: output/)")
+    ap.add_argument("--workers", type=int, help="concurrent Tally requests / renders (batch mode)")
+    ap.add_argument("--renderer", choices=RENDERERS, default="classic",
+                    help="stream: write-only renderer straight to final_PnL.xlsx (no body/header files); "
+                         "html/pdf: printable final_PnL.html/.pdf without Excel (pdf needs WeasyPrint)")
+    ap.add_argument("--writer", choices=list(WRITERS), default="openpyxl",
+                    help="xlsx library for the classic/stream renderers: xlsxwriter writes rows in bulk "
+                         "in constant memory (pip install xlsxwriter)")
+    ap.add_argument("--debug-intermediates", action="store_true",
+                    help="also save body_PnL.xlsx and header_with_month.xlsx to output/ (classic renderer)")
+    ap.add_argument("--full-sync", action="store_true",
+                    help="pull every ledger instead of only those altered since the last sync")
+    ap.add_argument("--refresh", action="store_true",
+                    help="re-export from Tally even if the cached export is still valid")
+    ap.add_argument("--offline", action="store_true",
+                    help="don't contact Tally: use cached exports of the company Tally last reported and the "
+                         "last synced mapping (for re-runs after editing ledger_mapping.xlsx)")
+    ap.add_argument("--chunk", choices=sorted(CHUNKS),
+                    help="export long periods as month/quarter sub-ranges fetched concurrently and summed")
+    ap.add_argument("--aggregate-duplicates", action="store_true",
+                    help="one line per ledger: sum ledgers that Tally lists under several groups")
+    ap.add_argument("--unmapped-report", nargs="?", const=str(base_dir / "output" / "unmapped_ledgers.xlsx"),
+                    metavar="PATH", help="write ledgers with no Kannada mapping (dropped from the report) "
+                                         "to an xlsx (default path: output/unmapped_ledgers.xlsx)")
+    ap.add_argument("--no-cache", action="store_true", help="neither read nor write the Tally response cache")
+    ap.add_argument("--compare", action="store_true",
+                    help="also write comparison.xlsx: each ledger vs. the prior period and the same period "
+                         "last year, from the local P&L history (no extra Tally requests)")
+    ap.add_argument("--no-history", action="store_true",
+                    help="don't record this run's periods in the P&L history (exports/pnl_history.db)")
+    ap.add_argument("--incremental", action="store_true",
+                    help="rebuild only what changed since the last run: unchanged exports aren't re-parsed, "
+                         "and mapping edits patch just the affected rows of the existing report")
+    ap.add_argument("--tally-url", help=f"Tally HTTP server (default: {tally_client.TALLY_URL})")
+    ap.add_argument("--timeout", type=float, help="seconds to wait for a Tally response")
+    ap.add_argument("--retries", type=int, help="retries on connection errors / 5xx")
+    ap.add_argument("--report-json", nargs="?", const=str(base_dir / "output" / "run_report.json"),
+                    metavar="PATH", help="write a JSON run report: stage timings, memory, bytes, row counts "
+                                         "(default path: output/run_report.json)")
+    ap.add_argument("--profile-stage", action="append", default=[], metavar="STAGE",
+                    help="run STAGE (e.g. render, merge, sync, or 'all') under cProfile; "
+                         "stats go to output/profiles/ (repeatable, implies --report-json)")
+    args = ap.parse_args(argv)
+    if args.renderer == "pdf" and not pdf_available():
+        ap.error("--renderer pdf needs WeasyPrint (pip install weasyprint); --renderer html needs nothing")
+    if not writer_available(args.writer):
+        ap.error(f"--writer {args.writer} needs XlsxWriter (pip install xlsxwriter)")
+    tally_client.configure(url=args.tally_url, read_timeout=args.timeout, retries=args.retries)
+    if args.offline and (args.refresh or args.no_cache):
+        ap.error("--offline needs the cache; it can't be combined with --refresh or --no-cache")
+    if args.no_cache:
+        tally_cache.configure(enabled=False)
+    if args.compare and args.no_history:
+        ap.error("--compare reads the P&L history; it can't be combined with --no-history")
+    if args.no_history:
+        pnl_history.configure(enabled=False)
+
+    periods = list(args.period)
+    if args.job_file:
+        try:
+            periods += load_job_file(args.job_file)
+        except (OSError, ValueError, argparse.ArgumentTypeError) as e:
+            ap.error(f"--job-file: {e}")
+    reports = list(dict.fromkeys(args.report)) or ["pnl"]
+    if reports != ["pnl"] and not periods:
+        ap.error("--report balance-sheet / trial-balance needs --period or --job-file (batch mode)")
+
+    report_json = args.report_json
+    if args.profile_stage and not report_json:
+        report_json = str(base_dir / "output" / "run_report.json")
+    if report_json:
+        instr.enable(profile_stages=args.profile_stage, profile_dir=base_dir / "output" / "profiles")
+
+    unmapped = None
+    if args.unmapped_report:
+        from ledger_frame import UnmappedReport
+        unmapped = UnmappedReport()
+
+    try:
+        if periods:
+            run_batch(periods, args.output_dir, args.workers, args.full_sync, args.renderer,
+                      refresh=args.refresh, offline=args.offline, chunk=args.chunk,
+                      aggregate=args.aggregate_duplicates, unmapped=unmapped, compare=args.compare,
+                      writer=args.writer, incremental=args.incremental, reports=reports)
+        else:
+            run_interactive(args.full_sync, args.renderer, args.debug_intermediates,
+                            refresh=args.refresh, offline=args.offline, chunk=args.chunk,
+                            aggregate=args.aggregate_duplicates, unmapped=unmapped, compare=args.compare,
+                            writer=args.writer, incremental=args.incremental)
+        if unmapped is not None:
+            from mapping_index import suggest_local
+            path = unmapped.write(args.unmapped_report, suggest_local)
+            print(f"🔎 {len(unmapped)} unmapped ledgers → {path}" if len(unmapped)
+                  else f"✅ Every ledger is mapped (report → {path})")
+    finally:
+        if report_json:
+            instr.write_report(report_json)
+
+
 # ==========================================================
 # Run script
 # ==========================================================
@@ -0,0 +1,68 @@
+# bench_assembly.py
+"""
+Report assembly with the old intermediate files (body_PnL.xlsx written and
+re-read, header_with_month.xlsx written and re-read) vs. the in-memory
+single-pass assembly (build_kannada_body + copy_all_parts on Workbooks).
+
+    python bench_assembly.py                    # typical (60 rows) and large (5,000 rows)
+    python bench_assembly.py --sizes 60 20000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+import automate
+from bench_renderers import synthetic_rows
+from merge_header_footer import copy_all_parts
+
+DEFAULT_SIZES = [60, 5_000]
+
+
+def with_intermediates(income, expense, month_year_kn, tmp):
+    body_file = tmp / "body_PnL.xlsx"
+    automate.generate_kannada_pnl(income, expense, month_year_kn, output=body_file)
+    copy_all_parts(automate.header_file, body_file, automate.footer_file, tmp / "final_disk.xlsx",
+                   month_year_kn=month_year_kn, debug_dir=tmp)
+    load_workbook(tmp / "header_with_month.xlsx")  # the reload copy_all_parts used to do
+    written = body_file.stat().st_size + (tmp / "header_with_month.xlsx").stat().st_size
+    return written
+
+
+def in_memory(income, expense, month_year_kn, tmp):
+    wb_body = automate.build_kannada_body(income, expense, month_year_kn)
+    copy_all_parts(automate.header_file, wb_body, automate.footer_file, tmp / "final_memory.xlsx",
+                   month_year_kn=month_year_kn)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    args = ap.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for n in args.sizes:
+            income, expense = synthetic_rows(n)
+            month_year_kn = automate.get_month_year_kn()
+
+            t0 = time.perf_counter()
+            intermediate_bytes = with_intermediates(income, expense, month_year_kn, tmp)
+            t_disk = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            in_memory(income, expense, month_year_kn, tmp)
+            t_mem = time.perf_counter() - t0
+            results.append((n, intermediate_bytes, t_disk, t_mem))
+
+    print(f"\n{'rows':>7} {'I/O saved':>12} {'with files':>11} {'in memory':>10}")
+    for n, intermediate_bytes, t_disk, t_mem in results:
+        # each intermediate file was written once and read back once
+        print(f"{n:>7,} {2 * intermediate_bytes / 1024:>9.1f} KB {t_disk:>10.3f}s {t_mem:>9.3f}s")
+
+
+if __name__ == "__main__":
+    main()
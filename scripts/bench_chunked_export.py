@@ -0,0 +1,65 @@
+# bench_chunked_export.py
+"""
+One full-range Profit & Loss request vs. month/quarter chunks fetched
+concurrently, against the stub in periodic mode (each export costs
+--day-latency seconds per day of its range). Also checks that the merged
+chunks equal the single full-range export.
+
+    python bench_chunked_export.py --day-latency 0.01 --workers 3
+"""
+import argparse
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+
+import tally_cache
+import tally_client
+from chunked_export import fetch_pandl_chunked, verify_chunked
+from tally_pandl_export import fetch_pandl_xml
+from tally_stub_server import start_stub_server
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--from", dest="from_date", default="01-04-2025")
+    ap.add_argument("--to", dest="to_date", default="31-03-2026")
+    ap.add_argument("--day-latency", type=float, default=0.01, help="stub seconds per day of the requested range")
+    ap.add_argument("--workers", type=int, default=3, help="concurrent sub-range requests")
+    args = ap.parse_args()
+    from_date = datetime.strptime(args.from_date, "%d-%m-%Y")
+    to_date = datetime.strptime(args.to_date, "%d-%m-%Y")
+
+    server, url = start_stub_server(periodic=True, day_latency=args.day_latency)
+    tally_client.configure(url=url)
+    tally_cache.configure(enabled=False)
+    print(f"{from_date:%d-%m-%Y} to {to_date:%d-%m-%Y}, {args.day_latency}s per day of range, "
+          f"{args.workers} workers")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for label, fetch in [
+                ("single", lambda out: fetch_pandl_xml(from_date, to_date, out)),
+                ("month", lambda out: fetch_pandl_chunked(from_date, to_date, "month", out,
+                                                          max_workers=args.workers)),
+                ("quarter", lambda out: fetch_pandl_chunked(from_date, to_date, "quarter", out,
+                                                            max_workers=args.workers)),
+            ]:
+                before = server.pandl_requests
+                t0 = time.perf_counter()
+                with redirect_stdout(StringIO()):
+                    fetch(Path(tmp) / f"PandL_{label}.xml")
+                elapsed = time.perf_counter() - t0
+                print(f"   {label:<8} {elapsed:>7.2f}s   {server.pandl_requests - before} requests")
+
+        for chunk in ("month", "quarter"):
+            diffs = verify_chunked(from_date, to_date, chunk, args.workers)
+            print(f"✅ {chunk} chunks match the full-range export" if not diffs
+                  else f"❌ {chunk} chunks: {len(diffs)} ledger lines differ")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# bench_history.py
+"""
+P&L history store at scale: --years of monthly snapshots with --ledgers
+lines each are recorded, then the queries a report run makes are timed —
+a prior-period / last-year comparison, one ledger across every year, and
+the period list. For reference, the same comparison without the history
+needs two more Tally exports parsed (timed here without Tally's own time).
+
+    python bench_history.py --years 5 --ledgers 2000
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from pnl_history import HistoryStore, _add_months, _month_end
+from synthetic_tally import write_synthetic_pandl
+from tally_xml_stream import parse_tally_xml_stream
+
+
+def make_lines(names, rng):
+    rows = [(name, round(rng.uniform(1, 500000), 2)) for name in names if rng.random() > 0.05]
+    return rows[: len(rows) // 2], rows[len(rows) // 2:]
+
+
+def timed_ms(fn, repeat=20):
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        runs.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(runs), result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--years", type=int, default=5)
+    ap.add_argument("--ledgers", type=int, default=2_000, help="ledger lines per month")
+    args = ap.parse_args()
+
+    rng = random.Random(0)
+    names = [f"Ledger {i:05d}" for i in range(args.ledgers)]
+    mapping = {name.lower(): f"ಲೆಡ್ಜರ್ {i}" for i, name in enumerate(names) if i % 10}
+    start = datetime(2025 - args.years + 1, 1, 1)
+    months = [(_add_months(start, i), _month_end(_add_months(start, i))) for i in range(args.years * 12)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        with HistoryStore(tmp / "pnl_history.db", company="bench") as history:
+            t0 = time.perf_counter()
+            for f, t in months:
+                history.record(f, t, *make_lines(names, rng), mapping)
+            recording = time.perf_counter() - t0
+            size = (tmp / "pnl_history.db").stat().st_size
+
+            latest = months[-1]
+            compare_ms, frame = timed_ms(lambda: history.comparison(*latest))
+            ledger_ms, series = timed_ms(lambda: history.ledger_history(names[7]))
+            periods_ms, periods = timed_ms(lambda: history.periods())
+            period_ms, _ = timed_ms(lambda: history.lines(*latest))
+
+        pandl = write_synthetic_pandl(tmp / "PandL.xml", args.ledgers)
+        parse_ms, _ = timed_ms(lambda: [parse_tally_xml_stream(pandl) for _ in range(2)], repeat=5)
+
+    print(f"{len(months)} monthly snapshots × {args.ledgers:,} ledger lines "
+          f"({size / 1024 / 1024:.1f} MB history)")
+    print(f"   record        {recording / len(months) * 1000:>8.1f} ms per period")
+    print(f"   comparison    {compare_ms:>8.1f} ms   {len(frame):,} rows (current / prior month / last year)")
+    print(f"   one ledger    {ledger_ms:>8.1f} ms   {len(series)} periods across {args.years} years")
+    print(f"   one period    {period_ms:>8.1f} ms")
+    print(f"   period list   {periods_ms:>8.1f} ms   {len(periods)} periods")
+    print(f"   without history: parsing two more exports alone takes {parse_ms:.0f} ms, plus Tally's export time")
+
+
+if __name__ == "__main__":
+    main()
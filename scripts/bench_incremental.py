@@ -0,0 +1,99 @@
+# bench_incremental.py
+"""
+--incremental rebuilds vs full renders of one period (no Tally: a synthetic
+export and mapping). For each size: the full pipeline (parse, translate,
+render), then incremental rebuilds after no change, one Kannada name fixed,
+1% of names fixed and a template edit. Each patched report is checked cell
+by cell against a full render of the same inputs.
+
+    python bench_incremental.py                      # 1k, 20k, 100k ledger lines
+    python bench_incremental.py --sizes 2000 --renderer stream
+"""
+import argparse
+import shutil
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+import automate
+from bench_writers import cell_formats
+from synthetic_tally import write_synthetic_pandl
+from tally_xml_stream import parse_tally_xml_stream
+from template_cache import load_template
+
+DEFAULT_SIZES = [1_000, 20_000, 100_000]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="ledger lines per export")
+    ap.add_argument("--renderer", choices=["classic", "stream"], default="classic")
+    args = ap.parse_args()
+
+    ok = True
+    print(f"{'ledgers':>8}  {'run':<22} {'seconds':>8}  outcome")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for n in args.sizes:
+            export = write_synthetic_pandl(tmp / f"PandL_{n}.xml", n)
+            income, expense = parse_tally_xml_stream(export)
+            names = [name for name, _ in income + expense]
+            mapping = {name.strip().lower(): f"ಕನ್ನಡ {name}" for name in names}
+            header = tmp / "header_template.xlsx"
+            shutil.copy(automate.header_file, header)
+            templates = {"header": header, "body": automate.template_file, "footer": automate.footer_file}
+            out, full_dir = tmp / f"out_{n}", tmp / f"full_{n}"
+            out.mkdir()
+            full_dir.mkdir()
+
+            def render(incremental, output_dir=out):
+                tpls = {part: load_template(path) for part, path in templates.items()}
+                buf = StringIO()
+                t0 = time.perf_counter()
+                with redirect_stdout(buf):
+                    final = automate._render_period(datetime(2025, 4, 1), datetime(2025, 4, 30), export, mapping,
+                                                    tpls, output_dir, {}, args.renderer, incremental=incremental)
+                elapsed = time.perf_counter() - t0
+                outcome = next((line.split(": ")[-1] for line in buf.getvalue().splitlines()
+                                if line.startswith("♻️ final")), "rendered")
+                return final, elapsed, outcome
+
+            def check(final):
+                nonlocal ok
+                reference, _, _ = render(False, full_dir)
+                same = cell_formats(final) == cell_formats(reference)
+                ok &= same
+                return "" if same else "   ❌ differs from a full render"
+
+            runs = [
+                ("full render", False, None),
+                ("incremental, first", True, None),
+                ("no change", True, None),
+                ("1 name fixed", True, lambda: mapping.update({names[0].lower(): "ಸರಿಪಡಿಸಿದ ಹೆಸರು"})),
+                ("1% of names fixed", True,
+                 lambda: mapping.update({name.lower(): f"ಹೊಸ {name}" for name in names[::100]})),
+                ("header template edit", True, lambda: _touch_template(header)),
+            ]
+            for label, incremental, change in runs:
+                if change:
+                    change()
+                final, elapsed, outcome = render(incremental)
+                note = check(final) if outcome == "patched" else ""
+                print(f"{n:>8,}  {label:<22} {elapsed:>8.3f}  {outcome}{note}")
+            print()
+    print("✅ patched reports match full renders" if ok else "❌ a patched report differs (see above)")
+
+
+def _touch_template(path):
+    wb = load_workbook(path)
+    wb.active.cell(1, 1).value = f"{wb.active.cell(1, 1).value or ''} "
+    wb.save(path)
+
+
+if __name__ == "__main__":
+    main()
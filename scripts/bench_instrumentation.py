@@ -0,0 +1,74 @@
+# bench_instrumentation.py
+"""
+Overhead of the instrumentation layer: the same parse -> translate -> render
+pipeline on a synthetic export with instrumentation off and on (stage timers,
+counters and the RSS sampler; no cProfile).
+
+    python bench_instrumentation.py                  # 5,000 ledger lines, median of 5
+    python bench_instrumentation.py --ledgers 50000 --repeat 3
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+import instrumentation as instr
+from automate import build_kannada_body, get_month_year_kn, header_file, footer_file, translate_and_filter
+from merge_header_footer import copy_all_parts
+from synthetic_tally import write_synthetic_pandl
+from tally_xml_stream import parse_tally_xml_stream
+
+
+def pipeline(xml_path, mapping_dict, output_path):
+    with instr.stage("parse"):
+        income, expense = parse_tally_xml_stream(xml_path)
+    with instr.stage("translate"):
+        income = translate_and_filter(income, mapping_dict)
+        expense = translate_and_filter(expense, mapping_dict)
+    month_year_kn = get_month_year_kn()
+    with instr.stage("body"):
+        wb_body = build_kannada_body(income, expense, month_year_kn)
+    with instr.stage("merge"):
+        copy_all_parts(header_file, wb_body, footer_file, output_path, month_year_kn=month_year_kn)
+
+
+def _timed_run(enabled, xml_path, mapping_dict, output_path):
+    if enabled:
+        instr.enable()
+    t0 = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        pipeline(xml_path, mapping_dict, output_path)
+    elapsed = time.perf_counter() - t0
+    instr.disable()
+    return elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--ledgers", type=int, default=5_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_path = write_synthetic_pandl(Path(tmp) / "PandL.xml", args.ledgers)
+        income, expense = parse_tally_xml_stream(xml_path)
+        mapping_dict = {name.strip().lower(): f"ಕನ್ನಡ {name}" for name, _ in income + expense}
+        output_path = Path(tmp) / "final_PnL.xlsx"
+
+        _timed_run(False, xml_path, mapping_dict, output_path)  # warm the template cache
+        off, on = [], []
+        for _ in range(args.repeat):  # interleaved, so drift on a busy machine hits both alike
+            off.append(_timed_run(False, xml_path, mapping_dict, output_path))
+            on.append(_timed_run(True, xml_path, mapping_dict, output_path))
+        t_off, t_on = statistics.median(off), statistics.median(on)
+
+    print(f"{args.ledgers:,} ledger lines, median of {args.repeat}")
+    print(f"   instrumentation off  {t_off:8.3f}s")
+    print(f"   instrumentation on   {t_on:8.3f}s   ({(t_on - t_off) / t_off * 100:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# bench_ledger_sync.py
+"""
+Full ledger-list pull vs. incremental (AlterID watermark) sync against the
+local Tally stub.
+
+    python bench_ledger_sync.py --ledgers 50000 --new 25
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import ledger_sync
+import tally_client
+from tally_stub_server import add_ledgers, start_stub_server
+
+
+def _timed_pull(full):
+    xml_request, since = ledger_sync.ledger_sync_request(full)
+    t0 = time.perf_counter()
+    res = tally_client.post_xml(xml_request)
+    ledgers = ledger_sync.parse_ledgers(res.content)
+    fetch_secs = time.perf_counter() - t0
+    return {"since": since, "ledgers": len(ledgers), "bytes": len(res.content),
+            "fetch_secs": fetch_secs, "content": res.content}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--ledgers", type=int, default=50_000, help="ledgers in the stub company")
+    ap.add_argument("--new", type=int, default=25, help="ledgers created between the two syncs")
+    args = ap.parse_args()
+
+    server, url = start_stub_server(extra_ledgers=args.ledgers)
+    tally_client.configure(url=url)
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger_sync.configure(mapping_file=Path(tmp) / "ledger_mapping.xlsx",
+                              log_file=Path(tmp) / "updated_mapping_log.txt")
+        try:
+            print(f"Initial full sync of {len(server.ledgers):,} ledgers...")
+            ledger_sync.sync_ledgers_from_tally(full=True)
+            add_ledgers(server, [f"New Ledger {i}" for i in range(args.new)])
+
+            rows = []
+            for label, full in (("incremental", False), ("full", True)):
+                pull = _timed_pull(full)
+                t0 = time.perf_counter()
+                ledger_sync.apply_ledger_response(pull["content"], pull["since"])
+                pull["total_secs"] = pull["fetch_secs"] + time.perf_counter() - t0
+                rows.append((label, pull))
+        finally:
+            server.shutdown()
+
+    print(f"\n{'mode':<12} {'ledgers':>9} {'response':>12} {'fetch+parse':>12} {'sync total':>11}")
+    for label, r in rows:
+        print(f"{label:<12} {r['ledgers']:>9,} {r['bytes'] / 1024:>9.1f} KB {r['fetch_secs']:>11.3f}s "
+              f"{r['total_secs']:>10.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# bench_mapping_index.py
+"""
+Kannada name suggestions from the mapping index vs a difflib scan of every
+translated ledger. A synthetic mapping of n translated ledgers is stored
+with n / 10 new, untranslated ones: misspellings, case and punctuation
+changes, extra words and reordered words of mapped ledgers, plus unrelated
+names. Reports the index build (once), reopening it (no rebuild), the bulk
+suggestion rate, how often the suggestion is the ledger the name came from
+or one at least as similar (recall), and how many unrelated names still
+got one.
+
+    python bench_mapping_index.py                  # 10k, 100k, 200k translated ledgers
+    python bench_mapping_index.py --sizes 20000 --queries 500
+"""
+import argparse
+import difflib
+import random
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+from mapping_index import MIN_SCORE, MappingIndex, fold, similarity, trigrams
+from mapping_store import MappingStore
+
+DEFAULT_SIZES = [10_000, 100_000, 200_000]
+WORDS = ("electricity charges rent salary wages office branch bank interest audit fees payable receivable "
+         "deposit advance repairs maintenance building vehicle diesel petrol insurance premium telephone "
+         "internet printing stationery postage courier travel conveyance staff welfare bonus gratuity "
+         "provident fund professional legal consultancy commission discount sales purchase freight "
+         "loading unloading packing material stores spares tools depreciation furniture computer "
+         "software annual general meeting donation subscription membership books periodicals security "
+         "cleaning garden water hospitality festival celebration godown warehouse transport hire "
+         "charges expenses income receipt refund tax gst tds cess penalty loan overdraft cash").split()
+SYLLABLES = ("ra me sh ku ma la ksh mi gee tha nja na ga pra ka ve nka te sri ni va gha ndra bhu ka ha "
+             "ri sa nti de vi pa ti go su re an il sha rm ya sho da bha cha ja ta dha ba yo lo vu ne "
+             "ke se ze vo fi pu hu ru mu nu du bu gu tu ju cu kri tri dru pre bro sta spa ur ol ek").split()
+FIRMS = ("", "", " Traders", " Enterprises", " Agencies", " Stores", " & Co", " & Sons", " Industries")
+SUFFIXES = (" - Office", " Payable", " (Branch)", " A/c", " Exp")
+BASELINE_QUERIES = 20
+
+
+def _proper_name(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+
+
+def ledger_names(n, rng):
+    """Mostly parties (as in a large company's ledger list), the rest expense/income heads per branch."""
+    names = set()
+    while len(names) < n:
+        if rng.random() < 0.7:
+            name = f"{_proper_name(rng)} {_proper_name(rng)}{rng.choice(FIRMS)}"
+        else:
+            name = " ".join(rng.sample(WORDS, rng.randint(1, 3))).title()
+            if rng.random() < 0.6:
+                name += f" - {_proper_name(rng)} Branch"
+        names.add(name)
+    return sorted(names)
+
+
+def _typo(name, rng):
+    i = rng.randrange(1, len(name) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return name[:i] + name[i + 1:]                          # dropped letter
+    if kind == 1:
+        return name[:i] + name[i + 1] + name[i] + name[i + 2:]  # swapped letters
+    return name[:i] + rng.choice("aeioun") + name[i + 1:]       # wrong letter
+
+
+PERTURB = {
+    "typo": _typo,
+    "case/punct": lambda name, rng: f"  {name.upper().replace(' ', ' -  ')}.",
+    "extra word": lambda name, rng: name + rng.choice(SUFFIXES),
+    "reordered": lambda name, rng: " ".join(reversed(name.split())),
+}
+
+
+def queries(names, m, rng):
+    """m (query, source ledger or None) pairs: perturbed ledgers, a fifth of them unrelated names."""
+    out = []
+    for i in range(m):
+        if i % 5 == 4:
+            word = "".join(rng.choice("bcdfghjklmnpqrstvwxyz") + rng.choice("aeiou") for _ in range(5))
+            out.append((f"{word.title()} Holdings", None, "unrelated"))
+        else:
+            kind = list(PERTURB)[i % 5]
+            source = rng.choice(names)
+            out.append((PERTURB[kind](source, rng), source, kind))
+    return out
+
+
+def _as_close(suggestion, query, source):
+    """The suggestion is the source ledger, or another one at least as similar to the query."""
+    if suggestion is None:
+        return False
+    if suggestion.english == source:
+        return True
+    grams = trigrams(fold(query))
+    return similarity(grams, trigrams(fold(suggestion.english))) >= similarity(grams, trigrams(fold(source)))
+
+
+def difflib_suggest(name, entries, min_score=MIN_SCORE):
+    """The brute-force alternative: compare with every translated ledger."""
+    folded = fold(name)
+    best, best_score = None, min_score
+    matcher = difflib.SequenceMatcher(b=folded, autojunk=False)
+    for candidate, english in entries:
+        matcher.set_seq1(candidate)
+        if matcher.real_quick_ratio() >= best_score and matcher.quick_ratio() >= best_score:
+            score = matcher.ratio()
+            if score >= best_score:
+                best, best_score = english, score
+    return best
+
+
+def _time(fn, *args):
+    t0 = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        result = fn(*args)
+    return time.perf_counter() - t0, result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="translated ledgers")
+    ap.add_argument("--queries", type=int, default=None, help="new ledgers to suggest for (default n / 10)")
+    args = ap.parse_args()
+
+    print(f"{'ledgers':>8} {'build':>7} {'reopen':>7} {'DB MB':>6} {'new':>6} {'suggest':>8} {'µs/name':>8} "
+          f"{'difflib µs/name':>16} {'recall':>7} {'false':>6}")
+    ok = True
+    for n in args.sizes:
+        rng = random.Random(n)
+        names = ledger_names(n, rng)
+        new = queries(names, args.queries or n // 10, rng)
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Path(tmp) / "ledger_mapping.db"
+            with MappingStore(db, Path(tmp) / "ledger_mapping.xlsx") as store:
+                store.add_ledgers(names)
+                store.set_kannada({name: f"ಕನ್ನಡ {name}" for name in names})
+                store.add_ledgers([q for q, _, _ in new])
+
+            with MappingStore(db) as store:
+                t_build, _ = _time(MappingIndex, store)
+            with MappingStore(db) as store:
+                t_reopen, index = _time(MappingIndex, store)
+                t_suggest, got = _time(index.suggest, [q for q, _, _ in new])
+                size_mb = db.stat().st_size / (1024 * 1024)
+
+            hits = {kind: [0, 0] for kind in (*PERTURB, "unrelated")}
+            for query, source, kind in new:
+                s = got[query]
+                hits[kind][1] += 1
+                hits[kind][0] += (s is not None) if source is None else _as_close(s, query, source)
+            recall = sum(hits[k][0] for k in PERTURB) / max(1, sum(hits[k][1] for k in PERTURB))
+            false = hits["unrelated"][0]
+
+            entries = [(fold(name), name) for name in names]
+            sample = new[:BASELINE_QUERIES]
+            t_diff, _ = _time(lambda: [difflib_suggest(q, entries) for q, _, _ in sample])
+
+            print(f"{n:>8,} {t_build:>6.2f}s {t_reopen:>6.3f}s {size_mb:>6.1f} {len(new):>6,} {t_suggest:>7.2f}s "
+                  f"{t_suggest / len(new) * 1e6:>8.0f} {t_diff / len(sample) * 1e6:>16,.0f} "
+                  f"{recall:>6.1%} {false:>6}")
+            print("         " + "  ".join(f"{kind} {h[0]}/{h[1]}" for kind, h in hits.items()))
+            ok &= recall >= 0.95 and t_reopen < t_build
+    print("\n✅ suggestions found their source ledger" if ok else "\n❌ recall below 95% (see above)")
+
+
+if __name__ == "__main__":
+    main()
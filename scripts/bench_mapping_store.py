@@ -0,0 +1,77 @@
+# bench_mapping_store.py
+"""
+Mapping load time: pandas read_excel + iterrows (the old load_mapping) vs.
+the SQLite mapping store, cold (first import of the xlsx) and warm
+(xlsx unchanged, dict served from SQLite).
+
+    python bench_mapping_store.py                    # 1k, 50k, 500k mappings
+    python bench_mapping_store.py --sizes 1000 50000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import Workbook
+
+from mapping_store import MappingStore, open_mapping_store
+
+DEFAULT_SIZES = [1_000, 50_000, 500_000]
+
+
+def write_mapping_xlsx(path, n):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["EnglishLedger", "KannadaLedger"])
+    for i in range(n):
+        ws.append([f"Ledger {i:07d}", f"ಲೆಡ್ಜರ್ {i:07d}"])
+    wb.save(path)
+
+
+def pandas_load(path):
+    mapping_df = pd.read_excel(path)
+    mapping_df.columns = mapping_df.columns.str.strip()
+    return {
+        str(row["EnglishLedger"]).strip().lower(): str(row["KannadaLedger"]).strip()
+        for _, row in mapping_df.iterrows()
+        if pd.notna(row["EnglishLedger"]) and pd.notna(row["KannadaLedger"])
+    }
+
+
+def store_load(db, xlsx):
+    with open_mapping_store(db, xlsx) as store:
+        return store.as_dict()
+
+
+def _time(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - t0, result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    args = ap.parse_args()
+
+    print(f"{'mappings':>9} {'pandas':>10} {'store cold':>11} {'store warm':>11} {'append 100':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            xlsx = Path(tmp) / f"mapping_{n}.xlsx"
+            db = xlsx.with_suffix(".db")
+            write_mapping_xlsx(xlsx, n)
+
+            t_pandas, expected = _time(pandas_load, xlsx)
+            t_cold, cold = _time(store_load, db, xlsx)
+            t_warm, warm = _time(store_load, db, xlsx)
+            assert cold == expected and warm == expected
+
+            with MappingStore(db, xlsx) as store:
+                t_append, _ = _time(store.add_ledgers, [f"New Ledger {i}" for i in range(100)])
+
+            print(f"{n:>9,} {t_pandas:>9.3f}s {t_cold:>10.3f}s {t_warm:>10.3f}s {t_append:>10.4f}s")
+
+
+if __name__ == "__main__":
+    main()
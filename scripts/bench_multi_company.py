@@ -0,0 +1,67 @@
+# bench_multi_company.py
+"""
+Month-end close for N companies, one after another (--processes 1, the old
+one-company-per-run workflow) vs. across a process pool. Every company gets
+its own Tally stub (with per-request latency) and its own workspace.
+
+    python bench_multi_company.py --companies 40 --periods 3 --latency 0.5 --processes 8
+"""
+import argparse
+import io
+import json
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from multi_company import load_companies, run_companies
+from tally_stub_server import start_stub_server
+
+
+def write_companies_file(path, urls, n_periods):
+    periods = [{"from": f"01-{m:02d}-2025", "to": f"28-{m:02d}-2025"} for m in range(1, n_periods + 1)]
+    job = {
+        "periods": periods,
+        "companies": [{"name": f"Company {i:02d}", "tally_url": url, "workspace": f"company_{i:02d}"}
+                      for i, url in enumerate(urls)],
+    }
+    Path(path).write_text(json.dumps(job, indent=2), encoding="utf-8")
+
+
+def _run(companies_file, processes, renderer):
+    companies, periods = load_companies(companies_file)
+    with redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        results = run_companies(companies, periods, processes=processes, renderer=renderer)
+        elapsed = time.perf_counter() - t0
+    failed = [r["name"] for r in results if r["error"]]
+    return elapsed, sum(len(r["reports"]) for r in results), failed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--companies", type=int, default=12)
+    ap.add_argument("--periods", type=int, default=3, help="reports per company")
+    ap.add_argument("--latency", type=float, default=0.5, help="stub seconds per Tally request")
+    ap.add_argument("--processes", type=int, default=4)
+    ap.add_argument("--renderer", choices=["classic", "stream"], default="classic")
+    args = ap.parse_args()
+
+    servers = [start_stub_server(latency=args.latency) for _ in range(args.companies)]
+    try:
+        print(f"{args.companies} companies × {args.periods} periods, {args.latency}s Tally latency")
+        for processes in (1, args.processes):
+            with tempfile.TemporaryDirectory() as tmp:
+                companies_file = Path(tmp) / "companies.json"
+                write_companies_file(companies_file, [url for _, url in servers], args.periods)
+                elapsed, reports, failed = _run(companies_file, processes, args.renderer)
+            label = "sequential" if processes == 1 else f"{processes} processes"
+            status = "ok" if not failed else f"failed: {', '.join(failed)}"
+            print(f"   {label:<14} {elapsed:>7.2f}s   {reports} reports   {status}")
+    finally:
+        for server, _ in servers:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
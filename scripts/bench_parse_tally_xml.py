@@ -0,0 +1,97 @@
+# bench_parse_tally_xml.py
+"""
+Compare the DOM parser (automate.parse_tally_xml) with the streaming parser
+(tally_xml_stream.parse_tally_xml_stream) on synthetic exports.
+
+Each measurement runs in its own process so peak RSS is not shared.
+
+    python bench_parse_tally_xml.py                 # 10k, 100k, 1M ledger lines
+    python bench_parse_tally_xml.py --sizes 10000 50000
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic_tally import write_synthetic_pandl
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+PARSERS = ["dom", "stream"]
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_child(parser_name, xml_path):
+    """Parse once in this process and print a JSON result line."""
+    import automate
+    from tally_xml_stream import parse_tally_xml_stream
+
+    rss_before = _peak_rss_mb()
+    t0 = time.perf_counter()
+    if parser_name == "dom":
+        automate.xml_file = Path(xml_path)
+        income, expense = automate.parse_tally_xml()
+    else:
+        income, expense = parse_tally_xml_stream(xml_path)
+    elapsed = time.perf_counter() - t0
+    rss_after = _peak_rss_mb()
+
+    print(json.dumps({
+        "parser": parser_name,
+        "seconds": round(elapsed, 3),
+        "peak_rss_mb": round(rss_after, 1) if rss_after is not None else None,
+        "rss_growth_mb": round(rss_after - rss_before, 1) if rss_after is not None else None,
+        "income": len(income),
+        "expense": len(expense),
+    }))
+
+
+def run_benchmark(sizes):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            xml_path = write_synthetic_pandl(Path(tmp) / f"pandl_{n}.xml", n)
+            size_mb = xml_path.stat().st_size / (1024 * 1024)
+            print(f"\n{n:,} ledger lines ({size_mb:.1f} MB)")
+            for parser_name in PARSERS:
+                out = subprocess.run(
+                    [sys.executable, __file__, "--child", parser_name, str(xml_path)],
+                    capture_output=True, text=True, check=True, cwd=Path(__file__).parent,
+                )
+                row = json.loads(out.stdout.strip().splitlines()[-1])
+                row.update({"ledger_lines": n, "file_mb": round(size_mb, 1)})
+                results.append(row)
+                print(f"   {parser_name:<6} {row['seconds']:>8.3f}s   "
+                      f"peak RSS {row['peak_rss_mb']} MB (+{row['rss_growth_mb']} MB while parsing)")
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    ap.add_argument("--json", help="also write results to this JSON file")
+    ap.add_argument("--child", nargs=2, metavar=("PARSER", "XML"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        _run_child(*args.child)
+        return
+
+    results = run_benchmark(args.sizes)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# bench_print_renderer.py
+"""
+Reports per minute for the xlsx renderers (classic, stream) vs. the print
+renderer (html, and pdf when WeasyPrint is installed) on the config/
+templates, with --ledgers lines per report split between income and
+expense. Also checks that every line and amount made it into the HTML.
+
+    python bench_print_renderer.py --ledgers 200 --reports 50
+"""
+import argparse
+import random
+import tempfile
+import time
+from contextlib import redirect_stdout
+from html.parser import HTMLParser
+from io import StringIO
+from pathlib import Path
+
+import automate
+from merge_header_footer import copy_all_parts
+from print_renderer import format_amount, pdf_available, render_html, write_final_pnl_html, write_final_pnl_pdf
+from stream_renderer import write_final_pnl_stream
+from template_cache import load_template
+
+WORDS = ["ದೇವಸ್ಥಾನ", "ಸೇವಾ", "ಕಾಣಿಕೆ", "ಅನ್ನದಾಸೋಹಕ್ಕೆಸಂಬಂಧಿಸಿದ", "ಸಂಬಳ", "ವಿದ್ಯುತ್", "ಬಾಡಿಗೆ", "ದೇಣಿಗೆ"]
+
+
+def make_rows(n, seed=0):
+    rng = random.Random(seed)
+    rows = [(" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))) + f" {i}",
+             round(rng.uniform(1, 500000), 2)) for i in range(n)]
+    return rows[: n // 2], rows[n // 2:]
+
+
+class _Cells(HTMLParser):
+    """Text of every <td> in the table body."""
+
+    def __init__(self):
+        super().__init__()
+        self.cells, self._in_body, self._cell = [], False, None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tbody":
+            self._in_body = True
+        elif tag == "td" and self._in_body:
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag == "td" and self._cell is not None:
+            self.cells.append("".join(self._cell))
+            self._cell = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--ledgers", type=int, default=200, help="ledger lines per report")
+    ap.add_argument("--reports", type=int, default=50)
+    args = ap.parse_args()
+
+    income, expense = make_rows(args.ledgers)
+    month = automate.get_month_year_kn()
+    templates = {k: load_template(p) for k, p in
+                 (("header", automate.header_file), ("body", automate.template_file), ("footer", automate.footer_file))}
+
+    def classic(out):
+        wb = automate.build_kannada_body(income, expense, month, template=templates["body"])
+        copy_all_parts(templates["header"], wb, templates["footer"], out, month_year_kn=month)
+
+    renderers = [
+        ("classic", ".xlsx", classic),
+        ("stream", ".xlsx", lambda out: write_final_pnl_stream(income, expense, month, out, templates["header"],
+                                                               templates["body"], templates["footer"])),
+        ("html", ".html", lambda out: write_final_pnl_html(income, expense, month, out, templates["header"],
+                                                           templates["body"], templates["footer"])),
+    ]
+    if pdf_available():
+        renderers.append(("pdf", ".pdf", lambda out: write_final_pnl_pdf(income, expense, month, out,
+                                                                         templates["header"], templates["body"],
+                                                                         templates["footer"])))
+    print(f"{args.reports} reports × {args.ledgers} ledger lines")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, suffix, render in renderers:
+            t0 = time.perf_counter()
+            with redirect_stdout(StringIO()):
+                for i in range(args.reports):
+                    render(Path(tmp) / f"report_{i}{suffix}")
+            elapsed = time.perf_counter() - t0
+            size = (Path(tmp) / f"report_0{suffix}").stat().st_size
+            print(f"   {name:<8} {elapsed:>7.2f}s   {args.reports * 60 / elapsed:>8,.0f} reports/min   "
+                  f"{size / 1024:>6.0f} KB each")
+    if not pdf_available():
+        print("   pdf      skipped (WeasyPrint / Pango not installed)")
+
+    parser = _Cells()
+    parser.feed(render_html(income, expense, month, templates["header"], templates["body"], templates["footer"]))
+    expected = {name for name, _ in income + expense} | {format_amount(amt) for _, amt in income + expense}
+    missing = expected - set(parser.cells)
+    print("✅ every ledger line and amount is in the HTML" if not missing
+          else f"❌ {len(missing)} names/amounts missing from the HTML")
+
+
+if __name__ == "__main__":
+    main()
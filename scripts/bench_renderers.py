@@ -0,0 +1,125 @@
+# bench_renderers.py
+"""
+Classic renderer (build_kannada_body + copy_all_parts) vs. the write-only
+stream_renderer: wall time and peak RSS per ledger-row count, plus a parity
+check of the produced sheets.
+
+    python bench_renderers.py                       # 1k, 50k, 200k rows
+    python bench_renderers.py --sizes 1000 --check  # compare outputs cell by cell
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench_parse_tally_xml import _peak_rss_mb
+
+DEFAULT_SIZES = [1_000, 50_000, 200_000]
+RENDERERS = ["classic", "stream"]
+
+
+def synthetic_rows(n):
+    """n ledger rows split between expense and income, Kannada names long enough to wrap."""
+    n_exp = n // 2
+    expense = [(f"ಖರ್ಚು ಲೆಡ್ಜರ್ ವಿವರ {i}", 100.0 + i) for i in range(n_exp)]
+    income = [(f"ಜಮಾ ಲೆಡ್ಜರ್ ವಿವರ {i}", 50.5 + i) for i in range(n - n_exp)]
+    return income, expense
+
+
+def render(renderer, n, output_path):
+    import automate
+    from merge_header_footer import copy_all_parts
+    from stream_renderer import write_final_pnl_stream
+
+    income, expense = synthetic_rows(n)
+    month_year_kn = automate.get_month_year_kn()
+    if renderer == "classic":
+        wb_body = automate.build_kannada_body(income, expense, month_year_kn)
+        copy_all_parts(automate.header_file, wb_body, automate.footer_file, output_path,
+                       month_year_kn=month_year_kn)
+    else:
+        write_final_pnl_stream(income, expense, month_year_kn, output_path)
+
+
+def _run_child(renderer, n, output_path):
+    rss_before = _peak_rss_mb()
+    t0 = time.perf_counter()
+    render(renderer, int(n), output_path)
+    elapsed = time.perf_counter() - t0
+    rss_after = _peak_rss_mb()
+    print(json.dumps({
+        "renderer": renderer,
+        "seconds": round(elapsed, 3),
+        "peak_rss_mb": round(rss_after, 1) if rss_after is not None else None,
+        "rss_growth_mb": round(rss_after - rss_before, 1) if rss_after is not None else None,
+    }))
+
+
+def sheet_signature(path):
+    """Everything visible on the sheet: values, styles, widths, merges."""
+    from openpyxl import load_workbook
+
+    ws = load_workbook(path).active
+    cells = {}
+    for row in ws.iter_rows():
+        for c in row:
+            if c.value is None and not c.has_style:
+                continue
+            cells[c.coordinate] = (c.value, repr(c.font), repr(c.border), repr(c.fill),
+                                   c.number_format, repr(c.alignment), repr(c.protection))
+    widths = {k: d.width for k, d in ws.column_dimensions.items() if d.width}
+    merges = sorted(str(r) for r in ws.merged_cells.ranges)
+    return cells, widths, merges
+
+
+def check_parity(n, tmp):
+    paths = {}
+    for renderer in RENDERERS:
+        paths[renderer] = Path(tmp) / f"parity_{renderer}.xlsx"
+        render(renderer, n, paths[renderer])
+    a, b = sheet_signature(paths["classic"]), sheet_signature(paths["stream"])
+    for label, x, y in zip(("cells", "widths", "merges"), a, b):
+        if x != y:
+            if isinstance(x, dict):
+                diff = sorted(k for k in set(x) | set(y) if x.get(k) != y.get(k))[:10]
+                print(f"❌ {label} differ, e.g. {diff}")
+            else:
+                print(f"❌ {label} differ: {x} vs {y}")
+            return False
+    print(f"✅ Parity OK at {n:,} rows ({len(a[0])} cells, widths, {len(a[2])} merges)")
+    return True
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    ap.add_argument("--check", action="store_true", help="verify both renderers produce the same sheet")
+    ap.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        _run_child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.check:
+            ok = check_parity(min(args.sizes), tmp)
+            if not ok:
+                sys.exit(1)
+        for n in args.sizes:
+            print(f"\n{n:,} ledger rows")
+            for renderer in RENDERERS:
+                out = subprocess.run(
+                    [sys.executable, __file__, "--child", renderer, str(n), str(Path(tmp) / f"{renderer}_{n}.xlsx")],
+                    capture_output=True, text=True, check=True, cwd=Path(__file__).parent,
+                )
+                row = json.loads(out.stdout.strip().splitlines()[-1])
+                print(f"   {renderer:<8} {row['seconds']:>8.3f}s   peak RSS {row['peak_rss_mb']} MB "
+                      f"(+{row['rss_growth_mb']} MB while rendering)")
+
+
+if __name__ == "__main__":
+    main()
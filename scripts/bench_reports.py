@@ -0,0 +1,87 @@
+# bench_reports.py
+"""
+Profit & Loss, Balance Sheet and Trial Balance for the same periods: one
+run_batch per report (a ledger sync and a Tally session each, one report
+rendering at a time) vs one run_batch fanning out all three (one sync, every
+export requested concurrently, renders in parallel). The stub computes each
+report for its range from a synthetic export of --ledgers lines, with
+--latency per request. Checks that the fan-out reports are cell for cell
+those of the separate runs.
+
+    python bench_reports.py --ledgers 5000 --periods 2 --latency 0.5
+"""
+import argparse
+import shutil
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+
+import automate
+import ledger_sync
+import pnl_history
+import tally_cache
+import tally_client
+from bench_writers import cell_formats
+from report_defs import REPORTS
+from synthetic_tally import write_synthetic_pandl
+from tally_stub_server import start_stub_server
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--ledgers", type=int, default=2_000)
+    ap.add_argument("--periods", type=int, default=2)
+    ap.add_argument("--latency", type=float, default=0.5, help="stub seconds per Tally request")
+    ap.add_argument("--renderer", choices=["classic", "stream"], default="classic")
+    args = ap.parse_args()
+
+    periods = [(datetime(2025, m, 1), datetime(2025, m, 28)) for m in range(4, 4 + args.periods)]
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        pandl = write_synthetic_pandl(tmp / "PandL.xml", args.ledgers)
+        server, url = start_stub_server(latency=args.latency, pandl_file=pandl, periodic=True)
+        tally_client.configure(url=url)
+        shutil.copy(automate.mapping_file, tmp / "ledger_mapping.xlsx")
+        ledger_sync.configure(mapping_file=tmp / "ledger_mapping.xlsx", log_file=tmp / "sync_log.txt")
+        tally_cache.configure(enabled=False)
+        pnl_history.configure(history_file=tmp / "pnl_history.db")
+
+        def run(reports, output_dir):
+            before = server.request_count
+            t0 = time.perf_counter()
+            with redirect_stdout(StringIO()):
+                written = automate.run_batch(periods, output_dir, renderer=args.renderer,
+                                             exports_dir=tmp / "exports", reports=reports)
+            return written, time.perf_counter() - t0, server.request_count - before
+
+        print(f"{args.periods} periods × {len(REPORTS)} reports, {args.ledgers:,} ledger lines, "
+              f"{args.latency}s Tally latency")
+        print(f"   {'run':<28} {'seconds':>8} {'requests':>9} {'reports':>8}")
+        try:
+            separate, total, requests = [], 0.0, 0
+            for key in REPORTS:
+                written, elapsed, n = run([key], tmp / "separate")
+                separate += written
+                total += elapsed
+                requests += n
+                print(f"   {'  ' + key:<28} {elapsed:>8.2f} {n:>9} {len(written):>8}")
+            print(f"   {'one run per report':<28} {total:>8.2f} {requests:>9} {len(separate):>8}")
+            fanned, elapsed, n = run(list(REPORTS), tmp / "fan_out")
+            print(f"   {'one fan-out run':<28} {elapsed:>8.2f} {n:>9} {len(fanned):>8}   "
+                  f"{total / elapsed:.1f}x faster")
+        finally:
+            server.shutdown()
+
+        by_name = {path.name: path for path in separate}
+        differ = [path.name for path in fanned if cell_formats(path) != cell_formats(by_name.get(path.name, path))]
+        missing = set(by_name) - {path.name for path in fanned}
+        ok = not differ and not missing and len(fanned) == len(periods) * len(REPORTS)
+        print("\n✅ fan-out reports match the separate runs" if ok
+              else f"\n❌ fan-out reports differ: {sorted(differ)} missing: {sorted(missing)}")
+
+
+if __name__ == "__main__":
+    main()
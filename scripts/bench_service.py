@@ -0,0 +1,110 @@
+# bench_service.py
+"""
+Per-report latency: a cold `automate.py --period` process (interpreter,
+imports, templates, mapping sync, fetch, render) vs. a job submitted to the
+warm VEGA service over HTTP (fetch and render only). The stub serves a
+synthetic export of --ledgers lines with --latency per request. Both sides
+use their own copy of the mapping in a temporary folder and --refresh, so
+every report is fetched from the stub.
+
+    python bench_service.py --ledgers 5000 --reports 5 --latency 0.5
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import requests
+
+import automate
+from synthetic_tally import write_synthetic_pandl
+from tally_stub_server import start_stub_server
+from vega_service import start_service, stop_service
+
+# what `automate.py --period ... --refresh` does, with the workspace's mapping, cache and exports folder
+COLD_RUN = """
+import sys
+import automate, ledger_sync, pnl_history, tally_cache, tally_client
+ledger_sync.configure(mapping_file=sys.argv[1], log_file=sys.argv[2] + "/updated_mapping_log.txt")
+tally_cache.configure(cache_dir=sys.argv[2] + "/.tally_cache")
+pnl_history.configure(history_file=sys.argv[2] + "/exports/pnl_history.db")
+tally_client.configure(url=sys.argv[4])
+automate.run_batch([automate.parse_period(sys.argv[3])], sys.argv[2], exports_dir=sys.argv[2] + "/exports",
+                   refresh=True)
+"""
+
+
+def cold_report(workspace, url, period):
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", COLD_RUN, str(workspace / "ledger_mapping.xlsx"), str(workspace),
+                    period, url], cwd=Path(__file__).parent, check=True, stdout=subprocess.DEVNULL,
+                   env={**os.environ, "PYTHONPATH": str(Path(__file__).parent)})
+    return time.perf_counter() - t0
+
+
+def service_report(url, from_date, to_date):
+    t0 = time.perf_counter()
+    job = requests.post(f"{url}/jobs", json={"from": from_date, "to": to_date, "refresh": True}).json()
+    with requests.get(f"{url}/jobs/{job['id']}/events", stream=True) as events:
+        for line in events.iter_lines():
+            if line:
+                job = json.loads(line)
+    return time.perf_counter() - t0, job
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--ledgers", type=int, default=5_000)
+    ap.add_argument("--reports", type=int, default=5)
+    ap.add_argument("--latency", type=float, default=0.5, help="stub seconds per Tally request")
+    args = ap.parse_args()
+
+    months = [(f"01-{m:02d}-2025", f"28-{m:02d}-2025") for m in range(1, args.reports + 1)]
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        pandl = write_synthetic_pandl(tmp / "PandL.xml", args.ledgers)
+        stub, tally_url = start_stub_server(latency=args.latency, pandl_file=pandl)
+        print(f"{args.reports} reports × {args.ledgers:,} ledger lines, {args.latency}s Tally latency")
+        try:
+            cold_dir = tmp / "cold"
+            cold_dir.mkdir()
+            shutil.copy(automate.mapping_file, cold_dir / "ledger_mapping.xlsx")
+            cold_report(cold_dir, tally_url, "01-12-2024:28-12-2024")   # first full ledger sync, not timed
+            cold = [cold_report(cold_dir, tally_url, f"{f}:{t}") for f, t in months]
+
+            warm_dir = tmp / "warm"
+            warm_dir.mkdir()
+            shutil.copy(automate.mapping_file, warm_dir / "ledger_mapping.xlsx")
+            company = {"name": "bench", "slug": "bench", "tally_url": tally_url,
+                       "mapping_file": str(warm_dir / "ledger_mapping.xlsx"), "templates": {},
+                       "exports_dir": str(warm_dir / "exports"), "output_dir": str(warm_dir), "periods": []}
+            t0 = time.perf_counter()
+            server, url = start_service([company], service_dir=warm_dir / "service")
+            startup = time.perf_counter() - t0
+            try:
+                warm, jobs = zip(*(service_report(url, f, t) for f, t in months))
+            finally:
+                stop_service(server)
+        finally:
+            stub.shutdown()
+
+    failed = [job["id"] for job in jobs if job["status"] != "done"]
+    fetch = statistics.median(job["timings"].get("fetch", 0.0) for job in jobs)
+    render = statistics.median(sum(v for k, v in job["timings"].items() if k in ("parse", "body", "merge", "render"))
+                               for job in jobs)
+    print(f"   cold CLI run   {statistics.median(cold):>7.2f}s per report (median)")
+    print(f"   warm service   {statistics.median(warm):>7.2f}s per report (median)   "
+          f"({statistics.median(cold) / statistics.median(warm):.1f}x)   "
+          f"fetch {fetch:.2f}s + render {render:.2f}s")
+    print(f"   service start  {startup:>7.2f}s once (workers, templates, mapping sync)")
+    print("✅ all service jobs done" if not failed else f"❌ failed jobs: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+# bench_suite.py
+"""
+Reproducible benchmark suite for the whole pipeline, fully offline.
+
+A seeded workload (realistic P&L export, mapping file, header/footer
+templates; see synthetic_tally) is generated into a temp folder, served by
+the local Tally stub, and every stage is timed (median of --repeat runs) and
+memory-profiled (tracemalloc peak, one extra run):
+
+    fetch          POST the P&L request to the stub (tally_client)
+    parse_dom      automate.parse_tally_xml
+    parse_stream   tally_xml_stream.parse_tally_xml_stream
+    mapping_cold   mapping store: first import of the xlsx
+    mapping_warm   mapping store: unchanged xlsx
+    translate      automate.translate_and_filter
+    template       template_cache.compile_template (header + footer)
+    body           automate.build_kannada_body (insert_data)
+    merge          merge_header_footer.copy_all_parts (copy_sheet_to)
+    render_stream  stream_renderer.write_final_pnl_stream
+
+Results can be saved as a JSON baseline and later runs compared against it;
+stages slower (or hungrier) than the baseline by more than --threshold are
+flagged and the exit code is 1.
+
+    python bench_suite.py --preset small --save-baseline
+    python bench_suite.py --preset small --compare            # after a change
+    python bench_suite.py --preset medium --repeat 5 --json output/bench_medium.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+
+import openpyxl
+
+base_dir = Path(__file__).parent.parent
+BASELINE_DIR = base_dir / "benchmarks"
+THRESHOLD = 0.15       # flag stages more than 15% slower / hungrier than the baseline
+MIN_SECONDS = 0.005    # stages faster than this are too noisy to flag on time
+
+PRESETS = {
+    #          ledgers, mapping rows, template rows
+    "small":  (1_000, 2_000, 10),
+    "medium": (20_000, 40_000, 40),
+    "large":  (200_000, 400_000, 200),
+}
+STAGES = ["fetch", "parse_dom", "parse_stream", "mapping_cold", "mapping_warm", "translate",
+          "template", "body", "merge", "render_stream"]
+
+
+class Workload:
+    """Generated inputs plus the state each stage hands to the next."""
+
+    def __init__(self, root, ledgers, mapping_rows, template_rows, seed):
+        from synthetic_tally import (expected_ledgers, generate_pandl, ledger_names, write_mapping_xlsx,
+                                     write_pandl, write_template_xlsx)
+        self.root = Path(root)
+        self.params = {"ledgers": ledgers, "mapping_rows": mapping_rows,
+                       "template_rows": template_rows, "seed": seed}
+        tree = generate_pandl(ledgers, seed=seed)
+        self.xml_file = write_pandl(self.root / "PandL.xml", tree, seed=seed)
+        self.expected = expected_ledgers(tree)
+        self.mapping_file = write_mapping_xlsx(self.root / "ledger_mapping.xlsx", ledger_names(tree),
+                                               size=mapping_rows, seed=seed)
+        self.header_file = write_template_xlsx(self.root / "header_template.xlsx", template_rows, seed=seed)
+        self.footer_file = write_template_xlsx(self.root / "footer_template.xlsx", template_rows,
+                                               placeholder=False, seed=seed + 1)
+        self.runs = 0
+
+    # --- stages -------------------------------------------------------
+    def fetch(self):
+        import tally_client
+        from tally_pandl_export import build_pandl_request
+        return tally_client.post_xml(build_pandl_request("20250401", "20250430")).content
+
+    def parse_dom(self):
+        import automate
+        automate.xml_file = self.xml_file
+        return automate.parse_tally_xml()
+
+    def parse_stream(self):
+        from tally_xml_stream import parse_tally_xml_stream
+        self.income, self.expense = parse_tally_xml_stream(self.xml_file)
+        return self.income, self.expense
+
+    def mapping_cold(self):
+        from mapping_store import open_mapping_store
+        self.runs += 1
+        db = self.root / f"mapping_{self.runs}.db"   # fresh store every run
+        with open_mapping_store(db, self.mapping_file) as store:
+            self.mapping_db = db
+            self.mapping_dict = store.as_dict()
+        return self.mapping_dict
+
+    def mapping_warm(self):
+        from mapping_store import open_mapping_store
+        with open_mapping_store(self.mapping_db, self.mapping_file) as store:
+            return store.as_dict()
+
+    def translate(self):
+        from automate import translate_and_filter
+        self.income_kn = translate_and_filter(self.income, self.mapping_dict)
+        self.expense_kn = translate_and_filter(self.expense, self.mapping_dict)
+        return self.income_kn, self.expense_kn
+
+    def template(self):
+        from template_cache import compile_template
+        return compile_template(self.header_file), compile_template(self.footer_file)
+
+    def body(self):
+        from automate import build_kannada_body
+        self.wb_body = build_kannada_body(self.income_kn, self.expense_kn, "ಏಪ್ರಿಲ್ 2025")
+        return self.wb_body
+
+    def merge(self):
+        from merge_header_footer import copy_all_parts
+        copy_all_parts(self.header_file, self.wb_body, self.footer_file, self.root / "final_classic.xlsx",
+                       month_year_kn="ಏಪ್ರಿಲ್ 2025")
+
+    def render_stream(self):
+        from stream_renderer import write_final_pnl_stream
+        write_final_pnl_stream(self.income_kn, self.expense_kn, "ಏಪ್ರಿಲ್ 2025", self.root / "final_stream.xlsx",
+                               header_path=self.header_file, footer_path=self.footer_file)
+
+
+def _measure(fn, repeat):
+    """(median seconds over repeat runs, tracemalloc peak KB of one more run)."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(times), peak / 1024
+
+
+def run_suite(ledgers, mapping_rows, template_rows, repeat=3, seed=0, stages=None):
+    """Generate the workload, run every stage against a local Tally stub, return the results dict."""
+    import tally_client
+    import template_cache
+    from tally_stub_server import start_stub_server
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        template_cache.CACHE_DIR = Path(tmp) / "template_cache"
+        print(f"Generating workload: {ledgers:,} ledgers, {mapping_rows:,} mapping rows, "
+              f"{template_rows} template rows (seed {seed})")
+        work = Workload(tmp, ledgers, mapping_rows, template_rows, seed)
+        server, url = start_stub_server(pandl_file=work.xml_file)
+        tally_client.configure(url=url)
+        try:
+            for stage in STAGES:
+                fn = getattr(work, stage)
+                with redirect_stdout(StringIO()):
+                    if stages and stage not in stages:
+                        fn()   # still run it: later stages depend on its output
+                        continue
+                    seconds, peak_kb = _measure(fn, repeat)
+                results[stage] = {"seconds": round(seconds, 5), "peak_kb": round(peak_kb, 1)}
+                print(f"   {stage:<14} {seconds:>9.4f}s   peak {peak_kb / 1024:>8.1f} MB")
+            ok = work.parse_dom() == work.expected and (work.income, work.expense) == work.expected
+            print("✅ Parsers match the generated export" if ok else "❌ Parser output differs from the generated export")
+        finally:
+            server.shutdown()
+
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "openpyxl": openpyxl.__version__,
+            "repeat": repeat,
+            **work.params,
+        },
+        "parsers_ok": ok,
+        "stages": results,
+    }
+
+
+def compare(current, baseline, threshold=THRESHOLD):
+    """Print a comparison table; return the list of regressed (stage, metric) pairs."""
+    regressions = []
+    print(f"\nvs. baseline from {baseline['meta'].get('created')} (threshold {threshold:.0%})")
+    print(f"   {'stage':<14} {'seconds':>18} {'peak MB':>20}")
+    for stage, cur in current["stages"].items():
+        base = baseline["stages"].get(stage)
+        if base is None:
+            print(f"   {stage:<14} (not in baseline)")
+            continue
+        flags = []
+        dt = cur["seconds"] / base["seconds"] - 1 if base["seconds"] else 0.0
+        dm = cur["peak_kb"] / base["peak_kb"] - 1 if base["peak_kb"] else 0.0
+        if dt > threshold and max(cur["seconds"], base["seconds"]) >= MIN_SECONDS:
+            flags.append("time")
+            regressions.append((stage, "seconds"))
+        if dm > threshold:
+            flags.append("memory")
+            regressions.append((stage, "peak_kb"))
+        status = f"❌ {' + '.join(flags)} regression" if flags else "✅"
+        print(f"   {stage:<14} {cur['seconds']:>9.4f}s {dt:>+7.1%} {cur['peak_kb'] / 1024:>10.1f} {dm:>+7.1%}  {status}")
+    if baseline["meta"].get("platform") != current["meta"]["platform"]:
+        print("⚠️ Baseline was recorded on a different platform; timings may not be comparable.")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    ap.add_argument("--ledgers", type=int, help="override the preset's ledger count")
+    ap.add_argument("--mapping-rows", type=int, help="override the preset's mapping file size")
+    ap.add_argument("--template-rows", type=int, help="override the preset's header/footer size")
+    ap.add_argument("--repeat", type=int, default=3, help="timed runs per stage (median is reported)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--stage", action="append", choices=STAGES, help="only measure these stages (repeatable)")
+    ap.add_argument("--json", help="also write this run's results to PATH")
+    ap.add_argument("--baseline", help="baseline file (default: benchmarks/baseline_<preset>.json)")
+    ap.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    ap.add_argument("--compare", action="store_true", help="compare with the baseline and flag regressions")
+    ap.add_argument("--threshold", type=float, default=THRESHOLD, help="regression threshold (0.15 = 15%%)")
+    args = ap.parse_args()
+
+    ledgers, mapping_rows, template_rows = PRESETS[args.preset]
+    current = run_suite(args.ledgers or ledgers, args.mapping_rows or mapping_rows,
+                        args.template_rows or template_rows, args.repeat, args.seed, args.stage)
+    current["meta"]["preset"] = args.preset
+
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json).write_text(json.dumps(current, indent=2), encoding="utf-8")
+
+    baseline_file = Path(args.baseline) if args.baseline else BASELINE_DIR / f"baseline_{args.preset}.json"
+    failed = not current["parsers_ok"]
+    if args.compare:
+        if not baseline_file.exists():
+            print(f"⚠️ No baseline at {baseline_file}. Run with --save-baseline first.")
+            failed = True
+        else:
+            baseline = json.loads(baseline_file.read_text(encoding="utf-8"))
+            if baseline["meta"].get("ledgers") != current["meta"]["ledgers"]:
+                print("⚠️ Baseline was recorded with a different workload size.")
+            failed = bool(compare(current, baseline, args.threshold)) or failed
+    if args.save_baseline:
+        baseline_file.parent.mkdir(parents=True, exist_ok=True)
+        baseline_file.write_text(json.dumps(current, indent=2), encoding="utf-8")
+        print(f"💾 Baseline saved → {baseline_file}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# bench_tally_cache.py
+"""
+Re-running the same periods (e.g. after fixing mappings) with the Tally
+response cache: first run (cache empty), re-run with nothing altered in Tally
+(one status request, no exports), and --offline (no Tally at all). The stub
+serves a synthetic export of --ledgers lines with --latency per request,
+roughly what a large company's P&L costs Tally to compute.
+
+    python bench_tally_cache.py --ledgers 20000 --periods 3 --latency 1.0
+"""
+import argparse
+import shutil
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+
+import automate
+import ledger_sync
+import pnl_history
+import tally_cache
+import tally_client
+from synthetic_tally import write_synthetic_pandl
+from tally_stub_server import start_stub_server
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--ledgers", type=int, default=5_000)
+    ap.add_argument("--periods", type=int, default=3)
+    ap.add_argument("--latency", type=float, default=0.5, help="stub seconds per Tally request")
+    args = ap.parse_args()
+
+    periods = [(datetime(2025, m, 1), datetime(2025, m, 28)) for m in range(1, args.periods + 1)]
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        pandl = write_synthetic_pandl(tmp / "PandL.xml", args.ledgers)
+        server, url = start_stub_server(latency=args.latency, pandl_file=pandl)
+        tally_client.configure(url=url)
+        shutil.copy(automate.mapping_file, tmp / "ledger_mapping.xlsx")
+        ledger_sync.configure(mapping_file=tmp / "ledger_mapping.xlsx", log_file=tmp / "sync_log.txt")
+        tally_cache.configure(cache_dir=tmp / "cache")
+        pnl_history.configure(history_file=tmp / "pnl_history.db")
+
+        print(f"{args.periods} periods × {args.ledgers:,} ledger lines, {args.latency}s Tally latency")
+        try:
+            for label, kwargs in [("first run", {}), ("re-run", {}), ("offline", {"offline": True})]:
+                before = server.pandl_requests
+                t0 = time.perf_counter()
+                with redirect_stdout(StringIO()):
+                    written = automate.run_batch(periods, tmp / "output", exports_dir=tmp / "exports", **kwargs)
+                elapsed = time.perf_counter() - t0
+                print(f"   {label:<10} {elapsed:>7.2f}s   {server.pandl_requests - before} P&L exports   "
+                      f"{len(written)} reports")
+        finally:
+            server.shutdown()
+        with tally_cache.open_response_cache() as cache:
+            entries, size = cache.size()
+        print(f"   cache: {entries} entries, {size / 1024:.0f} KB compressed "
+              f"(export {pandl.stat().st_size / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
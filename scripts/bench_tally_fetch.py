@@ -0,0 +1,75 @@
+# bench_tally_fetch.py
+"""
+Sequential bare requests.post (the old behaviour) vs. the pooled, concurrent
+tally_client.fetch_many, against the local Tally stub with artificial latency.
+
+    python bench_tally_fetch.py --periods 12 --latency 0.5 --workers 4
+"""
+import argparse
+import time
+from datetime import datetime
+
+import requests
+
+import tally_client
+from ledger_sync import LEDGER_REQUEST_XML
+from tally_pandl_export import build_pandl_request
+from tally_stub_server import start_stub_server
+from tally_xml_stream import parse_tally_xml_stream
+
+
+def _requests(n_periods):
+    reqs = {"ledgers": LEDGER_REQUEST_XML}
+    for month in range(n_periods):
+        year = 2024 + (3 + month) // 12
+        m = (3 + month) % 12 + 1
+        start = datetime(year, m, 1)
+        reqs[f"{start:%Y%m}"] = build_pandl_request(start.strftime("%Y%m%d"), start.strftime("%Y%m28"))
+    return reqs
+
+
+def sequential(url, reqs):
+    for key, xml in reqs.items():
+        res = requests.post(url, data=xml)
+        res.raise_for_status()
+        if key != "ledgers":
+            parse_tally_xml_stream([res.content])
+
+
+def concurrent(reqs, workers):
+    for key, content, error in tally_client.fetch_many(reqs, max_workers=workers):
+        if error is not None:
+            raise error
+        if key != "ledgers":
+            parse_tally_xml_stream([content])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--periods", type=int, default=12)
+    ap.add_argument("--latency", type=float, default=0.5, help="stub latency per request (seconds)")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--pandl", help="P&L export the stub serves")
+    args = ap.parse_args()
+
+    server, url = start_stub_server(latency=args.latency, pandl_file=args.pandl)
+    tally_client.configure(url=url, pool_size=args.workers)
+    reqs = _requests(args.periods)
+    try:
+        t0 = time.perf_counter()
+        sequential(url, reqs)
+        t_seq = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        concurrent(reqs, args.workers)
+        t_conc = time.perf_counter() - t0
+    finally:
+        server.shutdown()
+
+    print(f"{len(reqs)} requests, stub latency {args.latency}s")
+    print(f"   sequential  {t_seq:8.3f}s")
+    print(f"   concurrent  {t_conc:8.3f}s  ({args.workers} workers, x{t_seq / t_conc:.1f})")
+
+
+if __name__ == "__main__":
+    main()
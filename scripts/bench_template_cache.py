@@ -0,0 +1,96 @@
+# bench_template_cache.py
+"""
+Template loading cold vs. warm: every run used to parse header, body and
+footer templates from xlsx; now they come from template_cache.
+
+Each measurement runs in a fresh process (no in-process memo):
+    parse   load_workbook() on all three templates (the old per-run cost)
+    cold    load_template() with an empty cache (compile + write pickle)
+    warm    load_template() with the pickles already on disk
+plus a full render of a typical report (60 ledger rows) cold and warm.
+
+    python bench_template_cache.py
+    python bench_template_cache.py --repeat 10 --rows 60
+"""
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+TEMPLATES = ["header_template.xlsx", "template_kannada.xlsx", "footer_template.xlsx"]
+
+
+def _run_child(mode, cache_dir, rows, renderer):
+    import template_cache
+    template_cache.CACHE_DIR = Path(cache_dir)
+    config = template_cache.base_dir / "config"
+    from openpyxl import load_workbook
+    from bench_renderers import render
+
+    t0 = time.perf_counter()
+    if mode == "parse":
+        for name in TEMPLATES:
+            load_workbook(config / name)
+    elif mode == "load":
+        for name in TEMPLATES:
+            template_cache.load_template(config / name)
+    else:
+        render(renderer, rows, Path(cache_dir) / f"render_{renderer}.xlsx")
+    print(json.dumps({"seconds": time.perf_counter() - t0}))
+
+
+def _child(mode, cache_dir, rows=0, renderer="classic"):
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", mode, str(cache_dir), str(rows), renderer],
+        capture_output=True, text=True, check=True, cwd=Path(__file__).parent,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])["seconds"]
+
+
+def _best(fn, repeat):
+    return min(fn() for _ in range(repeat))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=5, help="best of N runs per measurement")
+    ap.add_argument("--rows", type=int, default=60, help="ledger rows for the full-render measurement")
+    ap.add_argument("--child", nargs=4, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        mode, cache_dir, rows, renderer = args.child
+        _run_child(mode, cache_dir, int(rows), renderer)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = Path(tmp) / "cache"
+
+        def cold(mode, renderer="classic"):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            return _child(mode, cache_dir, args.rows, renderer)
+
+        def warm(mode, renderer="classic"):
+            return _child(mode, cache_dir, args.rows, renderer)
+
+        t_parse = _best(lambda: _child("parse", cache_dir), args.repeat)
+        t_cold = _best(lambda: cold("load"), args.repeat)
+        t_warm = _best(lambda: warm("load"), args.repeat)
+        print(f"Templates (3 files, best of {args.repeat})")
+        print(f"   xlsx parse     {t_parse * 1000:>8.1f} ms")
+        print(f"   cache cold     {t_cold * 1000:>8.1f} ms")
+        print(f"   cache warm     {t_warm * 1000:>8.1f} ms   ({t_parse / t_warm:.1f}x faster than parsing)")
+
+        print(f"\nFull render, {args.rows} ledger rows")
+        for renderer in ("classic", "stream"):
+            r_cold = _best(lambda: cold("render", renderer), args.repeat)
+            r_warm = _best(lambda: warm("render", renderer), args.repeat)
+            print(f"   {renderer:<8} cold {r_cold * 1000:>8.1f} ms   warm {r_warm * 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# bench_translate.py
+"""
+Row-by-row translate_and_filter vs. the columnar path (ledger_frame) on
+synthetic parsed lines: plain translation (same output check), and
+duplicate aggregation plus the unmapped report vs. the same done in a
+Python loop. Names repeat (ledgers listed under several groups) and about
+--coverage of them are mapped.
+
+    python bench_translate.py                        # 1,000,000 lines
+    python bench_translate.py --lines 100000 --repeat 5
+"""
+import argparse
+import random
+import statistics
+import time
+
+import automate
+from ledger_frame import UnmappedReport, translate_frame
+
+
+def make_lines(n_lines, n_ledgers, coverage, seed=0):
+    rng = random.Random(seed)
+    names = [f"  Ledger {i} {rng.choice(['Rent', 'Salary', 'Pooja', 'ಸೇವೆ'])} " if i % 7 == 0
+             else f"Ledger {i} {rng.choice(['Rent', 'Salary', 'Pooja', 'ಸೇವೆ'])}" for i in range(n_ledgers)]
+    mapping = {n.strip().lower(): f"ಕನ್ನಡ {n.strip()}" for n in names if rng.random() < coverage}
+    lines = [(rng.choice(names), 0.0 if rng.random() < 0.05 else round(rng.uniform(1, 100000), 2))
+             for _ in range(n_lines)]
+    return lines, mapping
+
+
+def aggregate_rows(data, mapping_dict):
+    """Row-loop equivalent of translate_frame(aggregate=True): summed rows and unmapped totals."""
+    sums, unmapped = {}, {}
+    for name, amt in data:
+        if amt == 0:
+            continue
+        key = name.strip().lower()
+        if key in mapping_dict:
+            sums[key] = sums.get(key, 0.0) + amt
+        else:
+            entry = unmapped.setdefault(key, [name.strip(), 0, 0.0])
+            entry[1] += 1
+            entry[2] += amt
+    return [(mapping_dict[k], v) for k, v in sums.items()], unmapped
+
+
+def _median(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times), result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--lines", type=int, default=1_000_000)
+    ap.add_argument("--ledgers", type=int, help="distinct ledger names (default: lines / 4)")
+    ap.add_argument("--coverage", type=float, default=0.9, help="share of ledgers with a mapping")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    lines, mapping = make_lines(args.lines, args.ledgers or max(1, args.lines // 4), args.coverage)
+    print(f"{len(lines):,} lines, {len(mapping):,} mappings, median of {args.repeat}")
+
+    t_rows, rows = _median(lambda: automate.translate_and_filter(lines, mapping), args.repeat)
+    t_cols, (cols, _) = _median(lambda: translate_frame(lines, mapping), args.repeat)
+    t_loop_agg, (loop_agg, _) = _median(lambda: aggregate_rows(lines, mapping), args.repeat)
+    t_agg, (agg, unmapped) = _median(lambda: translate_frame(lines, mapping, aggregate=True), args.repeat)
+    report = UnmappedReport()
+    report.add(unmapped, "income")
+    # both keep first-seen order; sums may differ in the last bits (summation order)
+    same_sums = len(loop_agg) == len(agg) and all(
+        a[0] == b[0] and abs(a[1] - b[1]) < 0.005 for a, b in zip(loop_agg, agg))
+
+    print("   translate")
+    print(f"      row loop       {t_rows:8.3f}s   {len(rows):,} rows")
+    print(f"      columnar       {t_cols:8.3f}s   {len(cols):,} rows   ({t_rows / t_cols:.1f}x)   "
+          f"{'✅ same output' if cols == rows else '❌ output differs'}")
+    print("   translate + sum duplicates + unmapped report")
+    print(f"      row loop       {t_loop_agg:8.3f}s   {len(loop_agg):,} rows")
+    print(f"      columnar       {t_agg:8.3f}s   {len(agg):,} rows   ({t_loop_agg / t_agg:.1f}x)   "
+          f"{'✅ same sums' if same_sums else '❌ sums differ'}")
+    print(f"   unmapped: {len(report):,} ledgers, {int(unmapped['lines'].sum()):,} lines dropped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# bench_writers.py
+"""
+openpyxl vs XlsxWriter behind the classic path (generate_kannada_pnl body,
+build_kannada_body + copy_all_parts) and the stream renderer: ledger rows
+written per second at each size, plus a parity check of the cell values
+and formats both writers produce.
+
+    python bench_writers.py                          # 1k, 20k, 100k rows
+    python bench_writers.py --sizes 2000 --check     # parity only
+"""
+import argparse
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+import automate
+from bench_renderers import synthetic_rows
+from excel_writers import WRITERS, writer_available
+from merge_header_footer import copy_all_parts
+from stream_renderer import write_final_pnl_stream
+
+DEFAULT_SIZES = [1_000, 20_000, 100_000]
+
+
+def _color(color):
+    return color.rgb if color is not None and color.type == "rgb" else None
+
+
+def cell_formats(path):
+    """Per cell: value and the formats Excel shows; plus column widths and merged ranges."""
+    ws = load_workbook(path).active
+    cells = {}
+    for row in ws.iter_rows():
+        for c in row:
+            if c.value is None and not c.has_style:
+                continue
+            f, a, b = c.font, c.alignment, c.border
+            fmt = (c.number_format, f.name, f.sz, bool(f.b), bool(f.i), f.u, _color(f.color),
+                   a.horizontal, a.vertical, bool(a.wrap_text), a.indent or 0, a.text_rotation or 0,
+                   tuple(getattr(b, side).style for side in ("left", "right", "top", "bottom")),
+                   c.fill.patternType, c.protection.locked)
+            if fmt == ("General", "Calibri", 11, False, False, None, None,
+                       None, None, False, 0, 0, (None, None, None, None), None, True):
+                fmt = None  # the default format, however the library spells it out
+            if c.value is None and fmt is None:
+                continue
+            cells[c.coordinate] = (c.value, fmt)
+    widths = {k: round(d.width, 2) for k, d in ws.column_dimensions.items() if d.width}
+    return cells, widths, sorted(str(r) for r in ws.merged_cells.ranges)
+
+
+def check_parity(n, tmp, writers):
+    income, expense = synthetic_rows(n)
+    month = automate.get_month_year_kn()
+    ok = True
+    for label, render in [
+        ("body", lambda out, w: automate.generate_kannada_pnl(income, expense, month, output=out, writer=w)),
+        ("classic", lambda out, w: copy_all_parts(automate.header_file,
+                                                  automate.build_kannada_body(income, expense, month),
+                                                  automate.footer_file, out, month_year_kn=month, writer=w)),
+        ("stream", lambda out, w: write_final_pnl_stream(income, expense, month, out, writer=w)),
+    ]:
+        signatures = {}
+        for writer in writers:
+            out = Path(tmp) / f"parity_{label}_{writer}.xlsx"
+            with redirect_stdout(StringIO()):
+                render(out, writer)
+            signatures[writer] = cell_formats(out)
+        base = signatures["openpyxl"]
+        for writer, sig in signatures.items():
+            if writer == "openpyxl":
+                continue
+            diffs = [k for k in set(base[0]) | set(sig[0]) if base[0].get(k) != sig[0].get(k)]
+            same = not diffs and base[1:] == sig[1:]
+            ok &= same
+            print(f"   {'✅' if same else '❌'} {label:<8} {writer} vs openpyxl: {len(base[0]):,} cells"
+                  + ("" if same else f", {len(diffs)} differ (e.g. {sorted(diffs)[:3]})"
+                     + ("" if base[1] == sig[1] else ", widths differ")
+                     + ("" if base[2] == sig[2] else ", merges differ")))
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="ledger rows per report")
+    ap.add_argument("--check", action="store_true", help="only run the parity check")
+    args = ap.parse_args()
+
+    writers = [w for w in WRITERS if writer_available(w)]
+    if len(writers) < len(WRITERS):
+        print(f"⚠️ not installed: {', '.join(w for w in WRITERS if w not in writers)} (pip install xlsxwriter)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Parity ({min(args.sizes):,} rows):")
+        ok = check_parity(min(args.sizes), tmp, writers)
+        if args.check:
+            raise SystemExit(0 if ok else 1)
+
+        month = automate.get_month_year_kn()
+        print(f"\n{'rows':>8}  {'path':<8} {'writer':<11} {'seconds':>8} {'rows/s':>10} {'size KB':>8}")
+        for n in args.sizes:
+            income, expense = synthetic_rows(n)
+            paths = [
+                ("body", lambda out, w: automate.generate_kannada_pnl(income, expense, month, output=out, writer=w)),
+                ("classic", lambda out, w: copy_all_parts(automate.header_file,
+                                                          automate.build_kannada_body(income, expense, month),
+                                                          automate.footer_file, out, month_year_kn=month,
+                                                          writer=w)),
+                ("stream", lambda out, w: write_final_pnl_stream(income, expense, month, out, writer=w)),
+            ]
+            for label, render in paths:
+                for writer in writers:
+                    out = Path(tmp) / f"{label}_{writer}_{n}.xlsx"
+                    t0 = time.perf_counter()
+                    with redirect_stdout(StringIO()):
+                        render(out, writer)
+                    elapsed = time.perf_counter() - t0
+                    print(f"{n:>8,}  {label:<8} {writer:<11} {elapsed:>8.2f} {n / elapsed:>10,.0f} "
+                          f"{out.stat().st_size / 1024:>8,.0f}")
+                    out.unlink()
+        print("\n✅ writers agree on every cell value and format" if ok else "\n❌ writer outputs differ (see above)")
+
+
+if __name__ == "__main__":
+    main()
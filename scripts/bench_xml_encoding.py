@@ -0,0 +1,128 @@
+# bench_xml_encoding.py
+"""
+tally_xml_stream's reader on exports in the encodings Tally produces: clean
+UTF-8 (memory-mapped, zero-copy), UTF-8 with a BOM, UTF-16 and a "dirty"
+UTF-8 export with control characters, &#4; references and stray
+Windows-1252 bytes (both transcoded on the fly). For each size and variant:
+parse time, throughput and peak RSS, each in its own process; RSS should
+stay flat as the export grows. Every variant must parse to the same ledgers
+as the clean export.
+
+    python bench_xml_encoding.py                  # 10k, 100k, 1M ledger lines
+    python bench_xml_encoding.py --sizes 10000 --check
+"""
+import argparse
+import codecs
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench_parse_tally_xml import _peak_rss_mb
+from synthetic_tally import write_synthetic_pandl
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def _dirty(line):
+    # what older Tally releases emit: raw control characters, references to
+    # them, and ledger names typed in a legacy code page
+    return (line.replace(b"<DSPDISPNAME>", b"<DSPDISPNAME>\x04&#4;")
+            .replace(b"Ledger", b"Ledg\xe9r"))
+
+
+VARIANTS = {
+    "utf-8": lambda lines: lines,
+    "utf-8 bom": lambda lines: _with_first(codecs.BOM_UTF8, lines),
+    "utf-16": lambda lines: _with_first(codecs.BOM_UTF16_LE, (line.decode("utf-8").encode("utf-16-le")
+                                                              for line in lines)),
+    "dirty": lambda lines: (_dirty(line) for line in lines),
+}
+
+
+def _with_first(first, rest):
+    yield first
+    yield from rest
+
+
+def write_variant(clean, path, variant):
+    with open(clean, "rb") as src, open(path, "wb") as out:
+        for data in VARIANTS[variant](iter(src.readline, b"")):
+            out.write(data)
+    return path
+
+
+def _run_child(xml_path):
+    """Stream one export in this process and print a JSON result line."""
+    from tally_xml_stream import iter_ledger_amounts
+
+    rss_before = _peak_rss_mb()
+    t0 = time.perf_counter()
+    ledgers = sum(1 for _ in iter_ledger_amounts(xml_path, signed=True))
+    elapsed = time.perf_counter() - t0
+    rss_after = _peak_rss_mb()
+    print(json.dumps({"seconds": round(elapsed, 3), "ledgers": ledgers,
+                      "peak_rss_mb": round(rss_after, 1) if rss_after is not None else None,
+                      "rss_growth_mb": round(rss_after - rss_before, 1) if rss_after is not None else None}))
+
+
+def check_parity(clean, tmp):
+    """Every variant parses to the clean export's ledgers (names compared with the Windows-1252 é undone)."""
+    from tally_xml_stream import parse_tally_xml_stream
+
+    expected = parse_tally_xml_stream(clean)
+    ok = True
+    for variant in VARIANTS:
+        path = write_variant(clean, Path(tmp) / f"parity_{variant.replace(' ', '_')}.xml", variant)
+        got = parse_tally_xml_stream(path)
+        if variant == "dirty":
+            got = tuple([(name.replace("Ledgér", "Ledger"), amt) for name, amt in rows] for rows in got)
+        same = got == expected
+        ok &= same
+        print(f"   {'✅' if same else '❌'} {variant:<10} {sum(map(len, got)):,} ledgers")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="ledger lines per export")
+    ap.add_argument("--check", action="store_true", help="only run the parity check")
+    ap.add_argument("--child", metavar="XML", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        _run_child(args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        if not args.check:
+            # before the parity check: a child process starts from its parent's peak RSS
+            print(f"{'ledgers':>10}  {'variant':<10} {'file MB':>8} {'seconds':>8} {'MB/s':>7} "
+                  f"{'peak RSS MB':>12} {'growth':>7}")
+            for n in args.sizes:
+                clean = write_synthetic_pandl(tmp / f"pandl_{n}.xml", n)
+                for variant in VARIANTS:
+                    path = write_variant(clean, tmp / f"pandl_{n}_{variant.replace(' ', '_')}.xml", variant)
+                    out = subprocess.run([sys.executable, __file__, "--child", str(path)],
+                                         capture_output=True, text=True, check=True, cwd=Path(__file__).parent)
+                    row = json.loads(out.stdout.strip().splitlines()[-1])
+                    size_mb = path.stat().st_size / (1024 * 1024)
+                    rss, growth = ((f"{row['peak_rss_mb']:.1f}", f"+{row['rss_growth_mb']:.1f}")
+                                   if row["peak_rss_mb"] is not None else ("n/a", ""))
+                    print(f"{n:>10,}  {variant:<10} {size_mb:>8.1f} {row['seconds']:>8.2f} "
+                          f"{size_mb / row['seconds']:>7.1f} {rss:>12} {growth:>7}")
+                    path.unlink()
+                clean.unlink()
+            print()
+
+        print(f"Parity ({min(args.sizes):,} ledger lines):")
+        ok = check_parity(write_synthetic_pandl(tmp / "parity.xml", min(args.sizes)), tmp)
+        print("\n✅ every encoding parses to the same ledgers" if ok else "\n❌ parsed ledgers differ (see above)")
+        raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
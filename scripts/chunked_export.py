@@ -0,0 +1,237 @@
+# chunked_export.py
+"""
+Chunked Profit & Loss export for long periods.
+
+A full financial year in one "Profit and Loss" request makes Tally compute
+everything at once, which can take minutes or time out. Here the period is
+split into month or quarter sub-ranges, these are requested concurrently
+(at most MAX_WORKERS at a time, each one cached like any other export) and
+the per-ledger BSSUBAMT values are added up. The merged result is written as
+an ordinary P&L export (ledger lines only, each under its own section header
+in the order the sub-ranges list them), so parse_tally_xml /
+parse_tally_xml_stream read it unchanged.
+
+    python chunked_export.py --from 01-04-2025 --to 31-03-2026 --chunk quarter
+    python chunked_export.py --from 01-04-2025 --to 31-03-2026 --verify   # vs. one full-range export
+"""
+import argparse
+import heapq
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+
+import instrumentation as instr
+import tally_cache
+import tally_client
+from tally_pandl_export import (EXPORT_FILE, build_pandl_request, cache_pandl, cache_status, cached_pandl,
+                                save_export)
+from tally_xml_stream import PANDL_SECTIONS, iter_ledger_amounts
+
+CHUNKS = {"month": 1, "quarter": 3}
+MAX_WORKERS = 3   # sub-range requests in flight; Tally itself computes few reports at a time
+# each P&L section header stands for itself, so merged lines keep their Direct/Indirect header
+_BY_HEADER = {header: header for header in PANDL_SECTIONS}
+
+
+def split_period(from_date, to_date, chunk="month"):
+    """
+    from_date..to_date cut at calendar month (or quarter: Jan/Apr/Jul/Oct)
+    boundaries. Returns [(from, to), ...] covering the period exactly.
+    """
+    months = CHUNKS[chunk]
+    ranges = []
+    start = from_date
+    while start <= to_date:
+        index = start.year * 12 + start.month - 1
+        next_index = (index // months + 1) * months
+        next_start = start.replace(year=next_index // 12, month=next_index % 12 + 1, day=1)
+        ranges.append((start, min(next_start - timedelta(days=1), to_date)))
+        start = next_start
+    return ranges
+
+
+def _merge_order(orders):
+    """
+    Every key of orders (lists, oldest first) once, keeping each list's relative
+    order (a topological merge). Keys no list puts in order between themselves
+    follow the latest list that has them; should the lists disagree, the
+    remaining keys come last in that order.
+    """
+    rank, following, preceding = {}, {}, {}
+    for i, order in enumerate(orders):
+        for position, key in enumerate(order):
+            rank[key] = (-i, position)
+        for a, b in zip(order, order[1:]):
+            if b not in following.setdefault(a, set()):
+                following[a].add(b)
+                preceding[b] = preceding.get(b, 0) + 1
+    ready = [(rank[key], key) for key in rank if not preceding.get(key)]
+    heapq.heapify(ready)
+    merged = []
+    while ready:
+        _, key = heapq.heappop(ready)
+        merged.append(key)
+        for b in following.get(key, ()):
+            preceding[b] -= 1
+            if not preceding[b]:
+                heapq.heappush(ready, (rank[b], b))
+    if len(merged) < len(rank):
+        done = set(merged)
+        merged += sorted((key for key in rank if key not in done), key=rank.get)
+    return merged
+
+
+class ChunkMerger:
+    """
+    Adds up the sub-range exports of one period. Tally leaves out ledgers with
+    nothing booked in a sub-range, so no single sub-range has every line in
+    place: lines keep the order all sub-ranges agree on (see _merge_order).
+    """
+
+    def __init__(self, sub_ranges):
+        self.sub_ranges = list(sub_ranges)
+        self.contents = {}
+
+    def add(self, sub_range, content):
+        self.contents[sub_range] = content
+
+    @property
+    def complete(self):
+        return len(self.contents) == len(self.sub_ranges)
+
+    def totals(self):
+        """
+        {(section header, ledger, occurrence): paise}, ordered as described
+        above; amounts are summed in paise to stay exact.
+        """
+        totals, orders = {}, []
+        for sub_range in self.sub_ranges:
+            seen, order = {}, []
+            for header, ledger, amount in iter_ledger_amounts([self.contents[sub_range]], signed=True,
+                                                              sections=_BY_HEADER):
+                # a name listed twice in one section stays two lines, as in a single export
+                n = seen[(header, ledger)] = seen.get((header, ledger), 0) + 1
+                key = (header, ledger, n)
+                order.append(key)
+                totals[key] = totals.get(key, 0) + round(amount * 100)
+            orders.append(order)
+        return {key: totals[key] for key in _merge_order(orders)}
+
+    def ledgers(self):
+        """(income, expense) lists of (ledger, amount), as parse_tally_xml returns them."""
+        income, expense = [], []
+        for (header, ledger, _), paise in self.totals().items():
+            if paise:
+                (income if PANDL_SECTIONS[header] == "income" else expense).append((ledger, abs(paise) / 100))
+        return income, expense
+
+    def to_xml(self):
+        """The merged period as a P&L export (bytes): each line under its own section header."""
+        parts = ["<ENVELOPE>\n"]
+        current = None
+        for (header, ledger, _), paise in self.totals().items():
+            if not paise:
+                continue
+            if header != current:
+                current = header
+                parts.append(f" <DSPACCNAME>\n  <DSPDISPNAME>{escape(header)}</DSPDISPNAME>\n</DSPACCNAME>\n"
+                             " <PLAMT>\n  <PLSUBAMT></PLSUBAMT>\n  <BSMAINAMT></BSMAINAMT>\n</PLAMT>\n")
+            parts.append(f" <BSNAME>\n  <DSPACCNAME>\n   <DSPDISPNAME>{escape(ledger)}</DSPDISPNAME>\n"
+                         f"</DSPACCNAME>\n</BSNAME>\n <BSAMT>\n  <BSSUBAMT>{abs(paise) / 100:.2f}</BSSUBAMT>\n"
+                         "  <BSMAINAMT></BSMAINAMT>\n</BSAMT>\n")
+        parts.append("</ENVELOPE>\n")
+        return "".join(parts).encode("utf-8")
+
+
+def fetch_pandl_chunked(from_date, to_date, chunk="month", export_file=EXPORT_FILE, refresh=False,
+                        offline=False, max_workers=None):
+    """
+    Chunked counterpart of tally_pandl_export.fetch_pandl_xml: fetch the
+    sub-ranges concurrently, merge them and save the result to export_file.
+    Returns (export_file, to_date), or None if any sub-range failed.
+    """
+    sub_ranges = split_period(from_date, to_date, chunk)
+    merger = ChunkMerger(sub_ranges)
+    cache = tally_cache.open_response_cache()
+    try:
+        status = cache_status(offline) if cache is not None else None
+        requests = {}
+        for f, t in sub_ranges:
+            content = None if refresh else cached_pandl(cache, status, f, t, offline)
+            if content is not None:
+                merger.add((f, t), content)
+            elif offline:
+                print(f"❌ No cached Profit & Loss for {f:%d-%m-%Y} to {t:%d-%m-%Y}; run once without --offline.")
+                return None
+            else:
+                requests[(f, t)] = build_pandl_request(f.strftime("%Y%m%d"), t.strftime("%Y%m%d"))
+
+        if requests:
+            print(f"Requesting Profit & Loss from {from_date:%d-%m-%Y} to {to_date:%d-%m-%Y} "
+                  f"in {len(requests)} {chunk} chunks ...")
+        with instr.stage("tally_pandl"):
+            for (f, t), content, error in tally_client.fetch_many(requests, max_workers=max_workers or MAX_WORKERS):
+                if error is not None:
+                    print(f"Failed to export {f:%d-%m-%Y} to {t:%d-%m-%Y}: {error}")
+                    return None
+                cache_pandl(cache, status, f, t, content)
+                merger.add((f, t), content)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    with instr.stage("merge_chunks"):
+        content = merger.to_xml()
+    return (save_export(content, export_file), to_date)
+
+
+def verify_chunked(from_date, to_date, chunk="month", max_workers=None):
+    """
+    Compare the merged chunked export with a single full-range export, line by
+    line: (section header, ledger, occurrence), so ledger order doesn't matter.
+    Returns the list of differences as (section, ledger, full, chunked); empty means identical.
+    """
+    full = ChunkMerger([(from_date, to_date)])
+    full.add((from_date, to_date), tally_client.post_xml(build_pandl_request(
+        from_date.strftime("%Y%m%d"), to_date.strftime("%Y%m%d"))).content)
+    merger = ChunkMerger(split_period(from_date, to_date, chunk))
+    requests = {(f, t): build_pandl_request(f.strftime("%Y%m%d"), t.strftime("%Y%m%d"))
+                for f, t in merger.sub_ranges}
+    for sub_range, content, error in tally_client.fetch_many(requests, max_workers=max_workers or MAX_WORKERS):
+        if error is not None:
+            raise error
+        merger.add(sub_range, content)
+    full, chunked = full.totals(), merger.totals()
+
+    diffs = []
+    for key in {**full, **chunked}:
+        # a line that adds up to zero is left out of an export, however it was split
+        a, b = full.get(key, 0), chunked.get(key, 0)
+        if a != b:
+            section, ledger, _ = key
+            diffs.append((section, ledger, a / 100 if key in full else None, b / 100 if key in chunked else None))
+    return diffs
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--from", dest="from_date", required=True, type=lambda s: datetime.strptime(s, "%d-%m-%Y"))
+    ap.add_argument("--to", dest="to_date", required=True, type=lambda s: datetime.strptime(s, "%d-%m-%Y"))
+    ap.add_argument("--chunk", choices=sorted(CHUNKS), default="month")
+    ap.add_argument("--workers", type=int, help=f"concurrent sub-range requests (default {MAX_WORKERS})")
+    ap.add_argument("--verify", action="store_true", help="compare with a single full-range export instead")
+    ap.add_argument("--tally-url", help=f"Tally HTTP server (default: {tally_client.TALLY_URL})")
+    args = ap.parse_args()
+    tally_client.configure(url=args.tally_url)
+
+    if args.verify:
+        diffs = verify_chunked(args.from_date, args.to_date, args.chunk, args.workers)
+        for section, ledger, full, chunked in diffs[:20]:
+            print(f"   {section:<8} {ledger}: full={full} chunked={chunked}")
+        print("✅ Chunked export matches the full-range export" if not diffs
+              else f"❌ {len(diffs)} ledger lines differ")
+        raise SystemExit(1 if diffs else 0)
+    fetch_pandl_chunked(args.from_date, args.to_date, args.chunk, max_workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+# excel_writers.py
+"""
+Sheet writers the renderers stream rows into, one per xlsx library.
+
+A writer gets the whole report as plain data: column widths and merged
+ranges first, then every row in order as a list of None (empty) or
+(value, style) cells. Styles are registered once up front, from the same
+(font, border, fill, number_format, protection, alignment) tuples
+template_cache compiles (None entries keep the library's default), and
+cells refer to them by the returned handle.
+
+    openpyxl    openpyxl's write-only workbook (always available)
+    xlsxwriter  XlsxWriter in constant-memory mode: each row is flushed to
+                disk as soon as the next one starts and formats are plain
+                XF records, so there is no per-cell object model at all
+                (optional: pip install xlsxwriter)
+
+    sheet = open_writer("xlsxwriter", "final_PnL.xlsx")
+    amount = sheet.add_style((None, None, None, "₹ #,##0.00", None, None))
+    sheet.set_width(2, 15)
+    sheet.merge(1, 1, 6, 1)
+    sheet.append([None, ("ಸಂಬಳ", None), (1250.0, amount)])
+    sheet.save()
+"""
+from copy import copy
+from datetime import date, datetime, time
+from pathlib import Path
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles.colors import COLOR_INDEX
+from openpyxl.utils import get_column_letter
+
+DEFAULT_WRITER = "openpyxl"
+SHEET_TITLE = "Sheet"   # what openpyxl names the only sheet, so both writers produce the same workbook
+
+# openpyxl style names -> XlsxWriter property values
+BORDER_STYLES = {"thin": 1, "medium": 2, "dashed": 3, "dotted": 4, "thick": 5, "double": 6, "hair": 7,
+                 "mediumDashed": 8, "dashDot": 9, "mediumDashDot": 10, "dashDotDot": 11,
+                 "mediumDashDotDot": 12, "slantDashDot": 13}
+FILL_PATTERNS = {"solid": 1, "mediumGray": 2, "darkGray": 3, "lightGray": 4, "darkHorizontal": 5,
+                 "darkVertical": 6, "darkDown": 7, "darkUp": 8, "darkGrid": 9, "darkTrellis": 10,
+                 "lightHorizontal": 11, "lightVertical": 12, "lightDown": 13, "lightUp": 14, "lightGrid": 15,
+                 "lightTrellis": 16, "gray125": 17, "gray0625": 18}
+UNDERLINES = {"single": 1, "double": 2, "singleAccounting": 33, "doubleAccounting": 34}
+H_ALIGN = {"left": "left", "center": "center", "right": "right", "fill": "fill", "justify": "justify",
+           "centerContinuous": "center_across", "distributed": "distributed"}
+V_ALIGN = {"top": "top", "center": "vcenter", "bottom": "bottom", "justify": "vjustify",
+           "distributed": "vdistributed"}
+
+
+class OpenpyxlWriter:
+    """openpyxl write-only workbook: cells are styled by shared StyleArray."""
+
+    name = "openpyxl"
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet(SHEET_TITLE)
+
+    def add_style(self, style):
+        font, border, fill, number_format, protection, alignment = style
+        proto = WriteOnlyCell(self.ws)
+        if font is not None:
+            proto.font = copy(font)
+        if border is not None:
+            proto.border = copy(border)
+        if fill is not None:
+            proto.fill = copy(fill)
+        if number_format is not None:
+            proto.number_format = number_format
+        if protection is not None:
+            proto.protection = copy(protection)
+        if alignment is not None:
+            proto.alignment = copy(alignment)
+        return proto._style
+
+    def set_width(self, col_idx, width):
+        # write-only sheets need every width before the first row
+        self.ws.column_dimensions[get_column_letter(col_idx)].width = width
+
+    def append(self, row):
+        cells = []
+        for cell in row:
+            if cell is None:
+                cells.append(None)
+                continue
+            value, style = cell
+            c = WriteOnlyCell(self.ws, value=value)
+            if style is not None:
+                c._style = copy(style)
+            cells.append(c)
+        self.ws.append(cells)
+
+    def merge(self, min_col, min_row, max_col, max_row):
+        self.ws.merged_cells.add(f"{get_column_letter(min_col)}{min_row}:{get_column_letter(max_col)}{max_row}")
+
+    def save(self):
+        self.wb.save(self.output_path)
+
+
+def _xlsx_color(color):
+    """'#RRGGBB' for an rgb or indexed openpyxl Color; None for theme colours (XlsxWriter's default)."""
+    if color is None:
+        return None
+    if color.type == "rgb" and isinstance(color.rgb, str):
+        return "#" + color.rgb[-6:]
+    if color.type == "indexed" and isinstance(color.indexed, int) and color.indexed < len(COLOR_INDEX):
+        return "#" + COLOR_INDEX[color.indexed][-6:]
+    return None
+
+
+def _xlsx_width(width):
+    """
+    Width to pass to set_column so the file stores `width` itself:
+    XlsxWriter adds Calibri 11's 5px cell padding to whatever it is given.
+    """
+    adjusted = (width * 7 - 5) / 7
+    return adjusted if adjusted >= 1 else width
+
+
+def format_properties(style):
+    """XlsxWriter add_format() properties for a (font, border, fill, number_format, protection, alignment) tuple."""
+    font, border, fill, number_format, protection, alignment = style
+    props = {}
+    if font is not None:
+        if font.name:
+            props["font_name"] = font.name
+        if font.sz:
+            props["font_size"] = float(font.sz)
+        if font.b:
+            props["bold"] = True
+        if font.i:
+            props["italic"] = True
+        if font.u:
+            props["underline"] = UNDERLINES.get(font.u, 1)
+        if font.strike:
+            props["font_strikeout"] = True
+        if font.vertAlign in ("superscript", "subscript"):
+            props["font_script"] = 1 if font.vertAlign == "superscript" else 2
+        if _xlsx_color(font.color):
+            props["font_color"] = _xlsx_color(font.color)
+    if border is not None:
+        for side in ("left", "right", "top", "bottom"):
+            edge = getattr(border, side)
+            if edge is not None and edge.style in BORDER_STYLES:
+                props[side] = BORDER_STYLES[edge.style]
+                if _xlsx_color(edge.color):
+                    props[f"{side}_color"] = _xlsx_color(edge.color)
+    if fill is not None and getattr(fill, "patternType", None) in FILL_PATTERNS:
+        props["pattern"] = FILL_PATTERNS[fill.patternType]
+        # XlsxWriter takes a solid fill's colour as bg_color
+        fg, bg = _xlsx_color(fill.fgColor), _xlsx_color(fill.bgColor)
+        if fill.patternType == "solid":
+            if fg:
+                props["bg_color"] = fg
+        else:
+            if fg:
+                props["fg_color"] = fg
+            if bg:
+                props["bg_color"] = bg
+    if number_format is not None and number_format != "General":
+        props["num_format"] = number_format
+    if protection is not None:
+        if protection.locked is False:
+            props["locked"] = False
+        if protection.hidden:
+            props["hidden"] = True
+    if alignment is not None:
+        if alignment.horizontal in H_ALIGN:
+            props["align"] = H_ALIGN[alignment.horizontal]
+        if alignment.vertical in V_ALIGN:
+            props["valign"] = V_ALIGN[alignment.vertical]
+        if alignment.wrap_text:
+            props["text_wrap"] = True
+        if alignment.shrink_to_fit:
+            props["shrink"] = True
+        if alignment.indent:
+            props["indent"] = int(alignment.indent)
+        rotation = alignment.text_rotation or 0
+        if rotation:
+            props["rotation"] = 270 if rotation == 255 else (rotation if rotation <= 90 else 90 - rotation)
+    return props
+
+
+class XlsxWriterWriter:
+    """XlsxWriter in constant-memory mode: rows go straight to disk, formats are preregistered."""
+
+    name = "xlsxwriter"
+
+    def __init__(self, output_path):
+        import xlsxwriter
+
+        # constant_memory needs a real file; file objects are assembled in memory instead
+        options = {"constant_memory": True} if isinstance(output_path, (str, Path)) else {"in_memory": True}
+        self.wb = xlsxwriter.Workbook(str(output_path) if isinstance(output_path, Path) else output_path,
+                                      options)
+        self.ws = self.wb.add_worksheet(SHEET_TITLE)
+        self.row = 0
+        self._formats = {}
+
+    def add_style(self, style):
+        props = format_properties(style)
+        key = tuple(sorted(props.items()))
+        if key not in self._formats:
+            self._formats[key] = self.wb.add_format(props) if props else None
+        return self._formats[key]
+
+    def set_width(self, col_idx, width):
+        self.ws.set_column(col_idx - 1, col_idx - 1, _xlsx_width(width))
+
+    def append(self, row):
+        ws, r = self.ws, self.row
+        for c, cell in enumerate(row):
+            if cell is None:
+                continue
+            value, fmt = cell
+            # typed writes: a name starting with '=' or 'http' stays text, as with openpyxl
+            if value is None:
+                ws.write_blank(r, c, None, fmt)
+            elif isinstance(value, str):
+                ws.write_string(r, c, value, fmt)
+            elif isinstance(value, bool):
+                ws.write_boolean(r, c, value, fmt)
+            elif isinstance(value, (int, float)):
+                ws.write_number(r, c, value, fmt)
+            elif isinstance(value, (datetime, date, time)):
+                ws.write_datetime(r, c, value, fmt)
+            else:
+                ws.write(r, c, value, fmt)
+        self.row += 1
+
+    def merge(self, min_col, min_row, max_col, max_row):
+        from xlsxwriter.exceptions import OverlappingRange
+
+        # Called before any row is written (constant-memory mode ignores ranges
+        # above the current row); no data and no format, so nothing is flushed
+        try:
+            self.ws.merge_range(min_row - 1, min_col - 1, max_row - 1, max_col - 1, None)
+        except OverlappingRange:
+            pass  # like copy_sheet_to, skip a range that overlaps an earlier one
+
+    def save(self):
+        self.wb.close()
+
+
+WRITERS = {"openpyxl": OpenpyxlWriter, "xlsxwriter": XlsxWriterWriter}
+
+
+def writer_available(name):
+    """True if the writer's library is installed."""
+    if name == "xlsxwriter":
+        try:
+            import xlsxwriter  # noqa: F401
+        except ImportError:
+            return False
+    return name in WRITERS
+
+
+def open_writer(name, output_path):
+    """A new sheet writer for output_path (path or binary file object)."""
+    name = name or DEFAULT_WRITER
+    if name not in WRITERS:
+        raise ValueError(f"Unknown writer '{name}' (choose from: {', '.join(WRITERS)})")
+    if not writer_available(name):
+        raise RuntimeError(f"The {name} writer needs XlsxWriter: pip install xlsxwriter")
+    return WRITERS[name](output_path)
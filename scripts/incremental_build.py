@@ -0,0 +1,274 @@
+# incremental_build.py
+"""
+Incremental rebuilds of a final report (automate.py --incremental).
+
+Each report gets a build record next to it (output/.vega_build/<report>.json)
+with fingerprints of everything it was built from, plus the ledger rows it
+holds. A rebuild only recomputes the stages whose inputs changed:
+
+    parse      the Tally export (sha256): unchanged -> parsed lines reused
+    translate  the mapping entries of this export's ledgers: unchanged ->
+               translated rows reused
+    render     the translated rows, the header/body/footer templates (sha256),
+               the period, renderer and writer:
+                 nothing changed        -> the report is left alone
+                 only some rows changed -> those cells are patched in the
+                                           existing xlsx (same row counts)
+                 anything else          -> full render
+
+So fixing one Kannada name in ledger_mapping.xlsx rewrites that one cell
+in the sheet XML of final_PnL.xlsx instead of rendering it again. A report edited or removed
+since it was written (size / mtime differ) is always rendered in full.
+
+    build = IncrementalBuild(final_file, templates, renderer="classic", writer="openpyxl",
+                             period=month_year_kn)
+    income, expense = build.parse(export_file, parse_tally_xml_stream)
+    rows = build.translate(income, expense, mapping_dict, translate)
+    outcome = build.render(*rows, render)     # "up to date" / "patched" / "rendered"
+"""
+import hashlib
+import json
+import os
+import re
+import zipfile
+from html import unescape
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from openpyxl.utils import get_column_letter
+
+import instrumentation as instr
+from stream_renderer import EXP_AMT_COL, EXP_NAME_COL, INC_AMT_COL, INC_NAME_COL, START_ROW
+from template_cache import as_template
+
+BUILD_DIR = ".vega_build"
+VERSION = 1
+PATCH_RENDERERS = ("classic", "stream")
+SHEET_XML = "xl/worksheets/sheet1.xml"   # the report's only sheet, whichever writer made it
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def mapping_fingerprint(income, expense, mapping_dict, aggregate=False):
+    """sha256 of the mapping entries (English -> Kannada or missing) the export's ledgers use."""
+    digest = hashlib.sha256(b"aggregate" if aggregate else b"lines")
+    for name, _ in (*income, *expense):
+        key = name.strip().lower()
+        digest.update(f"{key}\x1e{mapping_dict.get(key)}\x1f".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _rows(rows):
+    return [tuple(row) for row in rows]
+
+
+def _output_stat(path):
+    st = Path(path).stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+_CELL = re.compile(rb'<c r="([A-Z]{1,3}[0-9]+)"([^>]*?)(/>|>(.*?)</c>)', re.S)
+_TYPE = re.compile(rb'\s+t="[^"]*"')
+_TEXT = re.compile(rb"<t(?:\s[^>]*)?>(.*?)</t>", re.S)
+_VALUE = re.compile(rb"<v>(.*?)</v>", re.S)
+
+
+def _text(xml_bytes):
+    return unescape("".join(t.decode("utf-8") for t in _TEXT.findall(xml_bytes)))
+
+
+def _shared_strings(zf):
+    try:
+        data = zf.read("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    return [_text(si) for si in re.findall(rb"<si>(.*?)</si>", data, re.S)]
+
+
+def _cell_value(attrs, body, shared):
+    """Value of a <c> element as openpyxl would read it (numbers as float)."""
+    kind = re.search(rb't="([^"]*)"', attrs)
+    kind = kind.group(1) if kind else b"n"
+    v = _VALUE.search(body or b"")
+    if kind == b"inlineStr":
+        return _text(body)
+    if v is None:
+        return None
+    if kind == b"s":
+        return shared()[int(v.group(1))]
+    if kind in (b"str", b"e"):
+        return unescape(v.group(1).decode("utf-8"))
+    if kind == b"b":
+        return v.group(1) == b"1"
+    return float(v.group(1))
+
+
+def _cell_xml(ref, attrs, value):
+    attrs = _TYPE.sub(b"", attrs)
+    if isinstance(value, str):
+        text = escape(value).encode("utf-8")
+        space = b' xml:space="preserve"' if value != value.strip() else b""
+        return b'<c r="%s"%s t="inlineStr"><is><t%s>%s</t></is></c>' % (ref, attrs, space, text)
+    if value is None:
+        return b'<c r="%s"%s/>' % (ref, attrs)
+    return b'<c r="%s"%s t="n"><v>%s</v></c>' % (ref, attrs, repr(value).encode("ascii"))
+
+
+def patch_cells(xlsx_path, changes, output_path):
+    """
+    Copy xlsx_path to output_path with cells rewritten in the first sheet's
+    XML, leaving their style and everything else untouched.
+    changes: {"B12": (old value, new value)}. Returns False (nothing written)
+    if a cell is missing or doesn't hold its old value.
+    """
+    with zipfile.ZipFile(xlsx_path) as zin:
+        try:
+            sheet = zin.read(SHEET_XML)
+        except KeyError:
+            return False
+        cache = []
+
+        def shared():
+            if not cache:
+                cache.append(_shared_strings(zin))
+            return cache[0]
+
+        parts, pos, found = [], 0, 0
+        for m in _CELL.finditer(sheet):
+            ref = m.group(1).decode("ascii")
+            if ref not in changes:
+                continue
+            was, value = changes[ref]
+            current = _cell_value(m.group(2), m.group(4), shared)
+            if current != was:
+                return False
+            parts += [sheet[pos:m.start()], _cell_xml(m.group(1), m.group(2), value)]
+            pos = m.end()
+            found += 1
+        if found != len(changes):
+            return False
+        parts.append(sheet[pos:])
+
+        with zipfile.ZipFile(output_path, "w") as zout:
+            for info in zin.infolist():
+                zout.writestr(info, b"".join(parts) if info.filename == SHEET_XML else zin.read(info.filename))
+    return True
+
+
+class IncrementalBuild:
+    """The build record of one report: what it was last built from, and what this run builds it from."""
+
+    def __init__(self, final_file, templates, aggregate=False, **settings):
+        """
+        templates: {"header", "body", "footer"} paths or CompiledTemplates.
+        settings: anything else the output depends on (renderer, writer, period ...).
+        """
+        self.final_file = Path(final_file)
+        self.path = self.final_file.parent / BUILD_DIR / f"{self.final_file.name}.json"
+        self.templates = {part: as_template(t) for part, t in templates.items()}
+        self.aggregate = aggregate
+        self.inputs = {"templates": {part: tpl.sha256 for part, tpl in sorted(self.templates.items())},
+                       "aggregate": aggregate, **settings}
+        self.previous = self._load()
+        self.record = {"version": VERSION, "inputs": self.inputs}
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return record if record.get("version") == VERSION else {}
+
+    def parse(self, export_file, parse):
+        """(income, expense) of the export: the recorded lines if it is unchanged, else parse(export_file)."""
+        self.record["export"] = file_sha256(export_file)
+        prev = self.previous
+        if prev.get("export") == self.record["export"] and "parsed" in prev:
+            instr.count("build_parse_skipped")
+            income, expense = _rows(prev["parsed"]["income"]), _rows(prev["parsed"]["expense"])
+        else:
+            income, expense = parse(export_file)
+        self.record["parsed"] = {"income": income, "expense": expense}
+        return income, expense
+
+    def translate(self, income, expense, mapping_dict, translate, reuse=True):
+        """
+        Translated (income, expense) rows: the recorded ones while the export
+        and its mapping entries are unchanged, else translate(income, expense).
+        reuse=False always translates (e.g. when an unmapped report is collected).
+        """
+        self.record["mapping"] = mapping_fingerprint(income, expense, mapping_dict, self.aggregate)
+        prev = self.previous
+        if (reuse and "rows" in prev and prev.get("export") == self.record.get("export")
+                and prev.get("mapping") == self.record["mapping"]
+                and prev["inputs"].get("aggregate") == self.aggregate):
+            instr.count("build_translate_skipped")
+            return _rows(prev["rows"]["income"]), _rows(prev["rows"]["expense"])
+        return translate(income, expense)
+
+    def render(self, income, expense, render):
+        """
+        Bring the report up to date with the translated rows: leave it, patch
+        the changed cells, or call render(). Returns "up to date", "patched"
+        or "rendered", and records the build.
+        """
+        self.record["rows"] = {"income": _rows(income), "expense": _rows(expense)}
+        outcome = self._reuse(income, expense)
+        if outcome is None:
+            render()
+            outcome = "rendered"
+        instr.count(f"build_{outcome.replace(' ', '_')}")
+        self.record["output"] = _output_stat(self.final_file)
+        self._save()
+        return outcome
+
+    def _reuse(self, income, expense):
+        prev = self.previous
+        if not prev or prev["inputs"] != self.inputs or "rows" not in prev or not self.final_file.exists():
+            return None
+        if _output_stat(self.final_file) != prev.get("output"):
+            return None     # edited or replaced since it was written
+        old = {side: _rows(rows) for side, rows in prev["rows"].items()}
+        if old == self.record["rows"]:
+            return "up to date"
+        if (self.inputs.get("renderer") not in PATCH_RENDERERS
+                or len(old["income"]) != len(income) or len(old["expense"]) != len(expense)):
+            return None
+        return "patched" if self._patch(old, self.record["rows"]) else None
+
+    def _patch(self, old, new):
+        """Rewrite the changed name/amount cells of the report in place; False if it isn't laid out as recorded."""
+        # Body rows start after the header's copy advance, as in copy_all_parts / write_final_pnl_stream
+        first_row = self.templates["header"].advance + START_ROW
+        changes = {}
+        for side, name_col, amt_col in (("expense", EXP_NAME_COL, EXP_AMT_COL),
+                                        ("income", INC_NAME_COL, INC_AMT_COL)):
+            for i, (before, after) in enumerate(zip(old[side], new[side])):
+                for col, was, value in zip((name_col, amt_col), before, after):
+                    if was != value:
+                        changes[f"{get_column_letter(col)}{first_row + i}"] = (was, value)
+        tmp = self.final_file.with_name(f".{self.final_file.name}.{os.getpid()}.tmp")
+        with instr.stage("patch"):
+            patched = patch_cells(self.final_file, changes, tmp)
+        if not patched:
+            tmp.unlink(missing_ok=True)
+            return False
+        os.replace(tmp, self.final_file)
+        instr.count("cells_patched", len(changes))
+        print(f"🩹 {len(changes)} changed cell(s) patched in {self.final_file}")
+        return True
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.record, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
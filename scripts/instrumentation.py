@@ -0,0 +1,312 @@
+# instrumentation.py
+"""
+Opt-in run instrumentation: nested stage timers, peak-memory sampling,
+byte and row counters, a JSON run report and optional cProfile dumps.
+
+Disabled by default, in which case stage() and count() return after a single
+global check. automate.py enables it with --report-json / --profile-stage:
+
+    import instrumentation as instr
+    instr.enable(profile_stages={"render"}, profile_dir="output/profiles")
+    with instr.stage("parse"):
+        ...
+        instr.count("ledgers_parsed", len(rows))
+    instr.write_report("output/run_report.json")
+
+Stages nest per thread; stages opened on a worker thread hang off the run's
+root. Counters are recorded on the innermost open stage and summed into
+run-wide totals.
+"""
+import cProfile
+import json
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+SAMPLE_INTERVAL = 0.25   # seconds between RSS samples while enabled
+
+_run = None
+_local = threading.local()
+
+
+def _rss_reader():
+    """Cheapest way to read the current RSS (bytes) on this platform, or None."""
+    try:
+        import psutil
+        proc = psutil.Process()
+        return lambda: proc.memory_info().rss
+    except ImportError:
+        pass
+    try:
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        with open("/proc/self/statm") as f:
+            f.read()
+
+        def statm():
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * page_size
+        return statm
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+_read_rss = None
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (falls back to the peak where RSS can't be read)."""
+    global _read_rss
+    if _read_rss is None:
+        _read_rss = _rss_reader() or (lambda: None)
+    rss = _read_rss()
+    return rss / (1024 * 1024) if rss is not None else peak_rss_mb()
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows without psutil
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class _Stage:
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.calls = 0
+        self.seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.rss_start_mb = None
+        self.rss_end_mb = None
+        self.peak_rss_mb = None
+        self.counters = {}
+        self.children = {}
+
+    def child(self, name):
+        node = self.children.get(name)
+        if node is None:
+            node = self.children.setdefault(name, _Stage(name, f"{self.path}/{name}" if self.path else name))
+        return node
+
+    def to_dict(self):
+        def mb(v):
+            return round(v, 1) if v is not None else None
+        d = {
+            "name": self.name,
+            "calls": self.calls,
+            "seconds": round(self.seconds, 4),
+            "cpu_seconds": round(self.cpu_seconds, 4),
+            "rss_start_mb": mb(self.rss_start_mb),
+            "rss_end_mb": mb(self.rss_end_mb),
+            "peak_rss_mb": mb(self.peak_rss_mb),
+        }
+        if self.counters:
+            d["counters"] = dict(self.counters)
+        if self.children:
+            d["stages"] = [c.to_dict() for c in self.children.values()]
+        return d
+
+
+class _Run:
+    def __init__(self, profile_stages, profile_dir, sample_interval):
+        self.root = _Stage("run", "")
+        self.started = datetime.now()
+        self.t0 = time.perf_counter()
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.active = {}          # open _Stage -> open count, for the sampler
+        self.peak_rss_mb = current_rss_mb()
+        self.profile_stages = set(profile_stages or ())
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self.profiles = {}        # stage path -> pstats.Stats (calls accumulated)
+        self._stop = threading.Event()
+        self._sampler = None
+        if sample_interval:
+            self._sampler = threading.Thread(target=self._sample, args=(sample_interval,),
+                                             name="instrumentation-rss", daemon=True)
+            self._sampler.start()
+
+    def _sample(self, interval):
+        while not self._stop.wait(interval):
+            self.observe_rss(current_rss_mb())
+
+    def observe_rss(self, rss):
+        if rss is None:
+            return
+        with self.lock:
+            if self.peak_rss_mb is None or rss > self.peak_rss_mb:
+                self.peak_rss_mb = rss
+            for node in self.active:
+                if node.peak_rss_mb is None or rss > node.peak_rss_mb:
+                    node.peak_rss_mb = rss
+
+    def wants_profile(self, node):
+        return bool(self.profile_stages) and (
+            "all" in self.profile_stages or node.name in self.profile_stages or node.path in self.profile_stages)
+
+    def add_profile(self, node, profiler):
+        with self.lock:
+            if node.path in self.profiles:
+                self.profiles[node.path].add(profiler)
+            else:
+                self.profiles[node.path] = pstats.Stats(profiler)
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self.observe_rss(current_rss_mb())
+
+
+def enabled():
+    return _run is not None
+
+
+def enable(profile_stages=None, profile_dir=None, sample_interval=SAMPLE_INTERVAL):
+    """
+    Start recording a run. profile_stages: stage names or paths ("sync",
+    "period 20240401_20240430/render") to run under cProfile, or "all".
+    """
+    global _run
+    _run = _Run(profile_stages, profile_dir, sample_interval)
+    _local.stack = []
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as a stage nested under the current one."""
+    run = _run
+    if run is None:
+        yield None
+        return
+
+    stack = _stack()
+    parent = stack[-1] if stack else run.root
+    with run.lock:
+        node = parent.child(name)
+        run.active[node] = run.active.get(node, 0) + 1
+    rss = current_rss_mb()
+    if node.rss_start_mb is None:
+        node.rss_start_mb = rss
+    run.observe_rss(rss)
+
+    profiler = None
+    if run.wants_profile(node):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another profiler is active on this thread
+            profiler = None
+
+    stack.append(node)
+    t0, c0 = time.perf_counter(), time.thread_time()
+    try:
+        yield node
+    finally:
+        elapsed, cpu = time.perf_counter() - t0, time.thread_time() - c0
+        if profiler is not None:
+            profiler.disable()
+            run.add_profile(node, profiler)
+        stack.pop()
+        rss = current_rss_mb()
+        run.observe_rss(rss)
+        with run.lock:
+            node.calls += 1
+            node.seconds += elapsed
+            node.cpu_seconds += cpu
+            node.rss_end_mb = rss
+            run.active[node] -= 1
+            if not run.active[node]:
+                del run.active[node]
+
+
+def count(name, n=1):
+    """Add n to counter name on the current stage and the run totals."""
+    run = _run
+    if run is None:
+        return
+    stack = _stack()
+    node = stack[-1] if stack else run.root
+    with run.lock:
+        node.counters[name] = node.counters.get(name, 0) + n
+        run.counters[name] = run.counters.get(name, 0) + n
+
+
+def count_file(name, path):
+    """Add the size of the file at path (if it is one) to counter name."""
+    if _run is None or not isinstance(path, (str, Path)):
+        return
+    try:
+        count(name, os.path.getsize(path))
+    except OSError:
+        pass
+
+
+def _profile_file_stem(path):
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in path.replace("/", "__"))
+
+
+def report():
+    """Machine-readable summary of the current run (None when disabled)."""
+    run = _run
+    if run is None:
+        return None
+    with run.lock:
+        return {
+            "started": run.started.isoformat(timespec="seconds"),
+            "seconds": round(time.perf_counter() - run.t0, 4),
+            "argv": sys.argv,
+            "pid": os.getpid(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "peak_rss_mb": round(run.peak_rss_mb, 1) if run.peak_rss_mb is not None else None,
+            "counters": dict(run.counters),
+            "stages": [c.to_dict() for c in list(run.root.children.values())],
+            "profiles": [str(run.profile_dir / f"{_profile_file_stem(p)}.prof") for p in run.profiles]
+            if run.profile_dir else [],
+        }
+
+
+def write_report(path):
+    """Stop sampling, dump cProfile stats (if any) and write the JSON run report to path."""
+    run = _run
+    if run is None:
+        return None
+    run.stop()
+    if run.profiles and run.profile_dir:
+        run.profile_dir.mkdir(parents=True, exist_ok=True)
+        for stage_path, stats in run.profiles.items():
+            stem = run.profile_dir / _profile_file_stem(stage_path)
+            stats.dump_stats(f"{stem}.prof")
+            with open(f"{stem}.txt", "w", encoding="utf-8") as f:
+                stats.stream = f
+                stats.sort_stats("cumulative").print_stats(40)
+    data = report()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"📈 Run report written → {path}")
+    return data
+
+
+def disable():
+    global _run
+    if _run is not None:
+        _run.stop()
+    _run = None
@@ -0,0 +1,124 @@
+# ledger_frame.py
+"""
+Columnar translation of parsed P&L lines (pandas/NumPy).
+
+translate_frame() does what automate.translate_and_filter does, in bulk:
+names are factorised, each distinct name is normalised and looked up once,
+and lines are filtered and summed with NumPy masks and bincount. On top of
+that it can sum ledgers listed more than once (e.g. under several groups)
+and returns the unmapped ledgers, which UnmappedReport collects across
+sections and periods into an xlsx accountants can paste into
+ledger_mapping.xlsx.
+"""
+import threading
+from operator import itemgetter
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+UNMAPPED_COLUMNS = ["key", "ledger", "lines", "amount"]
+
+
+def _first_seen(codes):
+    """Distinct values of codes in order of first appearance."""
+    uniq, first = np.unique(codes, return_index=True)
+    return uniq[np.argsort(first, kind="stable")]
+
+
+def translate_frame(data, mapping_dict, aggregate=False):
+    """
+    data: [(ledger, amount)] as the parsers return it; mapping_dict: normalised
+    English -> Kannada. Returns (rows, unmapped):
+      rows      [(kannada, amount)] for mapped, non-zero lines, in input order
+                (aggregate=True: one row per ledger, amounts summed, first-seen order)
+      unmapped  DataFrame (key, ledger, lines, amount) of non-zero lines with no mapping
+
+    Names repeat a lot (the same ledgers in every period and group), so they are
+    factorised first: only the distinct names are normalised and looked up, and
+    the results are broadcast back to the lines through their codes.
+    """
+    if not data:
+        return [], pd.DataFrame(columns=UNMAPPED_COLUMNS)
+    names = np.array(list(map(itemgetter(0), data)), dtype=object)
+    amounts = np.fromiter(map(itemgetter(1), data), dtype=float, count=len(data))
+
+    name_codes, distinct_names = pd.factorize(names)
+    # ledger names that differ only in case/spaces share one key
+    key_of_name, keys = pd.factorize(np.array([n.strip().lower() for n in distinct_names], dtype=object))
+    codes = key_of_name[name_codes]
+    kannada = np.array([mapping_dict.get(k) for k in keys], dtype=object)
+    has_mapping = np.array([k in mapping_dict for k in keys], dtype=bool)
+
+    nonzero = amounts != 0
+    mapped = has_mapping[codes] & nonzero
+    if aggregate:
+        sums = np.bincount(codes[mapped], weights=amounts[mapped], minlength=len(keys))
+        order = _first_seen(codes[mapped])
+        rows = list(zip(kannada[order].tolist(), sums[order].tolist()))
+    else:
+        rows = list(zip(kannada[codes[mapped]].tolist(), amounts[mapped].tolist()))
+
+    missing = ~has_mapping[codes] & nonzero
+    order = _first_seen(codes[missing])
+    first_name = np.empty(len(keys), dtype=object)
+    first_name[key_of_name[::-1]] = distinct_names[::-1]   # earliest spelling wins
+    unmapped = pd.DataFrame({
+        "key": keys[order],
+        "ledger": [n.strip() for n in first_name[order]],
+        "lines": np.bincount(codes[missing], minlength=len(keys))[order],
+        "amount": np.bincount(codes[missing], weights=amounts[missing], minlength=len(keys))[order],
+    }, columns=UNMAPPED_COLUMNS)
+    return rows, unmapped
+
+
+class UnmappedReport:
+    """Unmapped ledgers collected across sections and periods (thread-safe)."""
+
+    def __init__(self):
+        self._frames = []
+        self._lock = threading.Lock()
+
+    def add(self, unmapped, section="", period=""):
+        if len(unmapped):
+            with self._lock:
+                self._frames.append(unmapped.assign(section=section, period=period))
+
+    def to_frame(self):
+        """One row per ledger: EnglishLedger, KannadaLedger (blank), Section, Lines, Amount, Periods."""
+        with self._lock:
+            frames = list(self._frames)
+        if not frames:
+            return pd.DataFrame(columns=["EnglishLedger", "KannadaLedger", "Section", "Lines", "Amount", "Periods"])
+        df = pd.concat(frames, ignore_index=True)
+        out = df.groupby("key", sort=False).agg(
+            EnglishLedger=("ledger", "first"),
+            Section=("section", lambda s: ", ".join(dict.fromkeys(s))),
+            Lines=("lines", "sum"),
+            Amount=("amount", "sum"),
+            Periods=("period", lambda s: ", ".join(sorted(p for p in set(s) if p))),
+        ).reset_index(drop=True)
+        out.insert(1, "KannadaLedger", "")
+        return out.sort_values("EnglishLedger", key=lambda s: s.str.lower(), ignore_index=True)
+
+    def __len__(self):
+        with self._lock:
+            return len(set().union(*(set(f["key"]) for f in self._frames))) if self._frames else 0
+
+    def write(self, path, suggest=None):
+        """
+        Write the report as xlsx (same first two columns as ledger_mapping.xlsx); returns the path.
+        suggest: names -> {name: Suggestion or None} (e.g. mapping_index.suggest_local) fills
+        KannadaLedger with suggested names and adds MatchedLedger / Score columns.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        df = self.to_frame()
+        if suggest is not None:
+            suggestions = suggest(list(df["EnglishLedger"]))
+            found = [suggestions.get(name) for name in df["EnglishLedger"]]
+            df["KannadaLedger"] = [s.kannada if s else "" for s in found]
+            df["MatchedLedger"] = [s.english if s else "" for s in found]
+            df["Score"] = [s.score if s else None for s in found]
+        df.to_excel(path, index=False)
+        return path
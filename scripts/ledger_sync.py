@@ -1,22 +1,54 @@
 # ledger_sync.py
-import requests
-import pandas as pd
+import argparse
+import json
+import os
 import xml.etree.ElementTree as ET
+from datetime import datetime
 from pathlib import Path
 
-TALLY_URL = "http://localhost:9000"
-LEDGER_MAPPING_FILE = Path("../config/ledger_mapping.xlsx")
-OUTPUT_LOG_FILE = Path("../output/updated_mapping_log.txt")
+import instrumentation as instr
+import tally_client
+from mapping_index import MappingIndex
+from mapping_store import open_mapping_store
 
-def sync_ledgers_from_tally():
+base_dir = Path(__file__).parent.parent
+LEDGER_MAPPING_FILE = base_dir / "config" / "ledger_mapping.xlsx"
+OUTPUT_LOG_FILE = base_dir / "output" / "updated_mapping_log.txt"
+
+SYNC_STATE_FILE = base_dir / "config" / "ledger_sync_state.json"
+
+
+def configure(mapping_file=None, log_file=None, state_file=None):
     """
-    Fetch all ledgers from Tally, update ledger_mapping.xlsx,
-    and return a pandas DataFrame of mappings.
-    KannadaLedger defaults to EnglishLedger for new entries.
+    Point the sync at another company's files. The mapping store lives next
+    to mapping_file (same name, .db); the sync state defaults to
+    ledger_sync_state.json in the same folder.
     """
-    print("Syncing ledgers from Tally...")
+    global LEDGER_MAPPING_FILE, OUTPUT_LOG_FILE, SYNC_STATE_FILE
+    if mapping_file is not None:
+        LEDGER_MAPPING_FILE = Path(mapping_file)
+        if state_file is None:
+            state_file = LEDGER_MAPPING_FILE.parent / "ledger_sync_state.json"
+    if log_file is not None:
+        OUTPUT_LOG_FILE = Path(log_file)
+    if state_file is not None:
+        SYNC_STATE_FILE = Path(state_file)
+
 
-    ledger_request_xml = """<ENVELOPE>
+def build_ledger_request(since_alter_id=None):
+    """
+    SimpleLedgerList envelope returning each ledger's NAME and ALTERID.
+    With since_alter_id, Tally only returns ledgers created or altered after it.
+    """
+    if since_alter_id is None:
+        filters = ""
+        formulae = ""
+    else:
+        filters = "\n                        <FILTERS>VegaAlteredSince</FILTERS>"
+        formulae = f"""
+                    <SYSTEM TYPE="Formulae" NAME="VegaAlteredSince">$AlterID &gt; {int(since_alter_id)}</SYSTEM>"""
+
+    return f"""<ENVELOPE>
     <HEADER>
         <VERSION>1</VERSION>
         <TALLYREQUEST>EXPORT</TALLYREQUEST>
@@ -43,16 +75,21 @@ def sync_ledgers_from_tally():
                         <SCROLLED>Vertical</SCROLLED>
                     </PART>
                     <LINE NAME="SimpleLedgerLine">
-                        <FIELDS>LedgerNameField</FIELDS>
+                        <FIELDS>LedgerNameField, LedgerAlterIdField</FIELDS>
                         <XMLTAG>"LEDGER"</XMLTAG>
                     </LINE>
                     <FIELD NAME="LedgerNameField">
                         <SET>$Name</SET>
                         <XMLTAG>"NAME"</XMLTAG>
                     </FIELD>
+                    <FIELD NAME="LedgerAlterIdField">
+                        <SET>$AlterID</SET>
+                        <XMLTAG>"ALTERID"</XMLTAG>
+                    </FIELD>
                     <COLLECTION NAME="SimpleLedgerCollection">
                         <TYPE>Ledger</TYPE>
-                    </COLLECTION>
+                        <FETCH>AlterID</FETCH>{filters}
+                    </COLLECTION>{formulae}
                 </TDLMESSAGE>
             </TDL>
         </DESC>
@@ -60,50 +97,144 @@ def sync_ledgers_from_tally():
 </ENVELOPE>"""
 
 
+LEDGER_REQUEST_XML = build_ledger_request()
+
+
+def load_sync_state():
+    """Persisted sync watermark: {"max_alter_id": int, "last_sync": str, "last_full_sync": str}."""
+    if SYNC_STATE_FILE.exists():
+        try:
+            return json.loads(SYNC_STATE_FILE.read_text(encoding="utf-8"))
+        except (ValueError, OSError):
+            print("⚠️ Sync state unreadable. Falling back to a full ledger pull.")
+    return {}
+
+
+def save_sync_state(state):
+    SYNC_STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = SYNC_STATE_FILE.with_name(f".{SYNC_STATE_FILE.name}.{os.getpid()}.tmp")
     try:
-        res = requests.post(TALLY_URL, data=ledger_request_xml)
-        res.raise_for_status()
+        tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+        os.replace(tmp, SYNC_STATE_FILE)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def ledger_sync_request(full=False):
+    """
+    Envelope for the next sync: incremental from the stored watermark,
+    or a full pull when full=True or no watermark exists yet.
+    Returns (xml_request, since_alter_id); since_alter_id is None for a full pull.
+    """
+    since = None if full else load_sync_state().get("max_alter_id")
+    return build_ledger_request(since), since
+
+
+def parse_ledgers(content):
+    """(name, alter_id) pairs from a SimpleLedgerList response body; alter_id may be None."""
+    root = ET.fromstring(content)
+    ledgers = []
+    for ledger in root.iter("LEDGER"):
+        name = ledger.findtext("NAME")
+        if not name or not name.strip():
+            continue
+        alter_text = (ledger.findtext("ALTERID") or "").strip()
+        ledgers.append((name.strip(), int(alter_text) if alter_text.isdigit() else None))
+    return ledgers
+
+
+def apply_ledger_response(content, since_alter_id=None):
+    """
+    Merge a SimpleLedgerList response into the mapping store, advance the
+    AlterID watermark, and return the MappingStore.
+    """
+    with instr.stage("parse_ledgers"):
+        ledgers = parse_ledgers(content)
+    instr.count("ledgers_received", len(ledgers))
+    if since_alter_id is not None:
+        print(f"Incremental sync: ledgers altered after AlterID {since_alter_id}.")
+    with instr.stage("mapping_update"):
+        store = update_mapping([name for name, _ in ledgers])
+
+    state = load_sync_state()
+    now = datetime.now().isoformat(timespec="seconds")
+    alter_ids = [a for _, a in ledgers if a is not None]
+    if since_alter_id is None:
+        # Full pull: the watermark is whatever Tally has now
+        state["max_alter_id"] = max(alter_ids) if alter_ids else None
+        state["last_full_sync"] = now
+    elif alter_ids:
+        state["max_alter_id"] = max(max(alter_ids), since_alter_id)
+    state["last_sync"] = now
+    if state.get("max_alter_id") is None:
+        state.pop("max_alter_id", None)  # Tally gave no AlterIDs: stay on full pulls
+    save_sync_state(state)
+    return store
+
+
+def sync_ledgers_from_tally(full=False):
+    """
+    Fetch ledgers from Tally, update the mapping store and ledger_mapping.xlsx,
+    and return the MappingStore (None if Tally is unreachable).
+    KannadaLedger defaults to EnglishLedger for new entries.
+    Only ledgers created/altered since the last sync are requested,
+    unless full=True (or no watermark has been stored yet).
+    """
+    print("Syncing ledgers from Tally...")
+    xml_request, since = ledger_sync_request(full)
+
+    try:
+        with instr.stage("tally_ledgers"):
+            res = tally_client.post_xml(xml_request)
     except Exception as e:
         print(f"❌ Failed to connect to Tally: {e}")
         return None
 
-    root = ET.fromstring(res.content)
-    ledger_names = [elem.text.strip() for elem in root.iter("NAME") if elem.text]
+    return apply_ledger_response(res.content, since)
 
-    print(f"✅ Received {len(ledger_names)} ledgers from Tally.")
 
-    # Load or create mapping file
-    if LEDGER_MAPPING_FILE.exists():
-        df = pd.read_excel(LEDGER_MAPPING_FILE)
-        if "EnglishLedger" not in df.columns or "KannadaLedger" not in df.columns:
-            print("⚠️ Mapping file missing columns. Recreating headers.")
-            df = pd.DataFrame(columns=["EnglishLedger", "KannadaLedger"])
-    else:
-        df = pd.DataFrame(columns=["EnglishLedger", "KannadaLedger"])
+def open_local_mapping():
+    """The mapping store as of the last sync (plus xlsx edits), without contacting Tally."""
+    return open_mapping_store(LEDGER_MAPPING_FILE.with_suffix(".db"), LEDGER_MAPPING_FILE)
+
+
+def update_mapping(ledger_names):
+    """
+    Add ledgers missing from the mapping store (KannadaLedger = EnglishLedger),
+    refresh the ledger_mapping.xlsx view, log them with any suggested Kannada
+    name (mapping_index), and return the MappingStore.
+    """
+    print(f"✅ Received {len(ledger_names)} ledgers from Tally.")
 
-    existing_ledgers = set(str(x).strip().lower() for x in df["EnglishLedger"].dropna())
-    new_ledgers = [l for l in ledger_names if l.lower() not in existing_ledgers]
+    # Picks up accountant edits to the xlsx (only if it changed since last run)
+    store = open_local_mapping()
+    new_ledgers = store.add_ledgers(ledger_names)
 
     if not new_ledgers:
         print("✅ No new ledgers — mapping file already up-to-date.")
     else:
         print(f"➕ Found {len(new_ledgers)} new ledgers. Updating mapping file.")
-        new_entries = pd.DataFrame({
-            "EnglishLedger": new_ledgers,
-            "KannadaLedger": new_ledgers  # fallback = English
-        })
-        df = pd.concat([df, new_entries], ignore_index=True)
-        df = df.sort_values(by="EnglishLedger").reset_index(drop=True)
-
-        LEDGER_MAPPING_FILE.parent.mkdir(parents=True, exist_ok=True)
-        df.to_excel(LEDGER_MAPPING_FILE, index=False)
+        store.export_xlsx()
+        with instr.stage("mapping_suggest"):
+            suggestions = MappingIndex(store).suggest(new_ledgers)
 
         OUTPUT_LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
         with open(OUTPUT_LOG_FILE, "a", encoding="utf-8") as f:
             f.write(f"\n--- Sync Run ---\nAdded {len(new_ledgers)} ledgers:\n")
             for name in new_ledgers:
-                f.write(f"  {name}\n")
+                s = suggestions[name]
+                f.write(f"  {name}  → {s.kannada}? ({s.english}, {s.score})\n" if s else f"  {name}\n")
 
         print(f"✅ Mapping updated → {LEDGER_MAPPING_FILE}")
+        suggested = sum(s is not None for s in suggestions.values())
+        if suggested:
+            print(f"💡 {suggested} new ledgers have a suggested Kannada name "
+                  f"(see {OUTPUT_LOG_FILE.name}; review with mapping_index.py)")
+
+    return store
 
-    return df
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Sync Tally ledgers into ledger_mapping.xlsx")
+    ap.add_argument("--full", action="store_true", help="ignore the AlterID watermark and pull every ledger")
+    args = ap.parse_args()
+    sync_ledgers_from_tally(full=args.full)
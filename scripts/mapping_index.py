@@ -0,0 +1,242 @@
+# mapping_index.py
+"""
+Suggested Kannada names for new or unmapped ledgers, taken from the ledgers
+accountants have already translated.
+
+A trigram index over the English names of the translated ledgers (those
+whose KannadaLedger is set and differs from EnglishLedger) is kept in the
+mapping store's own database (config/ledger_mapping.db). It is built once
+and rebuilt only when Kannada names change, i.e. when the store's revision
+moves on. To look a name up, its rarest trigrams are probed in the index.
+The ledgers that share the most of them are ranked by trigram similarity
+(Dice), and the best one at or above MIN_SCORE gives the suggestion:
+
+    "Electricity charges - Office"  ->  ಕರೆಂಟ್ ಶುಲ್ಕ   (from "Electricity Charges", 0.84)
+
+Names that differ only in case, spacing or punctuation match exactly
+(score 1.0). A suggestion is never applied on its own: it goes to the sync
+log, the unmapped report or mapping_suggestions.xlsx for review. Only
+--apply writes suggestions into the mapping, and only those at or above
+--min-score.
+
+    with open_local_index() as index:                # the synced company's mapping
+        index.suggest(["Electricty Charges", ...])   # {name: Suggestion or None}
+
+    python mapping_index.py                          # untranslated ledgers -> output/mapping_suggestions.xlsx
+    python mapping_index.py --apply --min-score 0.9  # write confident suggestions into ledger_mapping.xlsx
+"""
+import argparse
+import re
+from array import array
+from collections import defaultdict, namedtuple
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from openpyxl import Workbook
+
+import instrumentation as instr
+
+base_dir = Path(__file__).parent.parent
+SUGGESTIONS_FILE = base_dir / "output" / "mapping_suggestions.xlsx"
+MIN_SCORE = 0.6         # lowest similarity still suggested
+APPLY_SCORE = 0.9       # --apply default
+PROBE_GRAMS = 3         # rarest trigrams of each word probed in the index
+CANDIDATES = 20         # ledgers sharing the most probed trigrams, ranked by similarity
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS index_entries (
+    id      INTEGER PRIMARY KEY,
+    folded  TEXT NOT NULL,      -- fold(english)
+    english TEXT NOT NULL,
+    kannada TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS index_entries_by_name ON index_entries (folded);
+CREATE TABLE IF NOT EXISTS index_grams (
+    gram TEXT PRIMARY KEY,
+    ids  BLOB NOT NULL          -- index_entries ids containing the trigram, packed array("I")
+) WITHOUT ROWID;
+"""
+
+Suggestion = namedtuple("Suggestion", "kannada english score")
+
+_SEPARATORS = re.compile(r"[\W_]+")
+_ITEMSIZE = array("I").itemsize
+
+
+def fold(name):
+    """Lower case with punctuation and runs of spaces folded to one space."""
+    return " ".join(_SEPARATORS.sub(" ", str(name).lower()).split())
+
+
+def _word_trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigrams(folded):
+    """Trigrams of each word (padded as in PostgreSQL's pg_trgm), so word order doesn't matter."""
+    return set().union(*map(_word_trigrams, folded.split()))
+
+
+def _marks(values):
+    return ",".join("?" * len(values))
+
+
+def similarity(a, b):
+    """Dice coefficient of two trigram sets."""
+    return 2 * len(a & b) / (len(a) + len(b)) if a or b else 0.0
+
+
+class MappingIndex:
+    """Trigram index over a MappingStore's translated ledgers, stored in the same database."""
+
+    def __init__(self, store):
+        self.store = store
+        self.conn = store.conn
+        self.conn.executescript(SCHEMA)
+        self.refresh()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM index_entries").fetchone()[0]
+
+    def refresh(self, force=False):
+        """Rebuild the index if Kannada names changed since it was built; returns True when it did."""
+        revision = str(self.store.revision)
+        if force or self.store._meta("index_revision") != revision:
+            self.rebuild()
+            with self.conn:
+                self.store._set_meta(index_revision=revision)
+            rebuilt = True
+        else:
+            rebuilt = False
+        # ledgers per trigram, to probe the rarest ones first
+        self._counts = {gram: size // _ITEMSIZE
+                        for gram, size in self.conn.execute("SELECT gram, length(ids) FROM index_grams")}
+        return rebuilt
+
+    def rebuild(self):
+        entries, postings = [], defaultdict(lambda: array("I"))
+        rows = self.conn.execute(
+            "SELECT english, kannada FROM mapping WHERE kannada IS NOT NULL AND kannada != '' AND kannada != english")
+        with instr.stage("index_build"):
+            for i, (english, kannada) in enumerate(rows):
+                folded = fold(english)
+                entries.append((i, folded, english, kannada))
+                for gram in trigrams(folded):
+                    postings[gram].append(i)
+            with self.conn:
+                for table in ("index_entries", "index_grams"):
+                    self.conn.execute(f"DELETE FROM {table}")
+                self.conn.executemany("INSERT INTO index_entries VALUES (?, ?, ?, ?)", entries)
+                self.conn.executemany("INSERT INTO index_grams VALUES (?, ?)",
+                                      ((gram, ids.tobytes()) for gram, ids in postings.items()))
+        instr.count("index_entries", len(entries))
+        print(f"🗂️ Mapping index built over {len(entries):,} translated ledgers")
+
+    def _exact(self, folded):
+        row = self.conn.execute("SELECT kannada, english FROM index_entries WHERE folded = ? LIMIT 1",
+                                (folded,)).fetchone()
+        return Suggestion(row[0], row[1], 1.0) if row else None
+
+    def _closest(self, folded, min_score):
+        # The rarest trigrams of every word, so a rare extra word can't take all the probes
+        probe, grams = set(), set()
+        for word in folded.split():
+            word_grams = _word_trigrams(word)
+            grams |= word_grams
+            probe.update(sorted((g for g in word_grams if g in self._counts), key=self._counts.get)[:PROBE_GRAMS])
+        if not probe:
+            return None
+        probe = list(probe)
+        postings = [np.frombuffer(blob, dtype=np.uint32) for blob, in self.conn.execute(
+            f"SELECT ids FROM index_grams WHERE gram IN ({_marks(probe)})", probe)]
+        ids, shared = np.unique(np.concatenate(postings), return_counts=True)
+        if len(ids) > CANDIDATES:
+            ids = ids[np.argpartition(shared, -CANDIDATES)[-CANDIDATES:]]
+        ids = ids.tolist()
+        best = None
+        for candidate, english, kannada in self.conn.execute(
+                f"SELECT folded, english, kannada FROM index_entries WHERE id IN ({_marks(ids)})", ids):
+            score = similarity(grams, trigrams(candidate))
+            if score >= min_score and (best is None or score > best.score):
+                best = Suggestion(kannada, english, round(score, 3))
+        return best
+
+    def lookup(self, name, min_score=MIN_SCORE):
+        """Best Suggestion for one English ledger name, or None."""
+        folded = fold(name)
+        if not folded or not self._counts:
+            return None
+        return self._exact(folded) or self._closest(folded, min_score)
+
+    def suggest(self, names, min_score=MIN_SCORE):
+        """{name: Suggestion or None} for a batch of English ledger names (each distinct name looked up once)."""
+        by_folded, out = {}, {}
+        with instr.stage("index_suggest"):
+            for name in names:
+                folded = fold(name)
+                if folded not in by_folded:
+                    by_folded[folded] = self.lookup(name, min_score)
+                out[name] = by_folded[folded]
+        instr.count("ledgers_suggested", sum(s is not None for s in by_folded.values()))
+        return out
+
+
+@contextmanager
+def open_local_index():
+    """The index of the local mapping store (ledger_sync.open_local_mapping()), closed on exit."""
+    from ledger_sync import open_local_mapping
+    with open_local_mapping() as store:
+        yield MappingIndex(store)
+
+
+def suggest_local(names, min_score=MIN_SCORE):
+    """MappingIndex.suggest() against the local mapping store (e.g. for UnmappedReport.write)."""
+    with open_local_index() as index:
+        return index.suggest(names, min_score)
+
+
+def write_suggestions(path, suggestions):
+    """Write {English name: Suggestion} as xlsx (first two columns as in ledger_mapping.xlsx); returns the path."""
+    path = Path(path)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["EnglishLedger", "KannadaLedger", "MatchedLedger", "Score"])
+    for name, s in sorted(suggestions.items(), key=lambda item: item[0].lower()):
+        ws.append([name, s.kannada, s.english, s.score])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    wb.save(path)
+    return path
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Suggest Kannada names for untranslated ledgers")
+    ap.add_argument("--output", default=str(SUGGESTIONS_FILE), help="suggestions xlsx")
+    ap.add_argument("--min-score", type=float, default=None,
+                    help=f"lowest similarity kept (default {MIN_SCORE}, {APPLY_SCORE} with --apply)")
+    ap.add_argument("--apply", action="store_true",
+                    help="write the suggestions into the mapping store and ledger_mapping.xlsx")
+    ap.add_argument("--rebuild", action="store_true", help="rebuild the index even if the mapping is unchanged")
+    args = ap.parse_args()
+    min_score = args.min_score if args.min_score is not None else (APPLY_SCORE if args.apply else MIN_SCORE)
+
+    with open_local_index() as index:
+        if args.rebuild:
+            index.refresh(force=True)
+        store = index.store
+        untranslated = [english for english, _ in store.untranslated()]
+        suggestions = {name: s for name, s in index.suggest(untranslated, min_score).items() if s}
+        print(f"💡 {len(suggestions)} of {len(untranslated)} untranslated ledgers have a suggestion "
+              f"(score ≥ {min_score})")
+        if args.apply:
+            changed = store.set_kannada({name: s.kannada for name, s in suggestions.items()})
+            if changed:
+                store.export_xlsx()
+            print(f"✅ {changed} Kannada names written → {store.xlsx_path}")
+        elif suggestions:
+            print(f"📝 Suggestions → {write_suggestions(args.output, suggestions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+# mapping_store.py
+"""
+SQLite-backed English -> Kannada ledger mapping.
+
+config/ledger_mapping.db is the runtime source of truth: O(1) lookups through
+as_dict(), append-only inserts for new ledgers. config/ledger_mapping.xlsx
+stays the view accountants edit; it is re-imported only when its
+size/mtime and content hash change, and re-exported when ledgers are added.
+"""
+import hashlib
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+from openpyxl import Workbook, load_workbook
+
+base_dir = Path(__file__).parent.parent
+MAPPING_DB_FILE = base_dir / "config" / "ledger_mapping.db"
+MAPPING_XLSX_FILE = base_dir / "config" / "ledger_mapping.xlsx"
+COLUMNS = ("EnglishLedger", "KannadaLedger")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mapping (
+    key      TEXT PRIMARY KEY,   -- normalised English name: strip().lower()
+    english  TEXT NOT NULL,
+    kannada  TEXT,
+    added_at TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name  TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def normalize(name):
+    return str(name).strip().lower()
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class MappingStore:
+    def __init__(self, db_path=None, xlsx_path=None):
+        self.db_path = Path(db_path or MAPPING_DB_FILE)
+        self.xlsx_path = Path(xlsx_path or MAPPING_XLSX_FILE)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self._dict = None
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------------------------------
+    # Change detection / xlsx import
+    # ------------------------------------------------------
+    def _meta(self, name):
+        row = self.conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, **values):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+            [(k, str(v)) for k, v in values.items()],
+        )
+
+    def _xlsx_signature(self):
+        st = self.xlsx_path.stat()
+        return f"{st.st_size}:{st.st_mtime_ns}"
+
+    def refresh(self, force=False):
+        """
+        Re-import the xlsx if it changed since the last import/export.
+        Returns True when an import happened.
+        """
+        if not self.xlsx_path.exists():
+            return False
+        signature = self._xlsx_signature()
+        if not force and signature == self._meta("xlsx_signature"):
+            return False
+        digest = file_sha256(self.xlsx_path)
+        if not force and digest == self._meta("xlsx_sha256"):
+            # Touched but not edited
+            with self.conn:
+                self._set_meta(xlsx_signature=signature)
+            return False
+        self.import_xlsx()
+        with self.conn:
+            self._set_meta(xlsx_signature=signature, xlsx_sha256=digest)
+        return True
+
+    def import_xlsx(self):
+        """Replace the store contents with the rows of the mapping xlsx."""
+        wb = load_workbook(self.xlsx_path, read_only=True)
+        ws = wb.active
+        rows = ws.iter_rows(values_only=True)
+        header = [str(h).strip() if h is not None else "" for h in next(rows, ())]
+        if not all(col in header for col in COLUMNS):
+            print("⚠️ Mapping file missing columns. Importing no mappings.")
+            records = []
+        else:
+            en_idx, kn_idx = header.index(COLUMNS[0]), header.index(COLUMNS[1])
+            now = datetime.now().isoformat(timespec="seconds")
+            records = []
+            for row in rows:
+                english = row[en_idx] if en_idx < len(row) else None
+                if english is None or str(english).strip() == "":
+                    continue
+                kannada = row[kn_idx] if kn_idx < len(row) else None
+                kannada = str(kannada).strip() if kannada is not None else None
+                records.append((normalize(english), str(english).strip(), kannada, now))
+        wb.close()
+
+        with self.conn:
+            self.conn.execute("DELETE FROM mapping")
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO mapping (key, english, kannada, added_at) VALUES (?, ?, ?, ?)",
+                records,
+            )
+            self._bump_revision()
+        self._dict = None
+        print(f"📥 Imported {len(records)} mappings from {self.xlsx_path.name}")
+
+    def export_xlsx(self):
+        """Write the store back to the xlsx view (sorted by English name)."""
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(list(COLUMNS))
+        for english, kannada in self.conn.execute("SELECT english, kannada FROM mapping ORDER BY english"):
+            ws.append([english, kannada])
+        self.xlsx_path.parent.mkdir(parents=True, exist_ok=True)
+        # Written aside and swapped in, so a concurrent reader never opens a half-written file
+        tmp = self.xlsx_path.with_name(f".{self.xlsx_path.name}.{os.getpid()}.tmp")
+        try:
+            wb.save(tmp)
+            os.replace(tmp, self.xlsx_path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        # Our own write must not trigger a re-import next run
+        with self.conn:
+            self._set_meta(xlsx_signature=self._xlsx_signature(), xlsx_sha256=file_sha256(self.xlsx_path))
+
+    def _bump_revision(self):
+        # Kannada names changed: derived data (mapping_index) is rebuilt from it
+        self._set_meta(revision=self.revision + 1)
+
+    @property
+    def revision(self):
+        """Incremented whenever Kannada names are imported or set."""
+        return int(self._meta("revision") or 0)
+
+    # ------------------------------------------------------
+    # Lookups and inserts
+    # ------------------------------------------------------
+    def as_dict(self):
+        """Normalised English -> Kannada for every mapping with a Kannada name."""
+        if self._dict is None:
+            self._dict = dict(self.conn.execute("SELECT key, kannada FROM mapping WHERE kannada IS NOT NULL"))
+        return self._dict
+
+    def lookup(self, name):
+        return self.as_dict().get(normalize(name))
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM mapping").fetchone()[0]
+
+    def __contains__(self, name):
+        row = self.conn.execute("SELECT 1 FROM mapping WHERE key = ?", (normalize(name),)).fetchone()
+        return row is not None
+
+    def add_ledgers(self, names):
+        """
+        Append ledgers that are not mapped yet (KannadaLedger = EnglishLedger).
+        Returns the names actually added.
+        """
+        now = datetime.now().isoformat(timespec="seconds")
+        added = []
+        with self.conn:
+            for name in names:
+                cur = self.conn.execute(
+                    "INSERT OR IGNORE INTO mapping (key, english, kannada, added_at) VALUES (?, ?, ?, ?)",
+                    (normalize(name), name, name, now),
+                )
+                if cur.rowcount:
+                    added.append(name)
+        if added:
+            self._dict = None
+        return added
+
+    def untranslated(self):
+        """(English, key) of ledgers still without a Kannada name of their own (KannadaLedger = EnglishLedger)."""
+        return self.conn.execute(
+            "SELECT english, key FROM mapping WHERE kannada IS NULL OR kannada = english ORDER BY english").fetchall()
+
+    def set_kannada(self, names):
+        """Set the Kannada name of existing ledgers from {English name: Kannada}; returns how many changed."""
+        with self.conn:
+            changed = self.conn.executemany(
+                "UPDATE mapping SET kannada = ? WHERE key = ? AND kannada IS NOT ?",
+                [(kannada, normalize(english), kannada) for english, kannada in names.items()]).rowcount
+            if changed:
+                self._bump_revision()
+        self._dict = None
+        return changed
+
+    def to_dataframe(self):
+        import pandas as pd
+        rows = self.conn.execute("SELECT english, kannada FROM mapping ORDER BY english").fetchall()
+        return pd.DataFrame(rows, columns=list(COLUMNS))
+
+
+def open_mapping_store(db_path=None, xlsx_path=None):
+    """Open the store and pick up any edits made to the xlsx since last time."""
+    store = MappingStore(db_path, xlsx_path)
+    store.refresh()
+    return store
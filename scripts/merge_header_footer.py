@@ -5,6 +5,9 @@ from copy import copy
 from pathlib import Path
 from datetime import datetime
 
+import instrumentation as instr
+from template_cache import as_template, compile_sheet
+
 def copy_sheet_to(ws_src, ws_dest, dest_start_row):
     # --- File paths ---
 
@@ -26,6 +29,9 @@ def copy_sheet_to(ws_src, ws_dest, dest_start_row):
             ws_dest.column_dimensions[dest_letter].width = src_dim.width
 
     # 2) Copy cells and styles
+    # Each distinct source style is copied attribute by attribute only once;
+    # every further cell with that style reuses the resulting dest StyleArray.
+    style_map = {}
     for r in range(1, max_row + 1):
         dest_r = dest_start_row + r - 1
         for c in range(1, max_col + 1):
@@ -34,6 +40,10 @@ def copy_sheet_to(ws_src, ws_dest, dest_start_row):
 
             # copy style if present
             if src_cell.has_style:
+                key = tuple(src_cell._style)
+                if key in style_map:
+                    dest_cell._style = copy(style_map[key])
+                    continue
                 try:
                     dest_cell.font = copy(src_cell.font)
                     dest_cell.border = copy(src_cell.border)
@@ -41,6 +51,7 @@ def copy_sheet_to(ws_src, ws_dest, dest_start_row):
                     dest_cell.number_format = copy(src_cell.number_format)
                     dest_cell.protection = copy(src_cell.protection)
                     dest_cell.alignment = copy(src_cell.alignment)
+                    style_map[key] = copy(dest_cell._style)
                 except Exception:
                     # be resilient if some style attribute copying fails
                     pass
@@ -69,11 +80,68 @@ def copy_sheet_to(ws_src, ws_dest, dest_start_row):
 
     return max_row  # number of rows copied
 
-def copy_all_parts(header_path, body_path, footer_path, output_path, month_year_kn=None):
-    base_dir = Path(__file__).parent.parent
-    header_with_month = base_dir / "output" /"header_with_month.xlsx"
-    wb_header = load_workbook(header_path)
-    ws_header = wb_header.active
+
+def copy_template_to(tpl, ws_dest, dest_start_row, transform=None):
+    """
+    copy_sheet_to for a CompiledTemplate (see template_cache): styles are
+    registered in the destination workbook once and applied by index.
+    transform, if given, maps each non-empty cell value before it is written.
+    Returns the same row advance copy_sheet_to would.
+    """
+    for col_idx, width in tpl.widths.items():
+        ws_dest.column_dimensions[get_column_letter(col_idx)].width = width
+
+    arrays = tpl.style_arrays(ws_dest)
+    for (r, c), (value, style_idx) in tpl.cells.items():
+        if transform and value is not None:
+            value = transform(value)
+        dest_cell = ws_dest.cell(row=dest_start_row + r - 1, column=c, value=value)
+        if style_idx is not None:
+            dest_cell._style = copy(arrays[style_idx])
+
+    for min_col, min_row, max_col, max_row in tpl.merges:
+        new_range = (
+            f"{get_column_letter(min_col)}{dest_start_row + min_row - 1}:"
+            f"{get_column_letter(max_col)}{dest_start_row + max_row - 1}"
+        )
+        try:
+            ws_dest.merge_cells(new_range)
+        except Exception:
+            pass
+
+    return tpl.advance
+
+def _active_sheet(src):
+    """Active worksheet of src: an in-memory Workbook, or a path / binary file object to load."""
+    if isinstance(src, Workbook):
+        return src.active
+    return load_workbook(src).active
+
+
+def prune_empty_cells(ws):
+    """
+    Drop cells that have neither a value nor a style, exactly as saving and
+    reloading the sheet would, so in-memory parts keep the extent (max_row /
+    max_column) the old body_PnL.xlsx / header_with_month.xlsx round-trip gave.
+    """
+    for key in [k for k, c in ws._cells.items() if c.value is None and not c.has_style]:
+        del ws._cells[key]
+
+
+def copy_all_parts(header_path, body_path, footer_path, output_path, month_year_kn=None, debug_dir=None,
+                   writer=None):
+    """
+    Merge header, body and footer into output_path in memory.
+    Each part may be a path, a binary file object or an already-built Workbook
+    (e.g. the body from automate.build_kannada_body); nothing but the final
+    report touches the disk unless debug_dir is given, in which case the
+    month-substituted header (and an in-memory body) are saved there too.
+    Header and footer templates given as paths or files are compiled once and
+    cached (template_cache), so repeated runs skip the xlsx parse entirely.
+    writer: None or "openpyxl" copies cell by cell into an openpyxl Workbook;
+    "xlsxwriter" compiles the parts and streams the same sheet through
+    excel_writers in bulk.
+    """
     # ==========================================================
     # 3️⃣ Month-year in Kannada (use provided or current date)
     # ==========================================================
@@ -84,21 +152,47 @@ def copy_all_parts(header_path, body_path, footer_path, output_path, month_year_
         }
         now = datetime.now()
         month_year_kn = f"{MONTHS_KN[now.month]} {now.year}"
-    for row in ws_header.iter_rows():
-        for cell in row:
-            if cell.value and "$$monthYear$$" in str(cell.value):
-                new_text = str(cell.value).replace("$$monthYear$$", month_year_kn)
-                cell.value = new_text
-    wb_header.save(header_with_month)
-    
-    wb_header = load_workbook(header_with_month)
-    ws_header = wb_header.active
-    
-    wb_body = load_workbook(body_path)
-    ws_body = wb_body.active
-
-    wb_footer = load_workbook(footer_path)
-    ws_footer = wb_footer.active
+
+    def fill_month(value):
+        if value and "$$monthYear$$" in str(value):
+            return str(value).replace("$$monthYear$$", month_year_kn)
+        return value
+
+    if isinstance(header_path, Workbook) or debug_dir is not None:
+        wb_header = load_workbook(header_path) if not isinstance(header_path, Workbook) else header_path
+        ws_header = wb_header.active
+        for row in ws_header.iter_rows():
+            for cell in row:
+                if cell.value and "$$monthYear$$" in str(cell.value):
+                    cell.value = fill_month(cell.value)
+        prune_empty_cells(ws_header)
+    else:
+        wb_header = None
+        header_tpl = as_template(header_path)
+
+    ws_body = _active_sheet(body_path)
+    if isinstance(body_path, Workbook):
+        prune_empty_cells(ws_body)
+
+    if debug_dir is not None:
+        debug_dir = Path(debug_dir)
+        debug_dir.mkdir(parents=True, exist_ok=True)
+        wb_header.save(debug_dir / "header_with_month.xlsx")
+        if isinstance(body_path, Workbook):
+            body_path.save(debug_dir / "body_PnL.xlsx")
+
+    if writer not in (None, "openpyxl"):
+        from stream_renderer import write_templates
+
+        parts = [
+            (compile_sheet(ws_header), None) if wb_header is not None else (header_tpl, fill_month),
+            (compile_sheet(ws_body), None),
+            (compile_sheet(footer_path.active) if isinstance(footer_path, Workbook) else as_template(footer_path),
+             None),
+        ]
+        write_templates(parts, output_path, writer)
+        print(f"Final file written to: {output_path}")
+        return
 
     wb_final = Workbook()
     ws_final = wb_final.active
@@ -106,7 +200,10 @@ def copy_all_parts(header_path, body_path, footer_path, output_path, month_year_
     current_row = 1
 
     # copy header
-    rows_copied = copy_sheet_to(ws_header, ws_final, current_row)
+    if wb_header is not None:
+        rows_copied = copy_sheet_to(ws_header, ws_final, current_row)
+    else:
+        rows_copied = copy_template_to(header_tpl, ws_final, current_row, fill_month)
     current_row += rows_copied
 
     # copy body
@@ -114,11 +211,17 @@ def copy_all_parts(header_path, body_path, footer_path, output_path, month_year_
     current_row += rows_copied
 
     # copy footer
-    rows_copied = copy_sheet_to(ws_footer, ws_final, current_row)
+    if isinstance(footer_path, Workbook):
+        rows_copied = copy_sheet_to(footer_path.active, ws_final, current_row)
+    else:
+        rows_copied = copy_template_to(as_template(footer_path), ws_final, current_row)
     current_row += rows_copied
 
     # save final workbook
-    wb_final.save(output_path)
+    with instr.stage("save"):
+        wb_final.save(output_path)
+    instr.count("rows_written", ws_final.max_row)
+    instr.count_file("file_bytes_written", output_path)
     print(f"Final file written to: {output_path}")
 
 if __name__ == "__main__":
@@ -0,0 +1,257 @@
+# multi_company.py
+"""
+Month-end close for many Tally companies: each company's reports are
+generated by automate.run_batch in its own worker process, with its own
+Tally endpoint, mapping file, templates and output folders.
+
+Companies file (JSON; relative paths are resolved against the file's folder):
+
+    {
+      "periods": [{"from": "01-04-2025", "to": "30-04-2025"}],
+      "companies": [
+        {"name": "Vega Traders", "tally_url": "http://10.0.0.21:9000"},
+        {"name": "Vega Agencies", "tally_url": "http://10.0.0.22:9000",
+         "mapping_file": "agencies/ledger_mapping.xlsx",
+         "templates": {"header": "agencies/header_template.xlsx"},
+         "output_dir": "agencies/output",
+         "periods": [{"from": "01-01-2025", "to": "31-03-2025"}]}
+      ]
+    }
+
+Unset paths default to companies/<name>/ (config/ledger_mapping.xlsx,
+exports/, output/) and to the shared templates in config/. Each company's
+console output goes to <output_dir>/vega_run.log.
+
+    python multi_company.py companies.json --processes 8
+    python multi_company.py companies.json --period 01-05-2025:31-05-2025 --renderer stream
+    python multi_company.py companies.json --report pnl --report balance-sheet --report trial-balance
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from automate import RENDERERS, base_dir, parse_period
+from excel_writers import WRITERS, writer_available
+from report_defs import REPORTS
+
+COMPANIES_DIR = base_dir / "companies"
+LOG_NAME = "vega_run.log"
+TEMPLATE_KEYS = ("header", "body", "footer")
+
+
+def company_slug(name):
+    slug = re.sub(r"[^\w]+", "_", name.strip(), flags=re.UNICODE).strip("_").lower()
+    return slug or "company"
+
+
+def load_companies(path):
+    """
+    Read a companies file and return (companies, default_periods).
+    Every company comes back with absolute paths filled in.
+    """
+    path = Path(path)
+    with open(path, encoding="utf-8") as f:
+        job = json.load(f)
+
+    def resolve(p):
+        p = Path(p)
+        return p if p.is_absolute() else (path.parent / p).resolve()
+
+    def periods_of(entry):
+        return [parse_period(f"{p['from']}:{p['to']}") for p in entry.get("periods", [])]
+
+    companies, seen = [], set()
+    for entry in job.get("companies", []):
+        if not entry.get("name") or not entry.get("tally_url"):
+            raise ValueError(f"Company entry needs 'name' and 'tally_url': {entry}")
+        slug = company_slug(entry["name"])
+        if slug in seen:
+            raise ValueError(f"Duplicate company '{entry['name']}' in {path}")
+        seen.add(slug)
+
+        workspace = resolve(entry["workspace"]) if entry.get("workspace") else COMPANIES_DIR / slug
+        templates = {k: str(resolve(v)) for k, v in entry.get("templates", {}).items() if k in TEMPLATE_KEYS}
+        companies.append({
+            "name": entry["name"],
+            "slug": slug,
+            "tally_url": entry["tally_url"],
+            "mapping_file": str(resolve(entry["mapping_file"]) if entry.get("mapping_file")
+                                else workspace / "config" / "ledger_mapping.xlsx"),
+            "templates": templates,
+            "exports_dir": str(resolve(entry["exports_dir"]) if entry.get("exports_dir")
+                               else workspace / "exports"),
+            "output_dir": str(resolve(entry["output_dir"]) if entry.get("output_dir")
+                              else workspace / "output"),
+            "periods": periods_of(entry),
+        })
+    return companies, periods_of(job)
+
+
+def configure_company(company, timeout=None, retries=None):
+    """Point this process's Tally session, ledger sync, response cache and P&L history at one company."""
+    import ledger_sync
+    import pnl_history
+    import tally_cache
+    import tally_client
+
+    output_dir = Path(company["output_dir"])
+    tally_client.configure(url=company["tally_url"], read_timeout=timeout, retries=retries)
+    ledger_sync.configure(mapping_file=company["mapping_file"], log_file=output_dir / "updated_mapping_log.txt")
+    tally_cache.configure(cache_dir=output_dir / ".tally_cache")
+    pnl_history.configure(history_file=Path(company["exports_dir"]) / "pnl_history.db", company=company["name"])
+
+
+def run_company(company, periods, renderer="classic", full_sync=False, workers=None,
+                timeout=None, retries=None, refresh=False, offline=False, chunk=None, compare=False,
+                writer=None, incremental=False, reports=None):
+    """
+    Worker: generate one company's reports. Runs in a pool process, so the
+    module-level Tally session, ledger_sync paths and response cache are this
+    company's alone.
+    Returns a summary dict (never raises).
+    """
+    reports = reports or ["pnl"]
+    expected = len(periods) * len(reports)
+    import automate
+
+    output_dir = Path(company["output_dir"])
+    output_dir.mkdir(parents=True, exist_ok=True)
+    result = {
+        "name": company["name"],
+        "pid": os.getpid(),
+        "expected": expected,
+        "reports": [],
+        "error": None,
+        "stats": {},
+    }
+    t0 = time.perf_counter()
+    with open(output_dir / LOG_NAME, "a", encoding="utf-8") as log, redirect_stdout(log):
+        print(f"\n=== {company['name']} ({company['tally_url']}) ===")
+        try:
+            configure_company(company, timeout, retries)
+            written = automate.run_batch(
+                periods, output_dir, workers, full_sync, renderer,
+                template_paths=company["templates"], exports_dir=company["exports_dir"],
+                stats=result["stats"], refresh=refresh, offline=offline, chunk=chunk, compare=compare,
+                writer=writer, incremental=incremental, reports=reports,
+            )
+            result["reports"] = [str(p) for p in written]
+            if len(written) < expected:
+                result["error"] = f"{len(written)}/{expected} reports written (see {output_dir / LOG_NAME})"
+        except Exception as e:
+            traceback.print_exc()
+            result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - t0
+    return result
+
+
+def run_companies(companies, default_periods=None, processes=None, renderer="classic",
+                  full_sync=False, workers=None, timeout=None, retries=None, refresh=False, offline=False,
+                  chunk=None, compare=False, writer=None, incremental=False, reports=None):
+    """Generate every company's reports across a process pool; returns the per-company summaries."""
+    # Workers spend most of their time waiting on Tally, so allow a few even on small machines
+    processes = processes or max(1, min(len(companies), max(os.cpu_count() or 1, 4)))
+    results = []
+    started = time.perf_counter()
+
+    # spawn: workers start clean instead of inheriting this process's sessions and threads
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=ctx) as pool:
+        futures = {}
+        for company in companies:
+            periods = company["periods"] or default_periods or []
+            if not periods:
+                results.append({"name": company["name"], "expected": 0, "reports": [], "seconds": 0.0,
+                                "error": "no periods configured", "stats": {}})
+                continue
+            fut = pool.submit(run_company, company, periods, renderer, full_sync, workers, timeout, retries,
+                              refresh, offline, chunk, compare, writer, incremental, reports)
+            futures[fut] = (company, periods)
+        for fut in as_completed(futures):
+            company, periods = futures[fut]
+            try:
+                result = fut.result()
+            except Exception as e:  # worker process died
+                result = {"name": company["name"], "expected": len(periods) * len(reports or ["pnl"]),
+                          "reports": [], "seconds": 0.0, "error": f"worker crashed: {e}", "stats": {}}
+            status = "✅" if result["error"] is None else "❌"
+            print(f"{status} {result['name']}: {len(result['reports'])}/{result['expected']} reports "
+                  f"in {result['seconds']:.1f}s")
+            results.append(result)
+
+    print_summary(results, time.perf_counter() - started, processes)
+    return results
+
+
+def print_summary(results, wall_seconds, processes):
+    print(f"\n📋 Summary ({len(results)} companies, {processes} processes)")
+    print(f"   {'company':<28} {'reports':>8} {'seconds':>8} {'sync':>7} {'render':>7}  status")
+    for r in sorted(results, key=lambda r: r["name"].lower()):
+        setup = r["stats"].get("setup", {})
+        render = sum(sum(t.get(k, 0.0) for k in ("parse", "body", "merge", "render"))
+                     for t in r["stats"].get("periods", {}).values())
+        status = "ok" if r["error"] is None else r["error"]
+        print(f"   {r['name'][:28]:<28} {len(r['reports']):>3}/{r['expected']:<4} {r['seconds']:>8.1f} "
+              f"{setup.get('sync', 0.0):>7.2f} {render:>7.2f}  {status}")
+    failed = [r for r in results if r["error"] is not None]
+    busy = sum(r["seconds"] for r in results)
+    print(f"\n   Wall time {wall_seconds:.1f}s for {busy:.1f}s of company work; "
+          f"{len(results) - len(failed)} ok, {len(failed)} failed.")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("companies_file", help="JSON file listing companies (see above)")
+    ap.add_argument("--period", type=parse_period, action="append", default=[],
+                    metavar="DD-MM-YYYY:DD-MM-YYYY", help="period for companies without their own (repeatable)")
+    ap.add_argument("--processes", type=int, help="companies processed in parallel (default: CPU count, at least 4)")
+    ap.add_argument("--workers", type=int, help="concurrent Tally requests / renders within a company")
+    ap.add_argument("--renderer", choices=RENDERERS, default="classic")
+    ap.add_argument("--writer", choices=list(WRITERS), default="openpyxl",
+                    help="xlsx library for the classic/stream renderers (xlsxwriter: pip install xlsxwriter)")
+    ap.add_argument("--full-sync", action="store_true",
+                    help="pull every ledger instead of only those altered since the last sync")
+    ap.add_argument("--timeout", type=float, help="seconds to wait for a Tally response")
+    ap.add_argument("--retries", type=int, help="retries on connection errors / 5xx")
+    ap.add_argument("--refresh", action="store_true", help="re-export even if cached exports are still valid")
+    ap.add_argument("--offline", action="store_true", help="use cached exports and mappings; don't contact Tally")
+    ap.add_argument("--chunk", choices=["month", "quarter"], help="export long periods in sub-ranges")
+    ap.add_argument("--compare", action="store_true",
+                    help="also write comparison_<period>.xlsx (prior period / last year) from each company's history")
+    ap.add_argument("--incremental", action="store_true",
+                    help="rebuild only what changed since each report was last built (see incremental_build)")
+    ap.add_argument("--report", choices=list(REPORTS), action="append", default=[],
+                    help="report to render per period (repeatable, default pnl); fetched together per company")
+    args = ap.parse_args(argv)
+    if args.renderer == "pdf":
+        from print_renderer import pdf_available
+        if not pdf_available():
+            ap.error("--renderer pdf needs WeasyPrint (pip install weasyprint)")
+
+    if not writer_available(args.writer):
+        ap.error(f"--writer {args.writer} needs XlsxWriter (pip install xlsxwriter)")
+
+    companies, default_periods = load_companies(args.companies_file)
+    if args.period:
+        default_periods = args.period
+    if not companies:
+        print("No companies configured.")
+        return []
+    results = run_companies(companies, default_periods, args.processes, args.renderer,
+                            args.full_sync, args.workers, args.timeout, args.retries,
+                            args.refresh, args.offline, args.chunk, args.compare, args.writer,
+                            args.incremental, list(dict.fromkeys(args.report)) or None)
+    if any(r["error"] for r in results):
+        raise SystemExit(1)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+# pnl_history.py
+"""
+Local history of parsed Profit & Loss periods, for prior-period and
+year-on-year comparisons without asking Tally again.
+
+Every rendered period's ledger lines (English name, the Kannada name it was
+translated to, amount in paise) are stored in exports/pnl_history.db, one
+snapshot per company and period; re-running a period replaces its snapshot.
+Lines are clustered by (company, period) and indexed by ledger, so a
+period, a comparison or one ledger's amounts over years of history are
+index range scans:
+
+    with open_history() as history:
+        history.record(from_date, to_date, income, expense, mapping_dict)
+        frame = history.comparison(from_date, to_date)      # Current / PriorPeriod / LastYear
+        history.ledger_history("Salary", since, until)
+
+    python pnl_history.py periods
+    python pnl_history.py compare --from 01-04-2025 --to 30-04-2025 --output comparison.xlsx
+    python pnl_history.py ledger "Electricity Charges" --since 01-04-2020
+"""
+import argparse
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+base_dir = Path(__file__).parent.parent
+HISTORY_FILE = base_dir / "exports" / "pnl_history.db"
+COMPANY = "default"
+ENABLED = True
+SECTIONS = ("income", "expense")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS periods (
+    company       TEXT NOT NULL,
+    from_date     TEXT NOT NULL,     -- YYYY-MM-DD, so text order is date order
+    to_date       TEXT NOT NULL,
+    recorded_at   TEXT NOT NULL,
+    lines         INTEGER NOT NULL,
+    income_paise  INTEGER NOT NULL,
+    expense_paise INTEGER NOT NULL,
+    PRIMARY KEY (company, from_date, to_date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS lines (
+    company      TEXT NOT NULL,
+    from_date    TEXT NOT NULL,
+    to_date      TEXT NOT NULL,
+    section      TEXT NOT NULL,      -- income / expense
+    seq          INTEGER NOT NULL,   -- position in the export
+    ledger_key   TEXT NOT NULL,      -- normalised English name, as in the mapping
+    ledger       TEXT NOT NULL,
+    kannada      TEXT,               -- NULL: unmapped when recorded
+    amount_paise INTEGER NOT NULL,
+    PRIMARY KEY (company, from_date, to_date, section, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS lines_by_ledger ON lines (company, ledger_key, from_date);
+"""
+
+
+def configure(history_file=None, company=None, enabled=None):
+    """Override the history database, the company snapshots are recorded under, or switch it off."""
+    global HISTORY_FILE, COMPANY, ENABLED
+    if history_file is not None:
+        HISTORY_FILE = Path(history_file)
+    if company is not None:
+        COMPANY = company
+    if enabled is not None:
+        ENABLED = enabled
+
+
+def _day(d):
+    return f"{d:%Y-%m-%d}"
+
+
+def _month_end(d):
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def _add_months(d, months, end=False):
+    index = d.year * 12 + d.month - 1 + months
+    first = d.replace(year=index // 12, month=index % 12 + 1, day=1)
+    return _month_end(first) if end else first.replace(day=min(d.day, _month_end(first).day))
+
+
+def prior_period(from_date, to_date):
+    """
+    The period of the same length just before: whole calendar months step
+    back by their number of months (April -> March, Q2 -> Q1), anything else by its number of days.
+    """
+    if from_date.day == 1 and to_date == _month_end(to_date):
+        months = (to_date.year - from_date.year) * 12 + to_date.month - from_date.month + 1
+        return _add_months(from_date, -months), _add_months(to_date, -months, end=True)
+    days = (to_date - from_date).days + 1
+    return from_date - timedelta(days=days), to_date - timedelta(days=days)
+
+
+def last_year(from_date, to_date):
+    """The same period a year earlier (a month-end stays a month-end: 29-02 -> 28-02)."""
+    return (_add_months(from_date, -12),
+            _add_months(to_date, -12, end=to_date == _month_end(to_date)))
+
+
+class HistoryStore:
+    """Snapshots of parsed periods in SQLite (thread-safe: batch renders record concurrently)."""
+
+    def __init__(self, history_file=None, company=None):
+        self.path = Path(history_file or HISTORY_FILE)
+        self.company = company or COMPANY
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, from_date, to_date, income, expense, mapping_dict=None):
+        """
+        Store (replace) the period's snapshot. income/expense: parsed
+        [(english_name, amount)]; mapping_dict: normalised English -> Kannada
+        as used for the report. Returns the number of lines stored.
+        """
+        mapping_dict = mapping_dict or {}
+        period = (self.company, _day(from_date), _day(to_date))
+        rows, totals = [], {}
+        for section, data in zip(SECTIONS, (income, expense)):
+            totals[section] = 0
+            for seq, (name, amount) in enumerate(data):
+                key = name.strip().lower()
+                paise = round(amount * 100)
+                totals[section] += paise
+                rows.append((*period, section, seq, key, name.strip(), mapping_dict.get(key), paise))
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM lines WHERE company = ? AND from_date = ? AND to_date = ?", period)
+            self.conn.executemany("INSERT INTO lines VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.execute("INSERT OR REPLACE INTO periods VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              (*period, datetime.now().isoformat(timespec="seconds"), len(rows),
+                               totals["income"], totals["expense"]))
+        return len(rows)
+
+    def has_period(self, from_date, to_date):
+        with self._lock:
+            return self.conn.execute(
+                "SELECT 1 FROM periods WHERE company = ? AND from_date = ? AND to_date = ?",
+                (self.company, _day(from_date), _day(to_date))).fetchone() is not None
+
+    def lines(self, from_date, to_date):
+        """[(section, ledger, kannada, amount)] of the period in export order; [] if not recorded."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT section, ledger, kannada, amount_paise FROM lines "
+                "WHERE company = ? AND from_date = ? AND to_date = ? ORDER BY section DESC, seq",
+                (self.company, _day(from_date), _day(to_date))).fetchall()
+        return [(section, ledger, kannada, paise / 100) for section, ledger, kannada, paise in rows]
+
+    def periods(self, since=None, until=None):
+        """[(from, to, lines, income, expense, recorded_at)] of periods starting within since..until."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT from_date, to_date, lines, income_paise, expense_paise, recorded_at FROM periods "
+                "WHERE company = ? AND from_date >= ? AND from_date <= ? ORDER BY from_date, to_date",
+                (self.company, _day(since) if since else "", _day(until) if until else "9999")).fetchall()
+        return [(datetime.strptime(f, "%Y-%m-%d"), datetime.strptime(t, "%Y-%m-%d"), n, inc / 100, exp / 100, at)
+                for f, t, n, inc, exp, at in rows]
+
+    def ledger_history(self, ledger, since=None, until=None):
+        """[(from, to, section, amount)] for one ledger (English name, any case) in periods within since..until."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT from_date, to_date, section, SUM(amount_paise) FROM lines INDEXED BY lines_by_ledger "
+                "WHERE company = ? AND ledger_key = ? AND from_date >= ? AND from_date <= ? "
+                "GROUP BY from_date, to_date, section ORDER BY from_date, to_date",
+                (self.company, ledger.strip().lower(), _day(since) if since else "",
+                 _day(until) if until else "9999")).fetchall()
+        return [(datetime.strptime(f, "%Y-%m-%d"), datetime.strptime(t, "%Y-%m-%d"), section, paise / 100)
+                for f, t, section, paise in rows]
+
+    def _sums(self, from_date, to_date):
+        """{(section, ledger_key): [paise, ledger, kannada]} for a period (duplicates summed), None if absent."""
+        if not self.has_period(from_date, to_date):
+            return None
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT section, ledger_key, ledger, kannada, amount_paise FROM lines "
+                "WHERE company = ? AND from_date = ? AND to_date = ? ORDER BY section DESC, seq",
+                (self.company, _day(from_date), _day(to_date))).fetchall()
+        sums = {}
+        for section, key, ledger, kannada, paise in rows:
+            entry = sums.setdefault((section, key), [0, ledger, kannada])
+            entry[0] += paise
+        return sums
+
+    def comparison(self, from_date, to_date):
+        """
+        DataFrame, one row per (section, ledger) seen in the period, its prior
+        period or the same period last year: Section, KannadaLedger,
+        EnglishLedger, Current, PriorPeriod, Change, LastYear, ChangeYoY.
+        A comparison column is empty when that period was never recorded; a
+        ledger missing from a recorded period counts as 0.
+        """
+        import pandas as pd
+
+        current = self._sums(from_date, to_date) or {}
+        prior = self._sums(*prior_period(from_date, to_date))
+        year_ago = self._sums(*last_year(from_date, to_date))
+
+        keys = list(current)
+        for other in (prior, year_ago):
+            keys += [k for k in (other or {}) if k not in current and k not in keys]
+
+        def amount(sums, key):
+            if sums is None:
+                return None
+            return sums[key][0] / 100 if key in sums else 0.0
+
+        rows = []
+        for key in keys:
+            _, ledger, kannada = current.get(key) or (prior or {}).get(key) or year_ago[key]
+            now = amount(current, key)
+            before, ago = amount(prior, key), amount(year_ago, key)
+            rows.append({
+                "Section": key[0], "KannadaLedger": kannada, "EnglishLedger": ledger, "Current": now,
+                "PriorPeriod": before, "Change": None if before is None else now - before,
+                "LastYear": ago, "ChangeYoY": None if ago is None else now - ago,
+            })
+        return pd.DataFrame(rows, columns=["Section", "KannadaLedger", "EnglishLedger", "Current", "PriorPeriod",
+                                           "Change", "LastYear", "ChangeYoY"])
+
+
+def open_history(history_file=None):
+    """The history store, or None when recording is switched off."""
+    return HistoryStore(history_file) if ENABLED else None
+
+
+def write_comparison(history, from_date, to_date, output_path):
+    """Write history.comparison() for the period as xlsx; returns (path, notes about missing periods)."""
+    frame = history.comparison(from_date, to_date)
+    notes = []
+    for label, (f, t) in (("prior period", prior_period(from_date, to_date)),
+                          ("last year", last_year(from_date, to_date))):
+        if not history.has_period(f, t):
+            notes.append(f"no {label} ({f:%d-%m-%Y} to {t:%d-%m-%Y}) in the history yet")
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    frame.to_excel(output_path, index=False)
+    return output_path, notes
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--history", help=f"history database (default: {HISTORY_FILE})")
+    ap.add_argument("--company", help=f"company the snapshots were recorded under (default: {COMPANY})")
+    sub = ap.add_subparsers(dest="command", required=True)
+    day = lambda s: datetime.strptime(s, "%d-%m-%Y")  # noqa: E731
+    p = sub.add_parser("periods", help="list recorded periods")
+    p.add_argument("--since", type=day)
+    p.add_argument("--until", type=day)
+    p = sub.add_parser("compare", help="current vs prior period vs last year")
+    p.add_argument("--from", dest="from_date", type=day, required=True)
+    p.add_argument("--to", dest="to_date", type=day, required=True)
+    p.add_argument("--output", help="write the comparison to this xlsx instead of printing it")
+    p = sub.add_parser("ledger", help="one ledger's amounts over time")
+    p.add_argument("name")
+    p.add_argument("--since", type=day)
+    p.add_argument("--until", type=day)
+    args = ap.parse_args()
+    configure(history_file=args.history, company=args.company)
+
+    with HistoryStore() as history:
+        if args.command == "periods":
+            for f, t, n, income, expense, at in history.periods(args.since, args.until):
+                print(f"   {f:%d-%m-%Y} to {t:%d-%m-%Y}  {n:>6} lines  income {income:>14,.2f}  "
+                      f"expense {expense:>14,.2f}  (recorded {at})")
+        elif args.command == "compare":
+            if args.output:
+                path, notes = write_comparison(history, args.from_date, args.to_date, args.output)
+                print(f"📊 Comparison → {path}")
+                for note in notes:
+                    print(f"   ⚠️ {note}")
+            else:
+                print(history.comparison(args.from_date, args.to_date).to_string(index=False))
+        else:
+            for f, t, section, amount in history.ledger_history(args.name, args.since, args.until):
+                print(f"   {f:%d-%m-%Y} to {t:%d-%m-%Y}  {section:<8} {amount:>14,.2f}")
+
+
+if __name__ == "__main__":
+    main()
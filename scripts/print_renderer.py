@@ -0,0 +1,321 @@
+# print_renderer.py
+"""
+Print renderer: the final report as paginated HTML or PDF, straight from
+the income/expense rows and the compiled templates, without the xlsx
+round-trip through Excel.
+
+The report is one table on the sheet's grid: the header template rows are
+the table head (repeated on every printed page), then the data rows, then
+the footer template rows (kept together on the last page). Merged ranges
+become colspan/rowspan, the template style tables become CSS classes
+(font size, bold, alignment, borders, fill) and column widths are the
+sheet's widths in characters, so the 15-character name columns wrap where
+Excel wraps them. Long Kannada names get break opportunities between
+syllables only, so a wrap never splits a conjunct or a vowel sign from
+its consonant.
+
+Kannada fonts: any .ttf/.otf/.woff/.woff2 in FONT_DIR (e.g.
+NotoSansKannada-Regular.ttf, NotoSansKannada-Bold.ttf) is declared as the
+first font family; HTML embeds it (base64) so the file prints the same
+anywhere, and PDF output embeds the glyphs used. Without font files the
+system's Kannada fonts are used.
+
+PDF output needs WeasyPrint (pip install weasyprint, plus the Pango system
+library); HTML needs nothing.
+"""
+import base64
+import html
+import unicodedata
+from pathlib import Path
+
+import instrumentation as instr
+from stream_renderer import (BODY_WIDTHS, EXP_AMT_COL, EXP_NAME_COL, FOOTER_FILE, HEADER_FILE,
+                             INC_AMT_COL, INC_NAME_COL, PLACEHOLDER, SL_NO_EXP_COL, SL_NO_INC_COL, START_ROW,
+                             TEMPLATE_FILE)
+from template_cache import as_template
+
+base_dir = Path(__file__).parent.parent
+FONT_DIR = base_dir / "config" / "fonts"
+FONT_FAMILY = "VegaKannada"
+FALLBACK_FONTS = '"Noto Sans Kannada", "Noto Serif Kannada", "Tunga", "Kedage", "Lohit Kannada", sans-serif'
+EMBED_FONTS = True        # HTML: inline the font files; PDF always embeds the glyphs it uses
+PAGE_SIZE = "A4"
+PAGE_MARGIN = "12mm"
+NAME_WIDTH = BODY_WIDTHS[EXP_NAME_COL]
+
+FONT_FORMATS = {".ttf": "truetype", ".otf": "opentype", ".woff": "woff", ".woff2": "woff2"}
+BORDER_CSS = {"thin": "1px solid", "hair": "1px solid", "medium": "2px solid", "thick": "3px solid",
+              "double": "3px double", "dashed": "1px dashed", "dotted": "1px dotted",
+              "mediumDashed": "2px dashed", "dashDot": "1px dashed", "mediumDashDot": "2px dashed",
+              "dashDotDot": "1px dotted", "mediumDashDotDot": "2px dotted", "slantDashDot": "2px dashed"}
+VIRAMA_JOINERS = {"್", "‌", "‍"}   # Kannada virama, ZWNJ, ZWJ: the next letter joins
+
+_memo = {}
+
+
+def configure(font_dir=None, embed_fonts=None, page_size=None, page_margin=None):
+    """Override the font folder, HTML font embedding and the printed page."""
+    global FONT_DIR, EMBED_FONTS, PAGE_SIZE, PAGE_MARGIN
+    if font_dir is not None:
+        FONT_DIR = Path(font_dir)
+    if embed_fonts is not None:
+        EMBED_FONTS = embed_fonts
+    if page_size is not None:
+        PAGE_SIZE = page_size
+    if page_margin is not None:
+        PAGE_MARGIN = page_margin
+    _memo.clear()
+
+
+def pdf_available():
+    """True if WeasyPrint and its system libraries (Pango) can be loaded."""
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError):   # OSError: the package is there but Pango is not
+        return False
+    return True
+
+
+# ==========================================================
+# Fonts and line breaking
+# ==========================================================
+def font_face_css(embed=True):
+    """@font-face rules for the files in FONT_DIR (data: URIs when embed, else file URLs)."""
+    key = ("fonts", str(FONT_DIR), embed)
+    if key in _memo:
+        return _memo[key]
+    rules = []
+    files = sorted(p for p in FONT_DIR.glob("*") if p.suffix.lower() in FONT_FORMATS) if FONT_DIR.is_dir() else []
+    for path in files:
+        fmt = FONT_FORMATS[path.suffix.lower()]
+        if embed:
+            src = f"data:font/{fmt};base64,{base64.b64encode(path.read_bytes()).decode('ascii')}"
+        else:
+            src = path.resolve().as_uri()
+        weight = "bold" if "bold" in path.stem.lower() else "normal"
+        rules.append(f'@font-face {{ font-family: "{FONT_FAMILY}"; src: url("{src}") format("{fmt}"); '
+                     f"font-weight: {weight}; }}")
+    _memo[key] = "\n".join(rules)
+    return _memo[key]
+
+
+def syllable_breaks(text, width=NAME_WIDTH):
+    """
+    Escaped text with <wbr> between the syllables of words longer than width,
+    so a narrow column can wrap them without splitting a conjunct (virama/ZWJ
+    joins the next letter) or detaching a vowel sign or other combining mark.
+    """
+    words = []
+    for word in text.split(" "):
+        if len(word) <= width:
+            words.append(html.escape(word))
+            continue
+        parts, prev = [], ""
+        for ch in word:
+            if prev and prev not in VIRAMA_JOINERS and not unicodedata.category(ch).startswith("M") \
+                    and ch not in VIRAMA_JOINERS:
+                parts.append("<wbr>")
+            parts.append(html.escape(ch))
+            prev = ch
+        words.append("".join(parts))
+    return " ".join(words)
+
+
+def format_amount(amount):
+    """Amount as AMOUNT_FORMAT ('₹ #,##0.00') shows it."""
+    return f"₹ {amount:,.2f}"
+
+
+# ==========================================================
+# Templates -> CSS + table rows
+# ==========================================================
+def _color(color):
+    if color is not None and getattr(color, "type", None) == "rgb" and isinstance(color.rgb, str):
+        return f"#{color.rgb[-6:]}"
+    return None
+
+
+def style_css(style):
+    """CSS declarations for one entry of a template's style table."""
+    font, border, fill, _number_format, _protection, alignment = style
+    css = []
+    if font is not None:
+        if font.sz:
+            css.append(f"font-size: {float(font.sz):g}pt")
+        if font.b:
+            css.append("font-weight: bold")
+        if font.i:
+            css.append("font-style: italic")
+        if _color(font.color):
+            css.append(f"color: {_color(font.color)}")
+    for side in ("left", "right", "top", "bottom"):
+        edge = getattr(border, side, None) if border is not None else None
+        if edge is not None and edge.style in BORDER_CSS:
+            css.append(f"border-{side}: {BORDER_CSS[edge.style]} {_color(edge.color) or '#000'}")
+    if fill is not None and fill.fill_type == "solid" and _color(fill.fgColor):
+        css.append(f"background: {_color(fill.fgColor)}")
+    if alignment is not None:
+        horizontal = {"centerContinuous": "center", "distributed": "justify"}.get(alignment.horizontal,
+                                                                                 alignment.horizontal)
+        if horizontal in ("left", "center", "right", "justify"):
+            css.append(f"text-align: {horizontal}")
+        if alignment.vertical in ("top", "center", "bottom"):
+            css.append(f"vertical-align: {'middle' if alignment.vertical == 'center' else alignment.vertical}")
+    return "; ".join(css)
+
+
+def _template_part(tpl, prefix):
+    """
+    (css, rows) for a header/footer template: one CSS class per style, and
+    the <tr> markup of every row with merges as colspan/rowspan. The
+    placeholder is left in for the caller. Memoised per template content.
+    """
+    key = ("part", tpl.sha256, prefix)
+    if key in _memo:
+        return _memo[key]
+    css = [f".{prefix}{i} {{ {style_css(style)} }}" for i, style in enumerate(tpl.styles)]
+    spans, covered = {}, set()
+    for min_col, min_row, max_col, max_row in tpl.merges:
+        spans[(min_row, min_col)] = (max_row - min_row + 1, max_col - min_col + 1)
+        covered.update((r, c) for r in range(min_row, max_row + 1) for c in range(min_col, max_col + 1))
+    rows = []
+    for r in range(1, tpl.max_row + 1):
+        cells = []
+        for c in range(1, tpl.max_col + 1):
+            if (r, c) in covered and (r, c) not in spans:
+                continue
+            value, style_idx = tpl.cells.get((r, c), (None, None))
+            attrs = f' class="{prefix}{style_idx}"' if style_idx is not None else ""
+            rowspan, colspan = spans.get((r, c), (1, 1))
+            attrs += f' rowspan="{rowspan}"' if rowspan > 1 else ""
+            attrs += f' colspan="{colspan}"' if colspan > 1 else ""
+            cells.append(f"<td{attrs}>{html.escape(str(value)) if value is not None else ''}</td>")
+        rows.append(f"<tr>{''.join(cells)}</tr>")
+    _memo[key] = ("\n".join(css), "\n".join(rows))
+    return _memo[key]
+
+
+def _column_widths(tpl_header, tpl_body, tpl_footer, n_cols):
+    """Sheet column widths in characters, later parts winning as in the xlsx renderers."""
+    widths = dict(tpl_header.widths)
+    widths.update(tpl_body.widths)
+    widths.update(BODY_WIDTHS)
+    widths.update(tpl_footer.widths)
+    return [widths.get(c, 8.43) for c in range(1, n_cols + 1)]   # 8.43: Excel's default width
+
+
+def _body_css(tpl_body):
+    """Data cell classes from the body template's reference row (as generate_kannada_pnl styles them)."""
+    css = []
+    for cls, col in (("es", SL_NO_EXP_COL), ("en", EXP_NAME_COL), ("ea", EXP_AMT_COL),
+                     ("is", SL_NO_INC_COL), ("in", INC_NAME_COL), ("ia", INC_AMT_COL)):
+        # serial numbers take the name column's style
+        ref = {"es": EXP_NAME_COL, "is": INC_NAME_COL}.get(cls, col)
+        style_idx = tpl_body.cells.get((START_ROW, ref), (None, None))[1]
+        declarations = style_css(tpl_body.styles[style_idx]) if style_idx is not None else ""
+        css.append(f".{cls} {{ {declarations} }}")
+    return "\n".join(css)
+
+
+# ==========================================================
+# Report
+# ==========================================================
+def render_html(income, expense, month_year_kn, header_path=None, template_path=None, footer_path=None,
+                embed_fonts=None):
+    """
+    The report as an HTML document (str). income/expense: lists of
+    (kannada_name, amount); templates as for write_final_pnl_stream.
+    """
+    tpl_header = as_template(header_path or HEADER_FILE)
+    tpl_body = as_template(template_path or TEMPLATE_FILE)
+    tpl_footer = as_template(footer_path or FOOTER_FILE)
+    embed_fonts = EMBED_FONTS if embed_fonts is None else embed_fonts
+
+    n_cols = max(tpl_header.max_col, tpl_footer.max_col, INC_AMT_COL)
+    header_css, header_rows = _template_part(tpl_header, "h")
+    footer_css, footer_rows = _template_part(tpl_footer, "f")
+    month = html.escape(month_year_kn)
+    widths = _column_widths(tpl_header, tpl_body, tpl_footer, n_cols)
+
+    rows = []
+    for i in range(max(len(expense), len(income))):
+        cells = []
+        for side, data in (("e", expense), ("i", income)):
+            if i < len(data):
+                name_kn, amt = data[i]
+                cells.append(f'<td class="{side}s">{i + 1}</td><td class="{side}n">{syllable_breaks(str(name_kn))}'
+                             f'</td><td class="{side}a">{format_amount(amt)}</td>')
+            else:
+                cells.append("<td></td><td></td><td></td>")
+        extra = "<td></td>" * (n_cols - INC_AMT_COL)
+        rows.append(f"<tr>{''.join(cells)}{extra}</tr>")
+    instr.count("rows_rendered", len(rows))
+
+    return f"""<!DOCTYPE html>
+<html lang="kn">
+<head>
+<meta charset="utf-8">
+<title>{month}</title>
+<style>
+{font_face_css(embed_fonts)}
+@page {{ size: {PAGE_SIZE}; margin: {PAGE_MARGIN};
+         @bottom-center {{ content: counter(page) " / " counter(pages); font-size: 9pt; }} }}
+body {{ margin: 0; font-family: "{FONT_FAMILY}", {FALLBACK_FONTS}; font-size: 11pt; }}
+table {{ border-collapse: collapse; table-layout: fixed; margin: 0 auto; }}
+td {{ padding: 1pt 3pt; white-space: pre-wrap; overflow-wrap: break-word; vertical-align: bottom; }}
+thead {{ display: table-header-group; }}
+tr {{ break-inside: avoid; }}
+tbody.footer {{ break-inside: avoid; }}
+.es, .is {{ text-align: right; }}
+.ea, .ia {{ text-align: right; white-space: nowrap; }}
+{header_css}
+{_body_css(tpl_body)}
+{footer_css}
+</style>
+</head>
+<body>
+<table>
+<colgroup>{''.join(f'<col style="width: {w:g}ch">' for w in widths)}</colgroup>
+<thead>
+{header_rows.replace(html.escape(PLACEHOLDER), month)}
+</thead>
+<tbody>
+{chr(10).join(rows)}
+</tbody>
+<tbody class="footer">
+{footer_rows.replace(html.escape(PLACEHOLDER), month)}
+</tbody>
+</table>
+</body>
+</html>
+"""
+
+
+def write_final_pnl_html(income, expense, month_year_kn, output_path,
+                         header_path=None, template_path=None, footer_path=None):
+    """Render the report to output_path as a self-contained HTML file; returns output_path."""
+    document = render_html(income, expense, month_year_kn, header_path, template_path, footer_path)
+    with instr.stage("save"):
+        Path(output_path).write_text(document, encoding="utf-8")
+    instr.count_file("file_bytes_written", output_path)
+    print(f"Final file written to: {output_path}")
+    print(f"   Income Ledgers: {len(income)} | Expense Ledgers: {len(expense)}")
+    return output_path
+
+
+def write_final_pnl_pdf(income, expense, month_year_kn, output_path,
+                        header_path=None, template_path=None, footer_path=None):
+    """Render the report to output_path as a paginated PDF (needs WeasyPrint); returns output_path."""
+    try:
+        from weasyprint import HTML
+    except (ImportError, OSError) as e:
+        raise RuntimeError(f"PDF output needs WeasyPrint and Pango (pip install weasyprint): {e}") from None
+    # fonts by file URL: WeasyPrint embeds the glyphs itself, no need to inline whole files
+    document = render_html(income, expense, month_year_kn, header_path, template_path, footer_path,
+                           embed_fonts=False)
+    with instr.stage("save"):
+        HTML(string=document, base_url=str(base_dir)).write_pdf(str(output_path))
+    instr.count_file("file_bytes_written", output_path)
+    print(f"Final file written to: {output_path}")
+    print(f"   Income Ledgers: {len(income)} | Expense Ledgers: {len(expense)}")
+    return output_path
@@ -0,0 +1,117 @@
+# report_defs.py
+"""
+Report definitions: what the pipeline needs to know about each Tally report
+it renders in Kannada, so parse, translate and render are the same code for
+all of them.
+
+    sections   section header (DSPDISPNAME) -> the side its ledgers go to
+               (None: a header whose own amounts are skipped)
+    amounts    amount tag -> side (None: the current section's side)
+    columns    (left, right): the sides filling the template's left block
+               (sl no / name / amount in A-C) and right block (D-F)
+    templates  header / body / footer xlsx
+
+    Profit & Loss   expenses | incomes        by section (BSSUBAMT)
+    Balance Sheet   liabilities | assets      by primary group (BSSUBAMT)
+    Trial Balance   debit | credit balances   by amount tag (closing Dr / Cr)
+
+Group and sub-group lines parse like ledgers and are dropped at translation,
+because only ledgers are in the mapping. automate.run_batch(reports=[...])
+requests every report of a period concurrently, in one Tally session with one
+ledger sync, and renders them in parallel from the same mapping:
+
+    python automate.py --period 01-04-2025:30-04-2025 --report pnl --report balance-sheet --report trial-balance
+"""
+from pathlib import Path
+
+from tally_pandl_export import TITLES, build_report_request
+from tally_xml_stream import PANDL_AMOUNTS, PANDL_SECTIONS, parse_report_stream
+
+base_dir = Path(__file__).parent.parent
+config_dir = base_dir / "config"
+BODY_TEMPLATE = config_dir / "template_kannada.xlsx"
+# Tally's primary groups: in a Trial Balance they head their ledgers but fill neither side
+PRIMARY_GROUPS = ("Branch / Divisions", "Capital Account", "Current Assets", "Current Liabilities",
+                  "Direct Expenses", "Direct Incomes", "Fixed Assets", "Indirect Expenses", "Indirect Incomes",
+                  "Investments", "Loans (Liability)", "Misc. Expenses (ASSET)", "Purchase Accounts",
+                  "Sales Accounts", "Suspense A/c")
+
+
+class ReportDefinition:
+    """One Tally report: how to request it, parse it and lay it out."""
+
+    def __init__(self, key, tally_name, title, sections, amounts, columns, templates, stem, export_stem,
+                 additive=False):
+        """
+        stem / export_stem: file names final_<stem>_<period>.xlsx and <export_stem>_<period>.xml.
+        additive: amounts are flows over the period, so sub-ranges add up
+        (--chunk) and periods are recorded in the P&L history.
+        """
+        self.key = key
+        self.tally_name = tally_name
+        self.title = title
+        self.sections = sections
+        self.amounts = amounts
+        self.columns = columns
+        self.templates = templates
+        self.stem = stem
+        self.export_stem = export_stem
+        self.additive = additive
+        TITLES.setdefault(tally_name, title)
+
+    def __repr__(self):
+        return f"ReportDefinition({self.key!r})"
+
+    def request(self, from_date, to_date):
+        """Tally export envelope for from_date..to_date (datetime)."""
+        return build_report_request(self.tally_name, f"{from_date:%Y%m%d}", f"{to_date:%Y%m%d}")
+
+    def parse(self, source):
+        """
+        (right, left) lines of an export: the (income, expense) pair the
+        renderers take, whose right block is D-F and left block A-C.
+        """
+        left, right = self.columns
+        return parse_report_stream(source, self.sections, self.amounts, (right, left))
+
+    def final_name(self, label, suffix=".xlsx"):
+        return f"final_{self.stem}_{label}{suffix}"
+
+    def export_name(self, label):
+        return f"{self.export_stem}_{label}.xml"
+
+
+PNL = ReportDefinition(
+    "pnl", "Profit and Loss", "Profit & Loss",
+    sections=PANDL_SECTIONS,
+    amounts=PANDL_AMOUNTS,
+    columns=("expense", "income"),
+    templates={"header": config_dir / "header_template.xlsx", "body": BODY_TEMPLATE,
+               "footer": config_dir / "footer_template.xlsx"},
+    stem="PnL", export_stem="PandL", additive=True,
+)
+
+BALANCE_SHEET = ReportDefinition(
+    "balance-sheet", "Balance Sheet", "Balance Sheet",
+    sections={**dict.fromkeys(("Capital Account", "Reserves & Surplus", "Loans (Liability)", "Current Liabilities",
+                               "Suspense A/c", "Branch / Divisions"), "liabilities"),
+              **dict.fromkeys(("Fixed Assets", "Investments", "Current Assets", "Loans & Advances (Asset)",
+                               "Misc. Expenses (ASSET)"), "assets")},
+    amounts={"BSSUBAMT": None},
+    columns=("liabilities", "assets"),
+    templates={"header": config_dir / "balance_sheet_header.xlsx", "body": BODY_TEMPLATE,
+               "footer": config_dir / "statement_footer.xlsx"},
+    stem="BalanceSheet", export_stem="BalanceSheet",
+)
+
+TRIAL_BALANCE = ReportDefinition(
+    "trial-balance", "Trial Balance", "Trial Balance",
+    sections=dict.fromkeys(PRIMARY_GROUPS),
+    amounts={"DSPCLDRAMTA": "debit", "DSPCLCRAMTA": "credit"},
+    columns=("debit", "credit"),
+    templates={"header": config_dir / "trial_balance_header.xlsx", "body": BODY_TEMPLATE,
+               "footer": config_dir / "statement_footer.xlsx"},
+    stem="TrialBalance", export_stem="TrialBalance",
+)
+
+REPORTS = {report.key: report for report in (PNL, BALANCE_SHEET, TRIAL_BALANCE)}
@@ -0,0 +1,258 @@
+# stream_renderer.py
+"""
+Write-only renderer: streams header, body rows and footer straight into
+final_PnL.xlsx through a sheet writer (excel_writers: openpyxl's write-only
+workbook by default, or XlsxWriter in constant-memory mode).
+
+Produces the same sheet as generate_kannada_pnl + copy_all_parts (values,
+cell styles, column widths, merged ranges), without body_PnL.xlsx,
+header_with_month.xlsx or any in-memory copy of the full report.
+Templates come from template_cache, so their cells, style tables, merges
+and widths are parsed once and reused across runs. Template styles are
+registered with the writer once and applied by handle; body cell styles
+are computed once per column role from the template's reference row and
+every data row just shares the precomputed handles.
+"""
+from pathlib import Path
+
+from openpyxl.styles import Alignment
+
+import instrumentation as instr
+from excel_writers import open_writer
+from template_cache import as_template
+
+base_dir = Path(__file__).parent.parent
+HEADER_FILE = base_dir / "config" / "header_template.xlsx"
+TEMPLATE_FILE = base_dir / "config" / "template_kannada.xlsx"
+FOOTER_FILE = base_dir / "config" / "footer_template.xlsx"
+
+PLACEHOLDER = "$$monthYear$$"
+AMOUNT_FORMAT = u'₹ #,##0.00'
+
+# Body layout, as in automate.generate_kannada_pnl
+START_ROW = 2
+SL_NO_EXP_COL, EXP_NAME_COL, EXP_AMT_COL = 1, 2, 3   # A, B, C
+SL_NO_INC_COL, INC_NAME_COL, INC_AMT_COL = 4, 5, 6   # D, E, F
+BODY_WIDTHS = {SL_NO_EXP_COL: 5, EXP_NAME_COL: 15, EXP_AMT_COL: 7,
+               SL_NO_INC_COL: 5, INC_NAME_COL: 15, INC_AMT_COL: 7}
+NO_STYLE = (None, None, None, None, None, None)
+
+
+def _style_prototype(ref_style, wrap=False, number_format=None):
+    """
+    Style a body cell ends up with in generate_kannada_pnl: the reference
+    cell's style (if any) plus the wrap / number-format overrides, as in
+    automate._alignment_with_wrap. Computed once per column role and then
+    shared by every data row.
+    """
+    font, border, fill, fmt, protection, alignment = ref_style or NO_STYLE
+    if wrap:
+        a = alignment
+        alignment = Alignment(horizontal=a.horizontal, vertical=a.vertical, text_rotation=a.text_rotation,
+                              wrap_text=True, shrink_to_fit=a.shrink_to_fit, indent=a.indent) \
+            if ref_style is not None else Alignment(wrap_text=True)
+    if number_format:
+        fmt = number_format
+    return font, border, fill, fmt, protection, alignment
+
+
+def _ref_style(tpl, row, col):
+    """Style tuple of the template cell at (row, col), or None if it has no style."""
+    style_idx = tpl.cells.get((row, col), (None, None))[1]
+    return tpl.styles[style_idx] if style_idx is not None else None
+
+
+def _overlay(base, top):
+    """Apply row top over row base the way ws.cell(value=...) + style copy would."""
+    if len(top) > len(base):
+        base.extend([None] * (len(top) - len(base)))
+    for i, cell in enumerate(top):
+        if cell is None:
+            continue
+        if base[i] is None:
+            base[i] = cell
+            continue
+        value, style = cell
+        base[i] = (value if value is not None else base[i][0], style if style is not None else base[i][1])
+    return base
+
+
+def _template_rows(tpl, handles, transform=None):
+    """Row producer for a compiled template: 1-based local row -> [None | (value, style handle)]."""
+    def produce(r):
+        row = []
+        for value, style_idx in tpl.row(r):
+            if value is None and style_idx is None:
+                row.append(None)
+                continue
+            if transform and value is not None:
+                value = transform(value)
+            row.append((value, handles[style_idx] if style_idx is not None else None))
+        return row
+    return produce
+
+
+def _body_part(sheet, tpl_body, income, expense, month_year_kn):
+    """
+    The body as build_kannada_body fills it: (rows, columns, row producer)
+    for the template with the expense/income lines from START_ROW.
+    """
+    tmpl_rows, tmpl_cols = tpl_body.max_row, tpl_body.max_col
+    # Extent body_PnL.xlsx has once saved (empty, unstyled cells are not written)
+    n_data = max(len(expense), len(income))
+    body_rows = max(tmpl_rows, START_ROW - 1 + n_data) if n_data else tmpl_rows
+    body_cols = max(tmpl_cols, EXP_AMT_COL if expense else 0, INC_AMT_COL if income else 0)
+
+    # Styles computed once from the body template's reference row
+    ref_exp_name = _ref_style(tpl_body, START_ROW, EXP_NAME_COL)
+    ref_exp_amt = _ref_style(tpl_body, START_ROW, EXP_AMT_COL)
+    ref_inc_name = _ref_style(tpl_body, START_ROW, INC_NAME_COL)
+    ref_inc_amt = _ref_style(tpl_body, START_ROW, INC_AMT_COL)
+    styles = {
+        "exp_sl": sheet.add_style(_style_prototype(ref_exp_name)),
+        "exp_name": sheet.add_style(_style_prototype(ref_exp_name, wrap=True)),
+        "exp_amt": sheet.add_style(_style_prototype(ref_exp_amt, number_format=AMOUNT_FORMAT)),
+        "inc_sl": sheet.add_style(_style_prototype(ref_inc_name)),
+        "inc_name": sheet.add_style(_style_prototype(ref_inc_name, wrap=True)),
+        "inc_amt": sheet.add_style(_style_prototype(ref_inc_amt, number_format=AMOUNT_FORMAT)),
+    }
+
+    def body_value(value):
+        return month_year_kn if str(value).strip() == PLACEHOLDER else value
+
+    template_row = _template_rows(tpl_body, [sheet.add_style(style) for style in tpl_body.styles], body_value)
+
+    def body_row(r):
+        row = [None] * body_cols
+        if r <= tmpl_rows:
+            row[:tmpl_cols] = template_row(r)
+        if r >= START_ROW:
+            i = r - START_ROW + 1
+            # insert_data styles the first serial number before the reference
+            # cell gets its wrap alignment; later ones inherit the name style
+            exp_sl, inc_sl = ("exp_sl", "inc_sl") if i == 1 else ("exp_name", "inc_name")
+            if i <= len(expense):
+                name_kn, amt = expense[i - 1]
+                row[SL_NO_EXP_COL - 1] = (i, styles[exp_sl])
+                row[EXP_NAME_COL - 1] = (name_kn, styles["exp_name"])
+                row[EXP_AMT_COL - 1] = (amt, styles["exp_amt"])
+            if i <= len(income):
+                name_kn, amt = income[i - 1]
+                row[SL_NO_INC_COL - 1] = (i, styles[inc_sl])
+                row[INC_NAME_COL - 1] = (name_kn, styles["inc_name"])
+                row[INC_AMT_COL - 1] = (amt, styles["inc_amt"])
+        return row
+
+    return body_rows, body_cols, body_row
+
+
+def _write_parts(sheet, parts, widths, merges, output_path):
+    """
+    Stream parts [(start_row, n_rows, producer)] into sheet row by row;
+    where parts overlap, later parts win cell by cell. Returns the last row.
+    """
+    # Column widths and merged ranges must be declared before the first row
+    for col_idx, width in widths.items():
+        sheet.set_width(col_idx, width)
+    for min_col, min_row, max_col, max_row, offset in merges:
+        sheet.merge(min_col, min_row + offset, max_col, max_row + offset)
+
+    last_row = max(start + n - 1 for start, n, _ in parts)
+    for r in range(1, last_row + 1):
+        row = []
+        for start, n, produce in parts:
+            if start <= r < start + n:
+                row = _overlay(row, produce(r - start + 1))
+        sheet.append(row)
+
+    with instr.stage("save"):
+        sheet.save()
+    instr.count("rows_written", last_row)
+    if isinstance(output_path, (str, Path)):
+        instr.count_file("file_bytes_written", output_path)
+    return last_row
+
+
+def _template_merges(tpl, row_offset):
+    return [(*bounds, row_offset) for bounds in tpl.merges]
+
+
+def write_final_pnl_stream(income, expense, month_year_kn, output_path,
+                           header_path=None, template_path=None, footer_path=None, writer=None):
+    """
+    Render header + body + footer into output_path in one streaming pass.
+    income/expense: lists of (kannada_name, amount). Templates may be paths,
+    binary file objects or CompiledTemplates; they default to the files in config/.
+    writer: excel_writers backend name ("openpyxl" by default, or "xlsxwriter").
+    """
+    tpl_header = as_template(header_path or HEADER_FILE)
+    tpl_body = as_template(template_path or TEMPLATE_FILE)
+    tpl_footer = as_template(footer_path or FOOTER_FILE)
+    sheet = open_writer(writer, output_path)
+
+    def fill_month(value):
+        if value and PLACEHOLDER in str(value):
+            return str(value).replace(PLACEHOLDER, month_year_kn)
+        return value
+
+    body_rows, body_cols, body_row = _body_part(sheet, tpl_body, income, expense, month_year_kn)
+
+    # Later parts' widths win, as in copy_sheet_to
+    body_widths = dict(tpl_body.widths)
+    body_widths.update(BODY_WIDTHS)
+    widths = dict(tpl_header.widths)
+    widths.update({c: w for c, w in body_widths.items() if c <= body_cols})
+    widths.update(tpl_footer.widths)
+
+    # Parts overlap where copy_sheet_to's cursor advance is shorter than the
+    # part (see CompiledTemplate.advance); the stream renderer places them identically.
+    body_advance = tpl_body.merges[-1][3] if tpl_body.merges else body_rows
+
+    header_start = 1
+    body_start = header_start + tpl_header.advance
+    footer_start = body_start + body_advance
+    parts = [
+        (header_start, tpl_header.max_row,
+         _template_rows(tpl_header, [sheet.add_style(style) for style in tpl_header.styles], fill_month)),
+        (body_start, body_rows, body_row),
+        (footer_start, tpl_footer.max_row,
+         _template_rows(tpl_footer, [sheet.add_style(style) for style in tpl_footer.styles])),
+    ]
+    merges = (_template_merges(tpl_header, header_start - 1) + _template_merges(tpl_body, body_start - 1)
+              + _template_merges(tpl_footer, footer_start - 1))
+    _write_parts(sheet, parts, widths, merges, output_path)
+    print(f"Final file written to: {output_path}")
+    print(f"   Income Ledgers: {len(income)} | Expense Ledgers: {len(expense)}")
+    return output_path
+
+
+def write_body_stream(income, expense, month_year_kn, output_path, template_path=None, writer=None):
+    """
+    The body sheet alone, as generate_kannada_pnl saves it (body_PnL.xlsx),
+    streamed through the given writer instead of an openpyxl Workbook.
+    """
+    tpl_body = as_template(template_path or TEMPLATE_FILE)
+    sheet = open_writer(writer, output_path)
+    body_rows, _, body_row = _body_part(sheet, tpl_body, income, expense, month_year_kn)
+    widths = dict(tpl_body.widths)
+    widths.update(BODY_WIDTHS)
+    _write_parts(sheet, [(1, body_rows, body_row)], widths, _template_merges(tpl_body, 0), output_path)
+    return output_path
+
+
+def write_templates(parts, output_path, writer=None):
+    """
+    Stack compiled templates [(template, transform or None)] into one sheet
+    exactly as copy_all_parts does: each part starts where the previous
+    part's copy_sheet_to advance ends, and later parts' widths win.
+    """
+    sheet = open_writer(writer, output_path)
+    producers, widths, merges = [], {}, []
+    start = 1
+    for tpl, transform in parts:
+        producers.append((start, tpl.max_row,
+                          _template_rows(tpl, [sheet.add_style(style) for style in tpl.styles], transform)))
+        widths.update(tpl.widths)
+        merges += _template_merges(tpl, start - 1)
+        start += tpl.advance
+    return _write_parts(sheet, producers, widths, merges, output_path)
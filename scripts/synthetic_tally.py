@@ -0,0 +1,266 @@
+# synthetic_tally.py
+"""
+Synthetic Tally Profit & Loss exports for benchmarks, shaped like exports/PandL.xml.
+
+write_synthetic_pandl() writes a flat export quickly. For the benchmark suite,
+generate_pandl() builds a realistic one (nested sub-groups, Direct/Indirect
+sections, summary lines, zero and negative amounts, Unicode names and XML
+special characters) that write_pandl() serialises and expected_ledgers()
+turns into exactly what the parsers should return. write_mapping_xlsx() and
+write_template_xlsx() produce mapping files and templates of any size.
+"""
+import random
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from openpyxl import Workbook
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+SECTIONS = ("Direct Incomes", "Direct Expenses", "Indirect Incomes", "Indirect Expenses")
+
+
+def _ledger_block(name, amount, amt_text=None):
+    if amt_text is None:
+        amt_text = f"{amount:.2f}" if amount else ""
+    return (
+        " <BSNAME>\n"
+        "  <DSPACCNAME>\n"
+        f"   <DSPDISPNAME>{name}</DSPDISPNAME>\n"
+        "</DSPACCNAME>\n"
+        "</BSNAME>\n"
+        " <BSAMT>\n"
+        f"  <BSSUBAMT>{amt_text}</BSSUBAMT>\n"
+        "  <BSMAINAMT></BSMAINAMT>\n"
+        "</BSAMT>\n"
+    )
+
+
+def _section_block(name):
+    return (
+        " <DSPACCNAME>\n"
+        f"  <DSPDISPNAME>{name}</DSPDISPNAME>\n"
+        "</DSPACCNAME>\n"
+        " <PLAMT>\n"
+        "  <PLSUBAMT></PLSUBAMT>\n"
+        "  <BSMAINAMT></BSMAINAMT>\n"
+        "</PLAMT>\n"
+    )
+
+
+def write_synthetic_pandl(path, n_ledgers, seed=0):
+    """
+    Write a P&L export with n_ledgers ledger lines spread over the four
+    income/expense sections. Roughly a third of the amounts are empty (zero).
+    Returns the path written.
+    """
+    rng = random.Random(seed)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    per_section = max(1, n_ledgers // len(SECTIONS))
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<ENVELOPE>\n")
+        for s_idx, section in enumerate(SECTIONS):
+            f.write(_section_block(section))
+            count = per_section if s_idx < len(SECTIONS) - 1 else n_ledgers - written
+            for i in range(count):
+                amount = 0 if rng.random() < 0.33 else round(rng.uniform(-50000, 50000), 2)
+                f.write(_ledger_block(f"Ledger {s_idx}-{i}", amount))
+            written += count
+        f.write("</ENVELOPE>\n")
+    return path
+
+
+# --------------------------------------------------------------------------
+# Realistic exports for the benchmark suite
+# --------------------------------------------------------------------------
+INCOME_SECTIONS = ("Direct Incomes", "Indirect Incomes")
+# Lines Tally prints between sections; they are not ledgers
+SUMMARY_LINES = {
+    "Direct Expenses": ["Cost of Sales :"],
+    "Indirect Incomes": ["Gross Profit b/f"],
+    "Indirect Expenses": ["Nett Profit"],
+}
+NAME_WORDS = {
+    "en": ["Rent", "Salary", "Electricity", "Interest", "Commission", "Freight", "Printing",
+           "Repairs", "Donation", "Pooja", "Seva", "Library", "Water", "Hall", "Vessels", "Bank"],
+    "kn": ["ಬಾಡಿಗೆ", "ಸಂಬಳ", "ವಿದ್ಯುತ್", "ಬಡ್ಡಿ", "ದೇಣಿಗೆ", "ಪೂಜೆ", "ಸೇವೆ", "ಗ್ರಂಥಾಲಯ"],
+    "hi": ["किराया", "वेतन", "बिजली", "ब्याज", "दान"],
+}
+NAME_SUFFIXES = ["", "", " A/c", " (Rental Income)", " & Co.", " - Branch", " Exp.", " O'Seas", " / GST"]
+
+
+def _random_name(rng, unicode_ratio, serial):
+    script = "en"
+    if rng.random() < unicode_ratio:
+        script = rng.choice(["kn", "hi"])
+    words = " ".join(rng.choice(NAME_WORDS[script]) for _ in range(rng.randint(1, 3)))
+    return f"{words}{rng.choice(NAME_SUFFIXES)} {serial}"
+
+
+def _random_amount(rng, zero_ratio, negative_ratio):
+    r = rng.random()
+    if r < zero_ratio:
+        return 0.0
+    amount = round(rng.uniform(1, 250000), 2)
+    return -amount if rng.random() < negative_ratio else amount
+
+
+def generate_pandl(n_ledgers, seed=0, group_depth=2, group_ratio=0.08, zero_ratio=0.3,
+                   negative_ratio=0.1, unicode_ratio=0.25):
+    """
+    Build a P&L tree: [(section, items)], items being ("ledger", name, amount)
+    or ("group", name, items). n_ledgers ledgers are spread over the four
+    sections; about group_ratio of items open a sub-group (nested up to
+    group_depth levels). Same seed, same tree.
+    """
+    rng = random.Random(seed)
+    serial = iter(range(1, 10 ** 9))
+    per_section = max(1, n_ledgers // len(SECTIONS))
+    tree = []
+    remaining = n_ledgers
+    for s_idx, section in enumerate(SECTIONS):
+        budget = per_section if s_idx < len(SECTIONS) - 1 else remaining
+        remaining -= budget
+
+        def fill(budget, depth):
+            items = []
+            while budget > 0:
+                if depth < group_depth and budget > 2 and rng.random() < group_ratio:
+                    size = rng.randint(2, min(budget, 40))
+                    items.append(("group", f"{_random_name(rng, unicode_ratio, next(serial))} Group",
+                                  fill(size, depth + 1)))
+                    budget -= size
+                else:
+                    items.append(("ledger", _random_name(rng, unicode_ratio, next(serial)),
+                                  _random_amount(rng, zero_ratio, negative_ratio)))
+                    budget -= 1
+            return items
+
+        tree.append((section, fill(budget, 0)))
+    return tree
+
+
+def _iter_ledgers(items):
+    for item in items:
+        if item[0] == "group":
+            yield from _iter_ledgers(item[2])
+        else:
+            yield item[1], item[2]
+
+
+def _group_total(items):
+    return sum(amount for _, amount in _iter_ledgers(items))
+
+
+def write_pandl(path, tree, seed=0):
+    """Serialise a generate_pandl() tree as a Tally P&L export (UTF-8). Returns the path."""
+    rng = random.Random(seed)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    def amount_text(amount):
+        if amount:
+            return f"{amount:.2f}"
+        return rng.choice(["", "0.00"])   # Tally prints zero both ways
+
+    def write_items(f, items):
+        for item in items:
+            if item[0] == "group":
+                # Sub-group line: its total sits in BSMAINAMT, its ledgers follow
+                f.write(" <BSNAME>\n  <DSPACCNAME>\n"
+                        f"   <DSPDISPNAME>{escape(item[1])}</DSPDISPNAME>\n"
+                        "</DSPACCNAME>\n</BSNAME>\n"
+                        " <BSAMT>\n  <BSSUBAMT></BSSUBAMT>\n"
+                        f"  <BSMAINAMT>{_group_total(item[2]):.2f}</BSMAINAMT>\n</BSAMT>\n")
+                write_items(f, item[2])
+            else:
+                f.write(_ledger_block(escape(item[1]), item[2], amount_text(item[2])))
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<ENVELOPE>\n")
+        for section, items in tree:
+            for line in SUMMARY_LINES.get(section, []):
+                f.write(_section_block(escape(line)))
+            f.write(_section_block(section))
+            write_items(f, items)
+        f.write("</ENVELOPE>\n")
+    return path
+
+
+def expected_ledgers(tree):
+    """(income, expense) exactly as parse_tally_xml / parse_tally_xml_stream should return them."""
+    income, expense = [], []
+    for section, items in tree:
+        target = income if section in INCOME_SECTIONS else expense
+        for name, amount in _iter_ledgers(items):
+            if amount != 0:
+                target.append((name.strip(), abs(amount)))
+    return income, expense
+
+
+def ledger_names(tree):
+    return [name for _, items in tree for name, _ in _iter_ledgers(items)]
+
+
+def write_mapping_xlsx(path, names, size=None, coverage=0.9, seed=0):
+    """
+    ledger_mapping.xlsx covering a coverage fraction of names (the rest stay
+    unmapped), padded with unused rows up to size rows. Returns the path.
+    """
+    rng = random.Random(seed)
+    mapped = [n for n in names if rng.random() < coverage]
+    size = max(size or len(names), len(mapped))
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["EnglishLedger", "KannadaLedger"])
+    for name in mapped:
+        ws.append([name, f"ಕನ್ನಡ {name}"])
+    for i in range(size - len(mapped)):
+        ws.append([f"Unused Ledger {i}", f"ಬಳಕೆಯಾಗದ ಲೆಡ್ಜರ್ {i}"])
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    wb.save(path)
+    return path
+
+
+def write_template_xlsx(path, rows, cols=6, placeholder=True, seed=0):
+    """
+    Header/footer-style template: rows x cols styled cells (fonts, borders,
+    fills, alignment) and column widths. A header (placeholder set) carries
+    $$monthYear$$ in row 1 and a single merged block over its last two rows:
+    the merge pipeline advances by the bottom of the last merged range, and
+    openpyxl does not keep merge order, so the real header is laid out that
+    way too. A footer gets a merged title row and merged blocks every few rows.
+    """
+    rng = random.Random(seed)
+    wb = Workbook()
+    ws = wb.active
+    thin = Side(style="thin")
+    fonts = [Font(name="Nirmala UI", size=s, bold=b) for s in (10, 11, 12, 14) for b in (False, True)]
+    fills = [PatternFill(fill_type="solid", fgColor=c) for c in ("FFF2CC", "DDEBF7", "E2EFDA")]
+    for r in range(1, rows + 1):
+        for c in range(1, cols + 1):
+            cell = ws.cell(r, c, value=f"ಶೀರ್ಷಿಕೆ {r}-{c}" if rng.random() < 0.5 else None)
+            cell.font = rng.choice(fonts)
+            cell.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+            cell.alignment = Alignment(horizontal=rng.choice(["left", "center"]), vertical="center",
+                                       wrap_text=True)
+            if rng.random() < 0.3:
+                cell.fill = rng.choice(fills)
+    half = max(1, cols // 2)
+    if placeholder:
+        ws.cell(1, 1, value="ಲಾಭ ನಷ್ಟ ಪಟ್ಟಿ $$monthYear$$")
+        ws.merge_cells(start_row=max(1, rows - 1), start_column=1, end_row=rows, end_column=half)
+    else:
+        ws.cell(1, 1, value="ಲಾಭ ನಷ್ಟ ಪಟ್ಟಿ")
+        ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=cols)
+        for r in range(3, rows, 4):
+            ws.merge_cells(start_row=r, start_column=1, end_row=r + 1, end_column=half)
+    for c in range(1, cols + 1):
+        ws.column_dimensions[get_column_letter(c)].width = rng.choice([5, 7, 15, 20])
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    wb.save(path)
+    return path
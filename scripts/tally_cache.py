@@ -0,0 +1,353 @@
+# tally_cache.py
+"""
+On-disk cache of Tally report responses.
+
+Entries are keyed by Tally URL, company, report name and SVFROMDATE/SVTODATE,
+and hold gzip blobs named after the sha256 of the response, so identical
+responses share one file. output/.tally_cache/index.db tracks entries and
+when each was last used; the least recently used ones are evicted beyond
+MAX_BYTES (compressed) or MAX_ENTRIES.
+
+An entry is valid while the company's last-alteration markers
+(AltVchId / AltMstId, fetched with one tiny request) are unchanged, i.e. no
+voucher or master was created, altered or deleted since it was stored:
+
+    status = company_status()
+    with open_response_cache() as cache:
+        content = cache.get(status, "Profit and Loss", "20250401", "20250430")
+        if content is None:
+            content = tally_client.post_xml(xml_request).content
+            cache.put(status, "Profit and Loss", "20250401", "20250430", content)
+
+Offline runs pass validate=False and get the newest entry for the range
+without asking Tally, from the company Tally last reported at that URL (kept
+in the meta table), so switching companies in Tally never serves one
+company's export as another's. When Tally gives no markers (status None), validated
+lookups always miss. put_file / get_file do the same for a response kept on
+disk, so a large export never has to fit in memory.
+"""
+import gzip
+import hashlib
+import os
+import shutil
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from pathlib import Path
+
+import tally_client
+
+base_dir = Path(__file__).parent.parent
+CACHE_DIR = base_dir / "output" / ".tally_cache"
+MAX_BYTES = 256 * 1024 * 1024   # compressed blobs kept on disk
+MAX_ENTRIES = 500
+COMPRESS_LEVEL = 6
+CHUNK_SIZE = 1024 * 1024   # put_file / get_file stream blobs in pieces this size
+ENABLED = True
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key          TEXT PRIMARY KEY,   -- sha256 of url, company, report, from, to
+    tally_url    TEXT NOT NULL,
+    company      TEXT,
+    report       TEXT NOT NULL,
+    from_date    TEXT NOT NULL,
+    to_date      TEXT NOT NULL,
+    marker       TEXT,               -- AltVchId:AltMstId when stored, NULL if unknown
+    blob         TEXT NOT NULL,      -- sha256 of the response = blob file name
+    raw_bytes    INTEGER NOT NULL,
+    stored_bytes INTEGER NOT NULL,
+    stored_at    TEXT NOT NULL,
+    last_used    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_range ON responses (tally_url, report, from_date, to_date);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,              -- "company:<tally url>"
+    value TEXT
+);
+"""
+
+STATUS_REQUEST_XML = """<ENVELOPE>
+    <HEADER>
+        <VERSION>1</VERSION>
+        <TALLYREQUEST>EXPORT</TALLYREQUEST>
+        <TYPE>DATA</TYPE>
+        <ID>VegaCompanyStatus</ID>
+    </HEADER>
+    <BODY>
+        <DESC>
+            <STATICVARIABLES>
+                <SVEXPORTFORMAT>$$SysName:XML</SVEXPORTFORMAT>
+            </STATICVARIABLES>
+            <TDL>
+                <TDLMESSAGE>
+                    <REPORT NAME="VegaCompanyStatus">
+                        <FORMS>VegaCompanyStatusForm</FORMS>
+                    </REPORT>
+                    <FORM NAME="VegaCompanyStatusForm">
+                        <TOPPARTS>VegaCompanyStatusPart</TOPPARTS>
+                        <XMLTAG>"COMPANYSTATUS"</XMLTAG>
+                    </FORM>
+                    <PART NAME="VegaCompanyStatusPart">
+                        <LINES>VegaCompanyStatusLine</LINES>
+                        <REPEAT>VegaCompanyStatusLine : VegaCurrentCompany</REPEAT>
+                        <SCROLLED>Vertical</SCROLLED>
+                    </PART>
+                    <LINE NAME="VegaCompanyStatusLine">
+                        <FIELDS>VegaCompanyName, VegaAltVchId, VegaAltMstId</FIELDS>
+                        <XMLTAG>"COMPANY"</XMLTAG>
+                    </LINE>
+                    <FIELD NAME="VegaCompanyName">
+                        <SET>$Name</SET>
+                        <XMLTAG>"NAME"</XMLTAG>
+                    </FIELD>
+                    <FIELD NAME="VegaAltVchId">
+                        <SET>$AltVchId</SET>
+                        <XMLTAG>"ALTVCHID"</XMLTAG>
+                    </FIELD>
+                    <FIELD NAME="VegaAltMstId">
+                        <SET>$AltMstId</SET>
+                        <XMLTAG>"ALTMSTID"</XMLTAG>
+                    </FIELD>
+                    <COLLECTION NAME="VegaCurrentCompany">
+                        <TYPE>Company</TYPE>
+                        <FETCH>AltVchId, AltMstId</FETCH>
+                        <FILTERS>VegaIsCurrentCompany</FILTERS>
+                    </COLLECTION>
+                    <SYSTEM TYPE="Formulae" NAME="VegaIsCurrentCompany">$Name = ##SVCurrentCompany</SYSTEM>
+                </TDLMESSAGE>
+            </TDL>
+        </DESC>
+    </BODY>
+</ENVELOPE>"""
+
+
+def configure(cache_dir=None, max_bytes=None, max_entries=None, enabled=None):
+    """Override the cache location, its limits, or switch it off."""
+    global CACHE_DIR, MAX_BYTES, MAX_ENTRIES, ENABLED
+    if cache_dir is not None:
+        CACHE_DIR = Path(cache_dir)
+    if max_bytes is not None:
+        MAX_BYTES = max_bytes
+    if max_entries is not None:
+        MAX_ENTRIES = max_entries
+    if enabled is not None:
+        ENABLED = enabled
+
+
+def parse_status(content):
+    """{"company", "marker"} from a VegaCompanyStatus response, or None if it carries no markers."""
+    try:
+        company = ET.fromstring(content).find("COMPANY")
+    except ET.ParseError:
+        return None
+    if company is None:
+        return None
+    alt_vch = (company.findtext("ALTVCHID") or "").strip()
+    alt_mst = (company.findtext("ALTMSTID") or "").strip()
+    if not (alt_vch.isdigit() and alt_mst.isdigit()):
+        return None
+    return {"company": (company.findtext("NAME") or "").strip(), "marker": f"{alt_vch}:{alt_mst}"}
+
+
+def company_status():
+    """Current company's name and last-alteration marker, or None if Tally doesn't say."""
+    try:
+        return parse_status(tally_client.post_xml(STATUS_REQUEST_XML).content)
+    except Exception:
+        return None
+
+
+class ResponseCache:
+    def __init__(self, cache_dir=None, max_bytes=None, max_entries=None):
+        self.cache_dir = Path(cache_dir or CACHE_DIR)
+        self.blob_dir = self.cache_dir / "blobs"
+        self.max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+        self.max_entries = MAX_ENTRIES if max_entries is None else max_entries
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        # several batch workers / company processes may share the cache
+        self.conn = sqlite3.connect(self.cache_dir / "index.db", timeout=30, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self._seen_company = None
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def key(tally_url, company, report, from_date, to_date):
+        return hashlib.sha256("\x1f".join([tally_url, company or "", report, from_date, to_date])
+                              .encode("utf-8")).hexdigest()
+
+    def _blob_path(self, digest):
+        return self.blob_dir / f"{digest}.xml.gz"
+
+    def _remember_company(self, status):
+        """Record the company Tally reported at this URL, for offline lookups."""
+        url = tally_client.TALLY_URL
+        if status is None or self._seen_company == (url, status["company"]):
+            return
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                              (f"company:{url}", status["company"]))
+        self._seen_company = (url, status["company"])
+
+    def last_company(self):
+        """The company Tally last reported at the current URL, or None if never seen."""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?",
+                                (f"company:{tally_client.TALLY_URL}",)).fetchone()
+        return row[0] if row else None
+
+    def _lookup(self, status, report, from_date, to_date, validate):
+        """(key, blob) of the entry get() would serve, or None."""
+        url = tally_client.TALLY_URL
+        if validate and status is None:
+            return None
+        if not validate:
+            query = ("SELECT key, blob FROM responses WHERE tally_url = ? AND report = ? AND from_date = ? "
+                     "AND to_date = ?")
+            params = (url, report, from_date, to_date)
+            company = self.last_company()
+            if company is not None:
+                query += " AND company = ?"
+                params += (company,)
+            return self.conn.execute(query + " ORDER BY stored_at DESC LIMIT 1", params).fetchone()
+        self._remember_company(status)
+        return self.conn.execute(
+            "SELECT key, blob FROM responses WHERE key = ? AND marker = ?",
+            (self.key(url, status["company"], report, from_date, to_date), status["marker"])).fetchone()
+
+    def _used(self, key):
+        with self.conn:
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.hits += 1
+
+    def get(self, status, report, from_date, to_date, validate=True):
+        """
+        Cached response body (bytes) for report over from_date..to_date (YYYYMMDD),
+        or None. The entry must carry status["marker"] (status from
+        company_status()); validate=False takes the newest entry for the range
+        from the company last seen at this Tally URL.
+        """
+        row = self._lookup(status, report, from_date, to_date, validate)
+        content = None
+        if row is not None:
+            try:
+                content = gzip.decompress(self._blob_path(row[1]).read_bytes())
+            except (OSError, EOFError):
+                content = None   # evicted by another process or damaged: refetch
+        if content is None:
+            self.misses += 1
+            return None
+        self._used(row[0])
+        return content
+
+    def get_file(self, status, report, from_date, to_date, dest, validate=True):
+        """
+        Like get(), but the response is decompressed chunk by chunk into dest
+        instead of memory. Returns the bytes written, or None on a miss.
+        """
+        row = self._lookup(status, report, from_date, to_date, validate)
+        written = None
+        if row is not None:
+            dest = Path(dest)
+            tmp = dest.with_name(f".{dest.name}.{os.getpid()}.part")
+            try:
+                with gzip.open(self._blob_path(row[1]), "rb") as src, open(tmp, "wb") as out:
+                    shutil.copyfileobj(src, out, CHUNK_SIZE)
+                    written = out.tell()
+                os.replace(tmp, dest)
+            except (OSError, EOFError):
+                tmp.unlink(missing_ok=True)
+                written = None
+        if written is None:
+            self.misses += 1
+            return None
+        self._used(row[0])
+        return written
+
+    def put(self, status, report, from_date, to_date, content):
+        """Store a response; entries without a status marker are never served to validated lookups."""
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._blob_path(digest)
+        if not path.exists():
+            tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(gzip.compress(content, COMPRESS_LEVEL))
+            os.replace(tmp, path)
+        self._store(status, report, from_date, to_date, digest, len(content))
+
+    def put_file(self, status, report, from_date, to_date, source):
+        """put() for a response already on disk at source, hashed and compressed in chunks."""
+        digest = hashlib.sha256()
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+            raw_bytes = f.tell()
+        digest = digest.hexdigest()
+        path = self._blob_path(digest)
+        if not path.exists():
+            tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            with open(source, "rb") as src, gzip.open(tmp, "wb", COMPRESS_LEVEL) as out:
+                shutil.copyfileobj(src, out, CHUNK_SIZE)
+            os.replace(tmp, path)
+        self._store(status, report, from_date, to_date, digest, raw_bytes)
+
+    def _store(self, status, report, from_date, to_date, digest, raw_bytes):
+        url = tally_client.TALLY_URL
+        company = status["company"] if status else None
+        self._remember_company(status)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, tally_url, company, report, from_date, to_date, marker, "
+                "blob, raw_bytes, stored_bytes, stored_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.key(url, company, report, from_date, to_date), url, company, report, from_date, to_date,
+                 status["marker"] if status else None, digest, raw_bytes, self._blob_path(digest).stat().st_size,
+                 datetime.now().isoformat(timespec="seconds"), time.time()))
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used entries beyond the limits, and blobs no entry uses any more."""
+        rows = self.conn.execute(
+            "SELECT key, blob, stored_bytes FROM responses ORDER BY last_used DESC").fetchall()
+        kept_blobs, total, drop = set(), 0, []
+        for i, (key, blob, size) in enumerate(rows):
+            if blob not in kept_blobs:
+                total += size
+            if i >= self.max_entries or total > self.max_bytes:
+                drop.append((key, blob))
+            else:
+                kept_blobs.add(blob)
+        if not drop:
+            return 0
+        with self.conn:
+            self.conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key, _ in drop])
+            for blob in {blob for _, blob in drop}:
+                if not self.conn.execute("SELECT 1 FROM responses WHERE blob = ?", (blob,)).fetchone():
+                    self._blob_path(blob).unlink(missing_ok=True)
+        return len(drop)
+
+    def clear(self):
+        self.conn.execute("UPDATE responses SET last_used = 0")
+        self.max_entries, limit = 0, self.max_entries
+        try:
+            self.evict()
+        finally:
+            self.max_entries = limit
+
+    def size(self):
+        """(entries, compressed bytes on disk)."""
+        entries = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return entries, sum(p.stat().st_size for p in self.blob_dir.glob("*.xml.gz"))
+
+
+def open_response_cache(cache_dir=None):
+    """The response cache, or None when caching is switched off."""
+    return ResponseCache(cache_dir) if ENABLED else None
@@ -0,0 +1,149 @@
+# tally_client.py
+"""
+Shared HTTP layer for talking to Tally's XML server.
+
+One keep-alive requests.Session (connection pool, retries, timeouts) is reused
+by every request in the process, and fetch_many() issues several requests
+concurrently so that parsing/rendering can start on whichever finishes first.
+post_xml_to_file() streams a large response to disk instead of memory.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import instrumentation as instr
+
+TALLY_URL = "http://localhost:9000"
+CONNECT_TIMEOUT = 5      # seconds to open the connection
+READ_TIMEOUT = 300       # seconds to wait for Tally to compute a report
+RETRIES = 2              # retries on connection errors and 5xx responses
+POOL_SIZE = 8            # keep-alive connections kept open to Tally
+MAX_WORKERS = 4          # concurrent requests in fetch_many
+CHUNK_SIZE = 64 * 1024   # bytes read at a time by post_xml_to_file
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def configure(url=None, connect_timeout=None, read_timeout=None, retries=None, pool_size=None):
+    """Override connection settings; the shared session is rebuilt on next use."""
+    global TALLY_URL, CONNECT_TIMEOUT, READ_TIMEOUT, RETRIES, POOL_SIZE, _session
+    with _session_lock:
+        if url is not None:
+            TALLY_URL = url
+        if connect_timeout is not None:
+            CONNECT_TIMEOUT = connect_timeout
+        if read_timeout is not None:
+            READ_TIMEOUT = read_timeout
+        if retries is not None:
+            RETRIES = retries
+        if pool_size is not None:
+            POOL_SIZE = pool_size
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def get_session():
+    """Return the process-wide keep-alive session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=RETRIES,
+                connect=RETRIES,
+                read=RETRIES,
+                backoff_factor=0.5,
+                status_forcelist=(500, 502, 503, 504),
+                allowed_methods=None,  # Tally exports are POSTs but read-only, safe to retry
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def timeout():
+    return (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+
+def is_reachable():
+    """True if Tally's HTTP server answers a GET."""
+    try:
+        res = get_session().get(TALLY_URL, timeout=CONNECT_TIMEOUT)
+        return res.status_code == 200
+    except Exception:
+        return False
+
+
+def post_xml(xml_request, stream=False):
+    """
+    POST an XML envelope to Tally and return the response (status already checked).
+    With stream=True the body is not read; use response.iter_content() and close it.
+    """
+    data = xml_request.encode("utf-8") if isinstance(xml_request, str) else xml_request
+    res = get_session().post(TALLY_URL, data=data, timeout=timeout(), stream=stream)
+    res.raise_for_status()
+    instr.count("http_requests")
+    instr.count("http_bytes_out", len(data))
+    if not stream:
+        instr.count("http_bytes_in", len(res.content))
+    return res
+
+
+def post_xml_to_file(xml_request, dest, chunk_size=CHUNK_SIZE):
+    """
+    POST like post_xml, streaming the body into dest chunk by chunk. It is
+    written to a .part file first, so dest only ever holds a complete
+    response. Returns dest as a Path.
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.{threading.get_ident()}.part")
+    written = 0
+    try:
+        with post_xml(xml_request, stream=True) as res, open(tmp, "wb") as f:
+            for chunk in res.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                written += len(chunk)
+        os.replace(tmp, dest)
+    finally:
+        tmp.unlink(missing_ok=True)
+    instr.count("http_bytes_in", written)
+    instr.count("file_bytes_written", written)
+    return dest
+
+
+def fetch_many(xml_requests, max_workers=None, dest=None):
+    """
+    Issue several requests concurrently.
+    xml_requests: dict of key -> XML envelope.
+    dest: optional dict of key -> file path; those responses are streamed to
+    the file (post_xml_to_file) and yielded as its Path instead of bytes.
+    Yields (key, content, error) as each request completes; exactly one
+    of content/error is None.
+    """
+    max_workers = max_workers or MAX_WORKERS
+    dest = dest or {}
+
+    def fetch(key, xml):
+        if key in dest:
+            return post_xml_to_file(xml, dest[key])
+        return post_xml(xml).content
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tally-fetch") as pool:
+        futures = {pool.submit(fetch, key, xml): key for key, xml in xml_requests.items()}
+        for fut in as_completed(futures):
+            key = futures[fut]
+            try:
+                yield key, fut.result(), None
+            except Exception as e:
+                yield key, None, e
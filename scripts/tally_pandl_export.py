@@ -1,40 +1,87 @@
 # tally_pandl_export.py
-import requests
+from contextlib import nullcontext
 from datetime import datetime
 from pathlib import Path
 
-TALLY_URL = "http://localhost:9000"
-EXPORT_FILE = Path("../exports/PandL.xml")
+import instrumentation as instr
+import tally_cache
+import tally_client
+
+EXPORT_FILE = Path(__file__).parent.parent / "exports" / "PandL.xml"
+REPORT_NAME = "Profit and Loss"
+TITLES = {REPORT_NAME: "Profit & Loss"}   # how a Tally report is named in messages
 
 def is_tally_running():
     """
     Checks if Tally HTTP XML server is running and reachable.
     Returns True if reachable, False otherwise.
     """
-    try:
-        res = requests.get(TALLY_URL, timeout=5)
-        # Some Tally builds respond with plain text, others with XML
-        return res.status_code == 200
-    except Exception:
-        return False
+    # Some Tally builds respond with plain text, others with XML
+    return tally_client.is_reachable()
+
+
+def build_pandl_request(tally_from, tally_to):
+    """
+    Build the Profit & Loss export envelope for a date range in Tally format (YYYYMMDD).
+    """
+    return build_report_request(REPORT_NAME, tally_from, tally_to)
+
+
+def build_report_request(report_name, tally_from, tally_to):
+    """Export envelope for any Tally report (e.g. "Balance Sheet", "Trial Balance") over a date range (YYYYMMDD)."""
+    return f"""<ENVELOPE>
+      <HEADER>
+        <TALLYREQUEST>Export Data</TALLYREQUEST>
+      </HEADER>
+      <BODY>
+        <EXPORTDATA>
+          <REQUESTDESC>
+            <REPORTNAME>{report_name}</REPORTNAME>
+            <STATICVARIABLES>
+              <SVEXPORTFORMAT>$$SysName:XML</SVEXPORTFORMAT>
+              <EXPLODEFLAG>Yes</EXPLODEFLAG>
+              <SVFROMDATE>{tally_from}</SVFROMDATE>
+              <SVTODATE>{tally_to}</SVTODATE>
+            </STATICVARIABLES>
+          </REQUESTDESC>
+        </EXPORTDATA>
+      </BODY>
+    </ENVELOPE>"""
+
+
+def stream_pandl_from_tally(from_date, to_date, chunk_size=tally_client.CHUNK_SIZE):
+    """
+    Request Profit & Loss for from_date..to_date (datetime) and yield the
+    response body in chunks, without buffering it or writing exports/PandL.xml.
+    Feed the result to tally_xml_stream.parse_tally_xml_stream.
+    """
+    xml_request = build_pandl_request(from_date.strftime("%Y%m%d"), to_date.strftime("%Y%m%d"))
+    with tally_client.post_xml(xml_request, stream=True) as response:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            instr.count("http_bytes_in", len(chunk))
+            yield chunk
 
 
-def export_pandl_from_tally():
+def export_pandl_from_tally(refresh=False, offline=False, chunk=None):
     
     """
     Checks connection to Tally, prompts user for date range (DD-MM-YYYY),
     requests Profit & Loss XML from Tally, and saves it to exports/PandL.xml.
+    With offline=True Tally is not contacted and the cached export is used;
+    chunk="month"/"quarter" exports the range in sub-ranges (chunked_export).
+    Returns (export_file, from_date, to_date), or None.
     """
 
-    print("Checking connection to Tally...")
+    if not offline:
+        print("Checking connection to Tally...")
 
-    if not is_tally_running():
-        print("Unable to connect to Tally.")
-        print("Please ensure Tally is open and HTTP XML Server is enabled (F1 > Advanced Configuration > Enable HTTP Server = Yes).")
-        print("Default port: 9000")
-        return None
+        if not is_tally_running():
+            print("Unable to connect to Tally.")
+            print("Please ensure Tally is open and HTTP XML Server is enabled (F1 > Advanced Configuration > Enable HTTP Server = Yes).")
+            print("Default port: 9000")
+            return None
 
-    print("Tally connection successful!\n")
+        print("Tally connection successful!\n")
 
     """
     Ask user for From/To dates (DD-MM-YYYY),
@@ -55,44 +102,111 @@ def export_pandl_from_tally():
         print("Invalid date format! Use DD-MM-YYYY.")
         return None
 
-    # --- Convert to Tally format (YYYYMMDD) ---
-    tally_from = from_date.strftime("%Y%m%d")
-    tally_to = to_date.strftime("%Y%m%d")
+    # --- Export (timed as "export"; the prompts above are not) ---
+    with instr.stage("export"):
+        if chunk:
+            from chunked_export import fetch_pandl_chunked  # chunked_export builds on this module
+            result = fetch_pandl_chunked(from_date, to_date, chunk, refresh=refresh, offline=offline)
+        else:
+            result = fetch_pandl_xml(from_date, to_date, refresh=refresh, offline=offline)
+    return None if result is None else (result[0], from_date, to_date)
 
-    # --- Build XML request ---
-    xml_request = f"""<ENVELOPE>
-      <HEADER>
-        <TALLYREQUEST>Export Data</TALLYREQUEST>
-      </HEADER>
-      <BODY>
-        <EXPORTDATA>
-          <REQUESTDESC>
-            <REPORTNAME>Profit and Loss</REPORTNAME>
-            <STATICVARIABLES>
-              <SVEXPORTFORMAT>$$SysName:XML</SVEXPORTFORMAT>
-              <EXPLODEFLAG>Yes</EXPLODEFLAG>
-              <SVFROMDATE>{tally_from}</SVFROMDATE>
-              <SVTODATE>{tally_to}</SVTODATE>
-            </STATICVARIABLES>
-          </REQUESTDESC>
-        </EXPORTDATA>
-      </BODY>
-    </ENVELOPE>"""
 
-    # --- Send to Tally ---
-    print(f"Requesting Profit & Loss from {from_date_str} to {to_date_str} ...")
+def cache_status(offline=False):
+    """Company status used to validate cached exports (None when offline or Tally gives none)."""
+    if offline:
+        return None
+    with instr.stage("tally_status"):
+        return tally_cache.company_status()
 
-    try:
-        response = requests.post(TALLY_URL, data=xml_request)
-        response.raise_for_status()
-    except Exception as e:
-        print(f"Failed to connect to Tally: {e}")
+
+def cached_pandl(cache, status, from_date, to_date, offline=False, report_name=REPORT_NAME):
+    """The cached export for from_date..to_date (datetime) if still valid, else None."""
+    if cache is None:
+        return None
+    content = cache.get(status, report_name, f"{from_date:%Y%m%d}", f"{to_date:%Y%m%d}", validate=not offline)
+    if content is not None:
+        instr.count("cache_hits")
+        instr.count("cache_bytes_in", len(content))
+        when = "cached" if offline else "unchanged in Tally, using cached copy"
+        print(f"♻️ {TITLES.get(report_name, report_name)} {from_date:%d-%m-%Y} to {to_date:%d-%m-%Y}: {when}")
+    return content
+
+
+def cache_pandl(cache, status, from_date, to_date, content, report_name=REPORT_NAME):
+    """Store a fresh export: the response bytes, or the Path it was streamed to."""
+    if cache is not None:
+        instr.count("cache_misses")
+        store = cache.put_file if isinstance(content, Path) else cache.put
+        store(status, report_name, f"{from_date:%Y%m%d}", f"{to_date:%Y%m%d}", content)
+
+
+def cached_pandl_file(cache, status, from_date, to_date, export_file, offline=False, report_name=REPORT_NAME):
+    """cached_pandl, decompressed straight into export_file; its path, or None."""
+    if cache is None:
         return None
+    export_file = Path(export_file)
+    export_file.parent.mkdir(parents=True, exist_ok=True)
+    written = cache.get_file(status, report_name, f"{from_date:%Y%m%d}", f"{to_date:%Y%m%d}", export_file,
+                             validate=not offline)
+    if written is None:
+        return None
+    instr.count("cache_hits")
+    instr.count("cache_bytes_in", written)
+    title = TITLES.get(report_name, report_name)
+    when = "cached" if offline else "unchanged in Tally, using cached copy"
+    print(f"♻️ {title} {from_date:%d-%m-%Y} to {to_date:%d-%m-%Y}: {when}")
+    print(f"{title} XML saved → {export_file}")
+    return export_file
 
-    # --- Save XML to file ---
-    EXPORT_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(EXPORT_FILE, "wb") as f:
-        f.write(response.content)
 
-    print(f"Profit & Loss XML saved → {EXPORT_FILE}")
-    return (EXPORT_FILE, to_date)
+def fetch_pandl_xml(from_date, to_date, export_file=EXPORT_FILE, refresh=False, offline=False):
+    """
+    Non-interactive export: request Profit & Loss for from_date..to_date (datetime)
+    and stream it to export_file. Returns (export_file, to_date), or None on failure.
+    A cached response is reused while Tally reports no alterations since it was
+    stored; refresh=True always re-exports, offline=True never contacts Tally.
+    """
+    with tally_cache.open_response_cache() or nullcontext() as cache:
+        status = cache_status(offline) if cache is not None else None
+        if not refresh:
+            cached = cached_pandl_file(cache, status, from_date, to_date, export_file, offline)
+            if cached is not None:
+                return (cached, to_date)
+        if offline:
+            print(f"❌ No cached Profit & Loss for {from_date:%d-%m-%Y} to {to_date:%d-%m-%Y}; "
+                  "run once without --offline.")
+            return None
+
+        # --- Convert to Tally format (YYYYMMDD) ---
+        tally_from = from_date.strftime("%Y%m%d")
+        tally_to = to_date.strftime("%Y%m%d")
+
+        # --- Build XML request ---
+        xml_request = build_pandl_request(tally_from, tally_to)
+
+        # --- Send to Tally ---
+        print(f"Requesting Profit & Loss from {from_date:%d-%m-%Y} to {to_date:%d-%m-%Y} ...")
+
+        try:
+            with instr.stage("tally_pandl"):
+                export_file = tally_client.post_xml_to_file(xml_request, export_file)
+        except Exception as e:
+            print(f"Failed to connect to Tally: {e}")
+            return None
+        print(f"Profit & Loss XML saved → {export_file}")
+
+        cache_pandl(cache, status, from_date, to_date, export_file)
+        return (export_file, to_date)
+
+
+def save_export(content, export_file=EXPORT_FILE, report_name=REPORT_NAME):
+    """Write a P&L (or report_name) response body to export_file and return its path."""
+    export_file = Path(export_file)
+    export_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(export_file, "wb") as f:
+        f.write(content)
+    instr.count("file_bytes_written", len(content))
+
+    print(f"{TITLES.get(report_name, report_name)} XML saved → {export_file}")
+    return export_file
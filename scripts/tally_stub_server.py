@@ -0,0 +1,285 @@
+# tally_stub_server.py
+"""
+Local stand-in for Tally's HTTP XML server, for offline runs and benchmarks.
+
+Serves a canned Profit & Loss export for "Profit and Loss" requests and a
+ledger list (built from the same export, with AlterIDs, honouring the
+"$AlterID > N" filter) for SimpleLedgerList requests and the company's
+last-alteration markers for VegaCompanyStatus requests, after an optional
+artificial latency.
+
+With periodic=True (--periodic) the P&L is computed for the requested
+SVFROMDATE..SVTODATE instead: every ledger of the canned export gets a
+deterministic signed amount per day, so a range's totals are exactly the sum
+of its sub-ranges' and long ranges can cost more (--day-latency). As in
+Tally, a ledger with nothing booked in the range is left out of it.
+
+"Balance Sheet" and "Trial Balance" requests are always computed that way
+for the requested range, from the same ledgers: the Trial Balance lists them
+under their P&L groups with closing debit / credit amounts, the Balance Sheet
+spreads them over a few capital, liability and asset groups (it doesn't
+balance; it only has the shape of a real export).
+
+    python tally_stub_server.py --port 9000 --latency 0.5
+    python tally_stub_server.py --pandl ../exports/PandL.xml
+    python tally_stub_server.py --periodic --day-latency 0.01
+"""
+import argparse
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+DEFAULT_PANDL = Path(__file__).parent.parent / "exports" / "PandL.xml"
+SECTION_NAMES = {"Direct Incomes", "Indirect Incomes", "Direct Expenses", "Indirect Expenses"}
+ALTERED_SINCE = re.compile(rb"\$AlterID\s*(?:>|&gt;)\s*(\d+)")
+DATE_RANGE = re.compile(rb"<SVFROMDATE>(\d{8})</SVFROMDATE>\s*<SVTODATE>(\d{8})</SVTODATE>")
+DEFAULT_RANGE = (b"20250401", b"20260331")
+REPORT = re.compile(rb"<REPORTNAME>([^<]*)</REPORTNAME>")
+INCOME_NAMES = {"Direct Incomes", "Indirect Incomes"}
+BALANCE_SHEET_GROUPS = ("Capital Account", "Current Liabilities", "Fixed Assets", "Current Assets")
+
+
+def ledgers_from_pandl(pandl_bytes):
+    """Every ledger named in a P&L export, in order, without duplicates."""
+    names = re.findall(rb"<DSPDISPNAME>([^<]*)</DSPDISPNAME>", pandl_bytes)
+    seen = []
+    for raw in names:
+        name = raw.decode("utf-8").strip()
+        if name and name not in SECTION_NAMES and not name.endswith(":") and name not in seen:
+            seen.append(name)
+    return seen
+
+
+def pandl_layout(pandl_bytes):
+    """[(section, [ledger, ...])] in export order: the ledgers listed under each P&L section."""
+    layout = []
+    for raw in re.findall(rb"<DSPDISPNAME>([^<]*)</DSPDISPNAME>", pandl_bytes):
+        name = raw.decode("utf-8").strip()
+        if name in SECTION_NAMES:
+            layout.append((name, []))
+        elif layout and name and not name.endswith(":"):
+            layout[-1][1].append(name)
+    return layout
+
+
+def daily_paise(ledger_idx, day):
+    """Deterministic amount (paise) booked to ledger ledger_idx on date ordinal day; mostly zero."""
+    h = (ledger_idx * 2654435761 + day * 40503 + 12345) & 0xFFFFFFFF
+    h = (h ^ (h >> 15)) * 2246822519 & 0xFFFFFFFF
+    if h % 23:
+        return 0
+    return (h >> 8) % 2_000_000 - 700_000   # -7,000.00 .. +13,000.00
+
+
+def range_totals(layout, from_text, to_text):
+    """[(section, [(ledger, paise), ...])] for the range (YYYYMMDD bytes): each ledger's daily_paise summed."""
+    first = datetime.strptime(from_text.decode(), "%Y%m%d").toordinal()
+    last = datetime.strptime(to_text.decode(), "%Y%m%d").toordinal()
+    days = range(first, last + 1)
+    totals, idx = [], 0
+    for section, names in layout:
+        rows = []
+        for name in names:
+            idx += 1
+            rows.append((name, sum(daily_paise(idx, d) for d in days)))
+        totals.append((section, rows))
+    return totals
+
+
+def _bs_line(name, sub_paise=0, main_paise=0):
+    return (f" <BSNAME>\n  <DSPACCNAME>\n   <DSPDISPNAME>{escape(name)}</DSPDISPNAME>\n</DSPACCNAME>\n</BSNAME>\n"
+            f" <BSAMT>\n  <BSSUBAMT>{f'{sub_paise / 100:.2f}' if sub_paise else ''}</BSSUBAMT>\n"
+            f"  <BSMAINAMT>{f'{main_paise / 100:.2f}' if main_paise else ''}</BSMAINAMT>\n</BSAMT>\n")
+
+
+def periodic_pandl_xml(layout, from_text, to_text):
+    """P&L export for the range (YYYYMMDD bytes) built from daily_paise; ledgers totalling zero are left out."""
+    parts = ["<ENVELOPE>\n"]
+    for section, rows in range_totals(layout, from_text, to_text):
+        parts.append(f" <DSPACCNAME>\n  <DSPDISPNAME>{escape(section)}</DSPDISPNAME>\n</DSPACCNAME>\n"
+                     " <PLAMT>\n  <PLSUBAMT></PLSUBAMT>\n  <BSMAINAMT></BSMAINAMT>\n</PLAMT>\n")
+        for name, paise in rows:
+            if not paise:
+                continue
+            parts.append(f" <BSNAME>\n  <DSPACCNAME>\n   <DSPDISPNAME>{escape(name)}</DSPDISPNAME>\n"
+                         f"</DSPACCNAME>\n</BSNAME>\n <BSAMT>\n  <BSSUBAMT>{paise / 100:.2f}</BSSUBAMT>\n"
+                         "  <BSMAINAMT></BSMAINAMT>\n</BSAMT>\n")
+    parts.append("</ENVELOPE>\n")
+    return "".join(parts).encode("utf-8")
+
+
+def _tb_line(name, debit_paise, credit_paise):
+    debit = f"{-debit_paise / 100:.2f}" if debit_paise else ""    # Tally exports debits as negative
+    credit = f"{credit_paise / 100:.2f}" if credit_paise else ""
+    return (f" <DSPACCNAME>\n  <DSPDISPNAME>{escape(name)}</DSPDISPNAME>\n</DSPACCNAME>\n"
+            f" <DSPACCINFO>\n  <DSPCLDRAMT>\n   <DSPCLDRAMTA>{debit}</DSPCLDRAMTA>\n  </DSPCLDRAMT>\n"
+            f"  <DSPCLCRAMT>\n   <DSPCLCRAMTA>{credit}</DSPCLCRAMTA>\n  </DSPCLCRAMT>\n</DSPACCINFO>\n")
+
+
+def trial_balance_xml(layout, from_text, to_text):
+    """Trial Balance for the range: each group's total line, then its ledgers' closing debit or credit."""
+    parts = ["<ENVELOPE>\n"]
+    for section, rows in range_totals(layout, from_text, to_text):
+        # expenses close in debit and incomes in credit, unless the total went the other way
+        sign = -1 if section in INCOME_NAMES else 1
+        balances = [(name, max(sign * paise, 0), max(-sign * paise, 0)) for name, paise in rows]
+        parts.append(_tb_line(section, sum(b[1] for b in balances), sum(b[2] for b in balances)))
+        parts.extend(_tb_line(*balance) for balance in balances)
+    parts.append("</ENVELOPE>\n")
+    return "".join(parts).encode("utf-8")
+
+
+def balance_sheet_xml(layout, from_text, to_text):
+    """Balance Sheet for the range: the ledgers dealt round-robin into BALANCE_SHEET_GROUPS."""
+    groups = {group: [] for group in BALANCE_SHEET_GROUPS}
+    rows = [row for _, section_rows in range_totals(layout, from_text, to_text) for row in section_rows]
+    for i, (name, paise) in enumerate(rows):
+        groups[BALANCE_SHEET_GROUPS[i % len(BALANCE_SHEET_GROUPS)]].append((name, abs(paise)))
+    parts = ["<ENVELOPE>\n"]
+    for group, group_rows in groups.items():
+        parts.append(_bs_line(group, main_paise=sum(paise for _, paise in group_rows)))
+        parts.extend(_bs_line(name, paise) for name, paise in group_rows)
+    parts.append("</ENVELOPE>\n")
+    return "".join(parts).encode("utf-8")
+
+
+STATEMENTS = {"Balance Sheet": balance_sheet_xml, "Trial Balance": trial_balance_xml}
+
+
+def ledger_list_xml(ledgers, since_alter_id=None):
+    """
+    SimpleLedgerList response for ledgers, a list of (name, alter_id);
+    only those altered after since_alter_id when given.
+    """
+    body = "".join(
+        f"<LEDGER><NAME>{escape(name)}</NAME><ALTERID>{alter_id}</ALTERID></LEDGER>"
+        for name, alter_id in ledgers
+        if since_alter_id is None or alter_id > since_alter_id
+    )
+    return f"<LEDGERLIST>{body}</LEDGERLIST>".encode("utf-8")
+
+
+def company_status_xml(server):
+    """VegaCompanyStatus response: company name and last voucher/master alteration IDs."""
+    return (f"<COMPANYSTATUS><COMPANY><NAME>{escape(server.company)}</NAME>"
+            f"<ALTVCHID>{server.alt_vch_id}</ALTVCHID>"
+            f"<ALTMSTID>{max((a for _, a in server.ledgers), default=0)}</ALTMSTID>"
+            f"</COMPANY></COMPANYSTATUS>").encode("utf-8")
+
+
+class TallyStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like Tally
+
+    def _send(self, body, content_type="text/xml; charset=utf-8"):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._send(b"<RESPONSE>TallyPrime Server is Running</RESPONSE>")
+
+    def do_POST(self):
+        request = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.request_count += 1
+        # A one-row company status costs Tally nothing; only reports get the latency
+        if self.server.latency and b"VegaCompanyStatus" not in request:
+            time.sleep(self.server.latency)
+        if b"SimpleLedgerList" in request:
+            since = ALTERED_SINCE.search(request)
+            self._send(ledger_list_xml(self.server.ledgers, int(since.group(1)) if since else None))
+        elif b"VegaCompanyStatus" in request:
+            self._send(company_status_xml(self.server))
+        else:
+            report = REPORT.search(request)
+            report = report.group(1).decode("utf-8") if report else "Profit and Loss"
+            self.server.report_requests[report] = self.server.report_requests.get(report, 0) + 1
+            if report not in STATEMENTS:
+                self.server.pandl_requests += 1
+            if self.server.periodic or report in STATEMENTS:
+                match = DATE_RANGE.search(request)
+                from_text, to_text = match.groups() if match else DEFAULT_RANGE
+                if self.server.day_latency:
+                    days = (datetime.strptime(to_text.decode(), "%Y%m%d")
+                            - datetime.strptime(from_text.decode(), "%Y%m%d")).days + 1
+                    time.sleep(self.server.day_latency * max(days, 0))
+                build = STATEMENTS.get(report, periodic_pandl_xml)
+                self._send(build(self.server.layout, from_text, to_text))
+            else:
+                self._send(self.server.pandl)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def add_ledgers(server, names):
+    """Simulate ledgers created in Tally: append them with fresh AlterIDs."""
+    next_id = max((a for _, a in server.ledgers), default=0) + 1
+    server.ledgers.extend((name, next_id + i) for i, name in enumerate(names))
+
+
+def alter_vouchers(server, pandl_file=None):
+    """Simulate vouchers entered in Tally: bump AltVchId, optionally serving a new P&L export."""
+    server.alt_vch_id += 1
+    if pandl_file is not None:
+        server.pandl = Path(pandl_file).read_bytes()
+
+
+def start_stub_server(port=0, latency=0.0, pandl_file=None, verbose=False, extra_ledgers=0,
+                      company="Vega Stub Company", periodic=False, day_latency=0.0):
+    """
+    Start the stub in a background thread.
+    Returns (server, url); call server.shutdown() when done. port=0 picks a free port.
+    extra_ledgers: synthetic ledgers added on top of those named in the P&L export.
+    periodic: compute each P&L for its date range (see module docstring), taking
+    day_latency seconds per day of the range on top of latency.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), TallyStubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.verbose = verbose
+    server.request_count = 0
+    server.pandl_requests = 0
+    server.report_requests = {}     # Tally report name -> requests served
+    server.company = company
+    server.alt_vch_id = 1
+    server.periodic = periodic
+    server.day_latency = day_latency
+    server.pandl = Path(pandl_file or DEFAULT_PANDL).read_bytes()
+    server.ledgers = [(name, i + 1) for i, name in enumerate(ledgers_from_pandl(server.pandl))]
+    server.layout = pandl_layout(server.pandl)
+    add_ledgers(server, [f"Synthetic Ledger {i}" for i in range(extra_ledgers)])
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--port", type=int, default=9000)
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds to wait before each response")
+    ap.add_argument("--pandl", help=f"P&L export to serve (default: {DEFAULT_PANDL})")
+    ap.add_argument("--ledgers", type=int, default=0, help="extra synthetic ledgers in the ledger list")
+    ap.add_argument("--periodic", action="store_true", help="compute each P&L for the requested date range")
+    ap.add_argument("--day-latency", type=float, default=0.0,
+                    help="with --periodic: extra seconds per day of the requested range")
+    args = ap.parse_args()
+
+    server, url = start_stub_server(args.port, args.latency, args.pandl, verbose=True,
+                                    extra_ledgers=args.ledgers, periodic=args.periodic,
+                                    day_latency=args.day_latency)
+    print(f"Tally stub listening on {url} (latency {args.latency}s). Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+# tally_xml_stream.py
+"""
+Streaming parser for Tally P&L exports.
+
+Files are read through a memory map: a clean UTF-8 export is fed to the
+parser as zero-copy slices of the map. Anything else is transcoded on the
+fly, chunk by chunk. That covers UTF-16/32, a declared legacy encoding,
+and stray bytes that aren't valid in the export's encoding (read as
+Windows-1252). The characters XML 1.0 forbids are dropped as well; Tally
+emits them raw or as &#4;-style references. The file is never held in
+memory or read twice, so peak memory doesn't grow with the export.
+"""
+import codecs
+import mmap
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import instrumentation as instr
+
+INCOME_SECTIONS = ("Direct Incomes", "Indirect Incomes")
+EXPENSE_SECTIONS = ("Direct Expenses", "Indirect Expenses")
+# P&L layout: section header -> side, amount tag -> side (None: the current section's)
+PANDL_SECTIONS = {**dict.fromkeys(INCOME_SECTIONS, "income"), **dict.fromkeys(EXPENSE_SECTIONS, "expense")}
+PANDL_AMOUNTS = {"BSSUBAMT": None}
+CHUNK_SIZE = 64 * 1024
+
+# Characters XML 1.0 forbids, raw or as decimal / hex character references
+_INVALID_REFS = r"&#(?:0*(?:[0-8]|1[1-2]|1[4-9]|2[0-9]|3[01])|[xX]0*(?:[0-8bBcCeEfF]|1[0-9a-fA-F]));"
+_INVALID_TEXT = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]|" + _INVALID_REFS)
+_INVALID_UTF8 = re.compile(b"[\x00-\x08\x0b\x0c\x0e-\x1f]|\xef\xbf[\xbe\xbf]|" + _INVALID_REFS.encode())
+_XML_DECL = re.compile(rb"\s*<\?xml[^>]*?encoding\s*=\s*[\"']([A-Za-z0-9._-]+)[\"']")
+_DECL_ENCODING = re.compile(r"^(\s*<\?xml[^>]*?encoding\s*=\s*)[\"'][^\"']*[\"']")
+_BOMS = ((codecs.BOM_UTF8, "utf-8"), (codecs.BOM_UTF32_LE, "utf-32-le"), (codecs.BOM_UTF32_BE, "utf-32-be"),
+         (codecs.BOM_UTF16_LE, "utf-16-le"), (codecs.BOM_UTF16_BE, "utf-16-be"))
+
+
+def _legacy_bytes(err):
+    """Decode error handler: bytes invalid in the export's encoding are read as Windows-1252."""
+    if not isinstance(err, UnicodeDecodeError):
+        raise err
+    return bytes(err.object[err.start:err.end]).decode("cp1252", errors="replace"), err.end
+
+
+codecs.register_error("tally-cp1252", _legacy_bytes)
+
+
+def detect_encoding(head):
+    """
+    (encoding, BOM length) of an export from its first bytes: a BOM, a
+    BOM-less UTF-16 '<', the XML declaration, else UTF-8.
+    """
+    head = bytes(head)
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding, len(bom)
+    if head[:2] == b"<\x00":
+        return "utf-16-le", 0
+    if head[:2] == b"\x00<":
+        return "utf-16-be", 0
+    m = _XML_DECL.match(head)
+    if m:
+        try:
+            return codecs.lookup(m.group(1).decode("ascii")).name, 0
+        except LookupError:
+            pass
+    return "utf-8", 0
+
+
+def _release(mm, start, length):
+    """Drop pages of the map already consumed from this process (they are re-read from the file if touched again)."""
+    if hasattr(mm, "madvise") and hasattr(mmap, "MADV_DONTNEED"):
+        mm.madvise(mmap.MADV_DONTNEED, start - start % mmap.PAGESIZE, length)
+
+
+def _is_clean_utf8(mm, chunk_size=CHUNK_SIZE):
+    """True if the map is valid UTF-8 without XML-invalid characters; checked a window at a time."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        for i in range(0, len(mm), chunk_size):
+            # the overlap catches a character reference cut by the window
+            if _INVALID_UTF8.search(mm, i, min(len(mm), i + chunk_size + 32)):
+                return False
+            decoder.decode(mm[i:i + chunk_size])
+            _release(mm, i, chunk_size)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def _transcode(chunks, encoding):
+    """
+    Decode byte chunks from encoding (stray bytes as Windows-1252), drop
+    XML-invalid characters and yield UTF-8, with the XML declaration saying so.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="tally-cp1252")
+    pending, declared, dropped = "", False, 0
+    for chunk in chunks:
+        text = pending + decoder.decode(chunk)
+        # A character reference split across chunks waits for the rest
+        cut = text.rfind("&", max(0, len(text) - 16))
+        if cut != -1 and ";" not in text[cut:]:
+            text, pending = text[:cut], text[cut:]
+        else:
+            pending = ""
+        if not declared and text.strip():
+            text = _DECL_ENCODING.sub(r'\1"UTF-8"', text, count=1)
+            declared = True
+        text, n = _INVALID_TEXT.subn("", text)
+        dropped += n
+        yield text.encode("utf-8")
+    text, n = _INVALID_TEXT.subn("", pending + decoder.decode(b"", final=True))
+    if text:
+        yield text.encode("utf-8")
+    if dropped + n:
+        instr.count("xml_chars_dropped", dropped + n)
+
+
+def _iter_file(path, chunk_size=CHUNK_SIZE):
+    """
+    Chunks of an export file through a memory map: zero-copy when it is clean
+    UTF-8, transcoded otherwise. Pages are released once consumed, so the
+    mapping doesn't grow the process however large the file.
+    """
+    chunk_size = max(mmap.PAGESIZE, chunk_size - chunk_size % mmap.PAGESIZE)
+    with open(path, "rb") as f:
+        if not f.seek(0, 2):
+            return          # mmap can't map an empty file
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    encoding, bom = detect_encoding(mm[:64])
+    if encoding in ("utf-8", "ascii") and _is_clean_utf8(mm, chunk_size):
+        # slices keep the map alive until the parser is done with them
+        view = memoryview(mm)
+        for i in range(0, len(view), chunk_size):
+            yield view[i:i + chunk_size]
+            _release(mm, i, chunk_size)
+        return
+    instr.count("xml_transcoded_files")
+    yield from _transcode(_read_map(mm, bom, chunk_size), encoding)
+
+
+def _read_map(mm, start, chunk_size):
+    for i in range(start, len(mm), chunk_size):
+        yield mm[i:i + chunk_size]
+        _release(mm, i, chunk_size)
+
+
+def _iter_chunks(source, chunk_size=CHUNK_SIZE):
+    """
+    Yield UTF-8 chunks from a path (memory-mapped), a binary file-like
+    object (e.g. requests' response.raw) or an iterable of bytes (e.g.
+    response.iter_content()); the latter two are transcoded and sanitized
+    as they arrive.
+    """
+    if isinstance(source, (str, Path)):
+        yield from _iter_file(source, chunk_size)
+        return
+    if hasattr(source, "read"):
+        raw = iter(lambda: source.read(chunk_size), b"")
+    else:
+        raw = (chunk for chunk in source if chunk)
+    first = next(raw, None)
+    if first is None:
+        return
+    encoding, bom = detect_encoding(first[:64])
+    yield from _transcode(_prepend(first[bom:], raw), encoding)
+
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+
+def iter_ledger_amounts(source, chunk_size=CHUNK_SIZE, signed=False, sections=None, amounts=None):
+    """
+    Stream a Tally P&L export and yield (section, ledger, amount) tuples,
+    section being "income" or "expense", amount always positive and non-zero.
+    With signed=True amounts keep their sign and zero lines are yielded too
+    (for adding exports together, see chunked_export).
+
+    DSPDISPNAME/BSSUBAMT pairs are consumed as they arrive and every finished
+    top-level element is dropped, so memory stays flat however large the export.
+    Same rules as automate.parse_tally_xml.
+
+    Other reports (report_defs) pass their own sections ({header name: side})
+    and amounts ({tag: side}). A tag with a side of its own (e.g. a Trial
+    Balance's closing debit / credit) is skipped while empty, so the ledger
+    waits for the tag that holds its amount.
+    """
+    sections = PANDL_SECTIONS if sections is None else sections
+    amounts = PANDL_AMOUNTS if amounts is None else amounts
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root = None
+    depth = 0
+    current_section = None
+    last_ledger = None
+
+    xml_bytes = 0
+    for chunk in _iter_chunks(source, chunk_size):
+        xml_bytes += len(chunk)
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = elem
+                depth += 1
+                continue
+
+            depth -= 1
+            tag = elem.tag.upper()
+
+            if tag == "DSPDISPNAME":
+                name_text = elem.text.strip() if elem.text else ""
+                if name_text in sections:
+                    current_section = sections[name_text]
+                    last_ledger = None
+                else:
+                    last_ledger = name_text  # ledger candidate
+
+            elif tag in amounts and last_ledger and (amounts[tag] or current_section):
+                amt_text = elem.text.strip() if elem.text else ""
+                if amt_text or not amounts[tag]:
+                    try:
+                        amt = float(amt_text)
+                    except ValueError:
+                        amt = 0.0
+                    side = amounts[tag] or current_section
+                    if signed:
+                        yield side, last_ledger, amt
+                    elif amt != 0:
+                        yield side, last_ledger, abs(amt)
+                    last_ledger = None
+
+            # Finished a direct child of <ENVELOPE>: drop everything parsed so far
+            if depth == 1 and root is not None:
+                root.clear()
+
+    parser.close()
+    instr.count("xml_bytes_parsed", xml_bytes)
+
+
+def parse_report_stream(source, sections, amounts, sides, chunk_size=CHUNK_SIZE):
+    """
+    Lines of any report declared by its sections and amount tags (see
+    iter_ledger_amounts): a list of (ledger, amount) per side, in the order of sides.
+    """
+    lines = {side: [] for side in sides}
+    for side, ledger, amt in iter_ledger_amounts(source, chunk_size, sections=sections, amounts=amounts):
+        lines[side].append((ledger, amt))
+    instr.count("ledgers_parsed", sum(map(len, lines.values())))
+    return tuple(lines[side] for side in sides)
+
+
+def parse_tally_xml_stream(source, chunk_size=CHUNK_SIZE):
+    """
+    Streaming equivalent of automate.parse_tally_xml.
+    source: path to the XML file, a binary file-like object or an iterable of bytes.
+    Returns (income, expense) lists of (ledger, amount).
+    """
+    income, expense = [], []
+    for section, ledger, amt in iter_ledger_amounts(source, chunk_size):
+        if section == "income":
+            income.append((ledger, amt))
+        else:
+            expense.append((ledger, amt))
+    instr.count("ledgers_parsed", len(income) + len(expense))
+    return income, expense
@@ -0,0 +1,204 @@
+# template_cache.py
+"""
+Compiled, cached representation of the xlsx templates.
+
+A template is compiled once into plain picklable data: the cells that carry
+a value or a style, a deduplicated style table, placeholder positions,
+merged ranges, column widths and the sheet extent. Compiled templates are
+pickled under output/.template_cache/, keyed by the file's location and
+sha256, so a template edit invalidates its entry automatically and
+same-named templates of different companies keep their own; an in-process memo
+keyed by (path, size, mtime) avoids even re-hashing on repeated use.
+
+Renderers register each style of the table once in the destination
+workbook and then assign styles to cells by index.
+"""
+import hashlib
+import os
+import pickle
+from copy import copy
+from io import BytesIO
+from pathlib import Path
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+
+base_dir = Path(__file__).parent.parent
+CACHE_DIR = base_dir / "output" / ".template_cache"
+PLACEHOLDER = "$$monthYear$$"
+CACHE_VERSION = 1
+
+_memo = {}
+
+
+class CompiledTemplate:
+    """Everything the renderers need from one template sheet."""
+
+    def __init__(self, name, sha256):
+        self.name = name
+        self.sha256 = sha256
+        self.title = "Sheet"
+        self.max_row = 1
+        self.max_col = 1
+        # Rows copy_sheet_to moves the write cursor by after copying this sheet.
+        # copy_sheet_to reuses max_row while walking merged ranges, so for a
+        # sheet with merges this is the bottom row of the last range visited
+        # and the next part overlaps the tail of this one. Reports have always
+        # been laid out that way (body row 1 lands on the header's last row).
+        self.advance = 1
+        self.cells = {}           # (row, col) -> (value, style_idx or None)
+        self.styles = []          # style_idx -> (font, border, fill, number_format, protection, alignment)
+        self.placeholders = []    # (row, col) whose value contains PLACEHOLDER
+        self.merges = []          # (min_col, min_row, max_col, max_row), in the sheet's iteration order
+        self.widths = {}          # col_idx -> width
+
+    def row(self, r):
+        """[(value, style_idx)] for columns 1..max_col of row r; (None, None) where empty."""
+        return [self.cells.get((r, c), (None, None)) for c in range(1, self.max_col + 1)]
+
+    def style_arrays(self, ws):
+        """
+        Register every style of the table in ws's workbook once and return
+        the matching StyleArrays, so cells can be styled by index:
+            cell._style = copy(arrays[style_idx])
+        """
+        arrays = []
+        for font, border, fill, number_format, protection, alignment in self.styles:
+            proto = WriteOnlyCell(ws)
+            proto.font = font
+            proto.border = border
+            proto.fill = fill
+            proto.number_format = number_format
+            proto.protection = protection
+            proto.alignment = alignment
+            arrays.append(proto._style)
+        return arrays
+
+    def to_workbook(self):
+        """A fresh, editable Workbook with the template's cells, styles, widths and merges."""
+        wb = Workbook()
+        ws = wb.active
+        ws.title = self.title
+        arrays = self.style_arrays(ws)
+        for (r, c), (value, style_idx) in self.cells.items():
+            cell = ws.cell(row=r, column=c, value=value)
+            if style_idx is not None:
+                cell._style = copy(arrays[style_idx])
+        for col_idx, width in self.widths.items():
+            ws.column_dimensions[get_column_letter(col_idx)].width = width
+        for min_col, min_row, max_col, max_row in self.merges:
+            ws.merge_cells(start_row=min_row, start_column=min_col, end_row=max_row, end_column=max_col)
+        return wb
+
+
+def compile_template(source, name=None, sha256=None):
+    """Compile the active sheet of source (path or bytes) into a CompiledTemplate."""
+    data = Path(source).read_bytes() if isinstance(source, (str, Path)) else bytes(source)
+    sha256 = sha256 or hashlib.sha256(data).hexdigest()
+    return compile_sheet(load_workbook(BytesIO(data)).active, name or str(source), sha256)
+
+
+def compile_sheet(ws, name="<memory>", sha256=None):
+    """
+    Compile an openpyxl worksheet (e.g. a body built in memory) into a
+    CompiledTemplate; nothing is cached.
+    """
+    tpl = CompiledTemplate(name, sha256)
+    tpl.title = ws.title
+    tpl.max_row, tpl.max_col = ws.max_row, ws.max_column
+
+    style_index = {}
+    for r in range(1, tpl.max_row + 1):
+        for c in range(1, tpl.max_col + 1):
+            cell = ws.cell(row=r, column=c)
+            style_idx = None
+            if cell.has_style:
+                key = tuple(cell._style)
+                if key not in style_index:
+                    style_index[key] = len(tpl.styles)
+                    tpl.styles.append((copy(cell.font), copy(cell.border), copy(cell.fill),
+                                       cell.number_format, copy(cell.protection), copy(cell.alignment)))
+                style_idx = style_index[key]
+            if cell.value is None and style_idx is None:
+                continue
+            tpl.cells[(r, c)] = (cell.value, style_idx)
+            if cell.value is not None and PLACEHOLDER in str(cell.value):
+                tpl.placeholders.append((r, c))
+
+    tpl.advance = tpl.max_row
+    for mr in ws.merged_cells.ranges:
+        tpl.merges.append(mr.bounds)
+        tpl.advance = mr.bounds[3]
+
+    for col_idx in range(1, tpl.max_col + 1):
+        dim = ws.column_dimensions.get(get_column_letter(col_idx))
+        if dim and dim.width is not None:
+            tpl.widths[col_idx] = dim.width
+    return tpl
+
+
+def _cache_prefix(path):
+    """<stem>-<hash of the resolved path>: one template location's entries in the cache."""
+    path = Path(path)
+    return f"{path.stem}-{hashlib.sha256(str(path.resolve()).encode('utf-8')).hexdigest()[:8]}"
+
+
+def _cache_file(path, sha256, cache_dir):
+    return Path(cache_dir) / f"{_cache_prefix(path)}-{sha256[:16]}-v{CACHE_VERSION}.pkl"
+
+
+def load_template(path, cache_dir=None):
+    """
+    CompiledTemplate for the template at path, from the in-process memo,
+    the on-disk cache, or compiled fresh (and cached) on a miss.
+    """
+    path = Path(path)
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    st = path.stat()
+    memo_key = (str(path.resolve()), st.st_size, st.st_mtime_ns, str(cache_dir))
+    if memo_key in _memo:
+        return _memo[memo_key]
+
+    data = path.read_bytes()
+    sha256 = hashlib.sha256(data).hexdigest()
+    cache_file = _cache_file(path, sha256, cache_dir)
+    tpl = None
+    if cache_file.exists():
+        try:
+            with open(cache_file, "rb") as f:
+                tpl = pickle.load(f)
+        except Exception:
+            tpl = None  # unreadable/stale entry: recompile below
+    if tpl is None:
+        tpl = compile_template(data, name=path.name, sha256=sha256)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # Drop entries for older versions of this template (same location only)
+        for old in cache_dir.glob(f"{_cache_prefix(path)}-*.pkl"):
+            if old != cache_file:
+                old.unlink(missing_ok=True)
+        tmp = cache_file.with_suffix(f".{os.getpid()}.tmp")  # processes may compile concurrently
+        with open(tmp, "wb") as f:
+            pickle.dump(tpl, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(cache_file)
+
+    _memo[memo_key] = tpl
+    return tpl
+
+
+def as_template(source, cache_dir=None):
+    """CompiledTemplate from a path (cached), raw bytes / binary file object (compiled), or a CompiledTemplate."""
+    if isinstance(source, CompiledTemplate):
+        return source
+    if isinstance(source, (str, Path)):
+        return load_template(source, cache_dir)
+    data = source.read() if hasattr(source, "read") else source
+    sha256 = hashlib.sha256(data).hexdigest()
+    memo_key = ("bytes", sha256)
+    if memo_key not in _memo:
+        _memo[memo_key] = compile_template(data, name="<memory>", sha256=sha256)
+    return _memo[memo_key]
+
+
+def clear_memo():
+    _memo.clear()
@@ -0,0 +1,720 @@
+# vega_service.py
+"""
+Resident VEGA service: report jobs over a local HTTP API (or a file-drop
+inbox) instead of one cold `automate.py` process per report.
+
+Each company gets a pool of worker processes that stay up between jobs and
+keep their state warm: the Tally keep-alive session, the compiled templates,
+the mapping dict (re-synced from Tally at most every SYNC_INTERVAL seconds,
+by one worker of the company while the others wait and reuse its result;
+ledger_mapping.xlsx edits picked up on every job) and the response cache.
+A job then costs the Tally fetch plus the render.
+
+    python vega_service.py serve --tally-url http://localhost:9000 --workers 2
+    python vega_service.py serve --companies companies.json --inbox ../output/service/inbox
+    python vega_service.py submit --from 01-04-2025 --to 30-04-2025 --wait
+    python vega_service.py status [JOB_ID]
+
+HTTP API (JSON; the service listens on 127.0.0.1 only):
+
+    POST /jobs                 {"from": "01-04-2025", "to": "30-04-2025", "company": "Vega Traders",
+                                "format": "xlsx", "renderer": "classic", "writer": "openpyxl", "chunk": "month",
+                                "refresh": false, "offline": false, "aggregate_duplicates": false,
+                                "unmapped_report": false, "compare": false}
+                                                               (or a list of these) -> 202
+    GET  /jobs                 all jobs, newest first
+    GET  /jobs/<id>            one job: status queued/running/done/failed, timings, reports
+    GET  /jobs/<id>/events     status changes as JSON lines until the job finishes
+    GET  /jobs/<id>/log        the job's console output
+    GET  /jobs/<id>/files/<n>  a file the job wrote (final_PnL_<period>.xlsx/.html/.pdf,
+                               comparison_<period>.xlsx, ...)
+    GET  /health
+
+Inbox: every *.json dropped there (one job, a list, or {"jobs": [...]}) is
+submitted; when its jobs finish the file moves to done/ (or failed/) with a
+<name>.result.json next to it. Each job writes to <service dir>/jobs/<id>/.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext, redirect_stdout
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from automate import base_dir, mapping_file, parse_period
+from multi_company import company_slug, configure_company, load_companies
+from excel_writers import WRITERS, writer_available
+from print_renderer import pdf_available
+
+SERVICE_DIR = base_dir / "output" / "service"
+HOST = "127.0.0.1"
+PORT = 8765
+SYNC_INTERVAL = 60      # seconds a company's mapping is reused before asking Tally for altered ledgers
+INBOX_POLL = 1.0        # seconds between inbox scans
+JOB_HISTORY = 1000      # finished jobs kept in memory (their folders stay on disk)
+FORMATS = ("xlsx", "html", "pdf")
+RENDERERS = ("classic", "stream")   # for xlsx; html/pdf use print_renderer
+CONTENT_TYPES = {".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                 ".html": "text/html; charset=utf-8", ".pdf": "application/pdf"}
+LOG_NAME = "vega_service.log"
+
+
+# ==========================================================
+# Worker side: runs in each company's pool processes
+# ==========================================================
+_warm = {}   # this worker process's company, templates and mapping
+
+
+def _init_worker(company, timeout=None, retries=None, started=None, sync_lock=None, synced_at=None):
+    """
+    Pool initializer: configure the company and warm templates, Tally session
+    and mapping. started: queue on which run_job announces the jobs it picks up.
+    sync_lock / synced_at: shared by the company's workers (a lock and a
+    multiprocessing Value holding the time.time() of the last sync), so the
+    ledgers are synced once per company rather than once per worker.
+    """
+    output_dir = Path(company["output_dir"])
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(output_dir / LOG_NAME, "a", encoding="utf-8") as log, redirect_stdout(log):
+        print(f"\n=== worker {os.getpid()} for {company['name']} ({company['tally_url']}) ===")
+        configure_company(company, timeout, retries)
+        import tally_client
+
+        _warm.update(company=company, started=started, store=None, mapping=None, synced=None,
+                     sync_lock=sync_lock, synced_at=synced_at)
+        _templates()
+        if tally_client.is_reachable():
+            _mapping_dict()
+        else:
+            print("⚠️ Tally not reachable; the mapping is synced on the first job.")
+
+
+def _ping():
+    return os.getpid()
+
+
+def _templates():
+    """{"header", "body", "footer"}: compiled templates (load_template only re-reads edited files)."""
+    import automate
+    from template_cache import load_template
+
+    paths = _warm["company"]["templates"]
+    return {
+        "body": load_template(paths.get("body", automate.template_file)),
+        "header": load_template(paths.get("header", automate.header_file)),
+        "footer": load_template(paths.get("footer", automate.footer_file)),
+    }
+
+
+def _use_store(store, synced):
+    if _warm["store"] is not None:
+        _warm["store"].close()
+    _warm.update(store=store, mapping=store.as_dict(), synced=synced)
+
+
+def _mapping_dict(offline=False):
+    """
+    The warm mapping dict. Ledgers altered in Tally are synced at most every
+    SYNC_INTERVAL seconds (never when offline), by one worker of the company at
+    a time: a worker that finds a sibling's sync fresh reopens the mapping it
+    wrote instead. xlsx edits are picked up on every call.
+    """
+    import instrumentation as instr
+    from ledger_sync import open_local_mapping, sync_ledgers_from_tally
+
+    # wall-clock time: it is compared across the company's worker processes
+    now = time.time()
+    if not offline and (_warm["synced"] is None or now - _warm["synced"] >= SYNC_INTERVAL):
+        shared = _warm.get("synced_at")
+        with _warm.get("sync_lock") or nullcontext():
+            if shared is not None and time.time() - shared.value < SYNC_INTERVAL:
+                _use_store(open_local_mapping(), shared.value)
+                instr.count("mappings_loaded", len(_warm["mapping"]))
+                return _warm["mapping"]
+            store = sync_ledgers_from_tally()
+            if store is not None:
+                _use_store(store, now)
+                if shared is not None:
+                    shared.value = now
+                instr.count("mappings_loaded", len(_warm["mapping"]))
+                return _warm["mapping"]
+    if _warm["store"] is None:
+        _warm["store"] = open_local_mapping()
+        _warm["mapping"] = _warm["store"].as_dict()
+    elif _warm["store"].refresh():
+        print("✅ ledger_mapping.xlsx edited; mapping reloaded.")
+        _warm["mapping"] = _warm["store"].as_dict()
+    return _warm["mapping"]
+
+
+def run_job(job):
+    """
+    Worker: fetch, translate and render one job into job["dir"] with this
+    process's warm state. Returns a result dict (never raises).
+    """
+    import automate
+    import pnl_history
+    from chunked_export import fetch_pandl_chunked
+    from tally_pandl_export import fetch_pandl_xml
+
+    job_dir = Path(job["dir"])
+    job_dir.mkdir(parents=True, exist_ok=True)
+    result = {"pid": os.getpid(), "started": datetime.now().isoformat(timespec="seconds"),
+              "reports": [], "error": None, "timings": {}}
+    if _warm.get("started") is not None:
+        _warm["started"].put((job["id"], result["started"]))
+    timings = result["timings"]
+    t0 = time.perf_counter()
+    with open(job_dir / "job.log", "a", encoding="utf-8") as log, redirect_stdout(log):
+        try:
+            from_date = datetime.strptime(job["from"], "%d-%m-%Y")
+            to_date = datetime.strptime(job["to"], "%d-%m-%Y")
+            label = automate.period_label(from_date, to_date)
+            export_file = job_dir / f"PandL_{label}.xml"
+            with automate._timed(timings, "fetch"):
+                if job["chunk"]:
+                    fetched = fetch_pandl_chunked(from_date, to_date, job["chunk"], export_file,
+                                                  job["refresh"], job["offline"])
+                else:
+                    fetched = fetch_pandl_xml(from_date, to_date, export_file, job["refresh"], job["offline"])
+            if fetched is None:
+                raise RuntimeError("Profit & Loss export failed")
+            with automate._timed(timings, "mapping"):
+                mapping_dict = _mapping_dict(job["offline"])
+                templates = _templates()
+
+            unmapped = None
+            if job["unmapped_report"]:
+                from ledger_frame import UnmappedReport
+                unmapped = UnmappedReport()
+            with pnl_history.open_history() or nullcontext() as history:
+                final_file = automate._render_period(from_date, to_date, export_file, mapping_dict, templates,
+                                                     job_dir, timings,
+                                                     job["renderer"] if job["format"] == "xlsx" else job["format"],
+                                                     job["aggregate_duplicates"], unmapped, history, job["compare"],
+                                                     job["writer"])
+            result["reports"].append(final_file.name)
+            if job["compare"]:
+                result["reports"].append(f"comparison_{label}.xlsx")
+            if unmapped is not None:
+                from mapping_index import suggest_local
+                result["reports"].append(unmapped.write(job_dir / "unmapped_ledgers.xlsx", suggest_local).name)
+            print(f"✅ {final_file.name} written")
+        except Exception as e:
+            traceback.print_exc()
+            result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - t0
+    return result
+
+
+# ==========================================================
+# Service side: jobs, pools, inbox
+# ==========================================================
+def default_company(tally_url=None):
+    """The repository's own company: config/ mapping and templates, exports/, output/."""
+    import tally_client
+
+    return {
+        "name": "default",
+        "slug": "default",
+        "tally_url": tally_url or tally_client.TALLY_URL,
+        "mapping_file": str(mapping_file),
+        "templates": {},
+        "exports_dir": str(base_dir / "exports"),
+        "output_dir": str(base_dir / "output"),
+        "periods": [],
+    }
+
+
+def _flag(spec, name):
+    value = spec.get(name, False)
+    if not isinstance(value, bool):
+        raise ValueError(f"'{name}' must be true or false")
+    return value
+
+
+class VegaService:
+    """Report jobs run on per-company pools of warm worker processes (thread-safe)."""
+
+    def __init__(self, companies, workers=1, service_dir=SERVICE_DIR, timeout=None, retries=None):
+        self.companies = {c["slug"]: c for c in companies}
+        self.workers = workers
+        self.service_dir = Path(service_dir)
+        self.jobs = {}
+        self._drops = {}
+        self._pools = {}
+        self._broken = set()
+        self._changed = threading.Condition()
+        # spawn: workers start clean instead of inheriting this process's sessions and threads
+        self._ctx = multiprocessing.get_context("spawn")
+        self._started = self._ctx.SimpleQueue()
+        self._init_args = (timeout, retries, self._started)
+        # when each company's ledgers were last synced, shared by its workers (see _init_worker)
+        self._synced_at = {slug: self._ctx.Value("d", 0.0, lock=False) for slug in self.companies}
+        for slug in self.companies:
+            self._pools[slug] = self._new_pool(slug)
+        threading.Thread(target=self._watch_started, daemon=True).start()
+
+    def _new_pool(self, slug):
+        # a fresh sync lock per pool: a worker that died mid-sync can't leave the new pool locked out
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=self._ctx, initializer=_init_worker,
+                                   initargs=(self.companies[slug], *self._init_args, self._ctx.Lock(),
+                                             self._synced_at[slug]))
+
+    def _watch_started(self):
+        """Mark jobs running as workers pick them up (queued jobs wait in the pool's call queue)."""
+        while True:
+            item = self._started.get()
+            if item is None:
+                return
+            job_id, started = item
+            with self._changed:
+                job = self.jobs.get(job_id)
+                if job is not None and job["status"] == "queued":
+                    job.update(status="running", started=started)
+                    self._changed.notify_all()
+
+    def warm_up(self):
+        """Start every worker process and wait for their initializers (templates, session, mapping)."""
+        futures = [pool.submit(_ping) for pool in self._pools.values() for _ in range(self.workers)]
+        return sorted({f.result() for f in futures})
+
+    def close(self):
+        for pool in self._pools.values():
+            pool.shutdown(wait=True, cancel_futures=True)
+        self._started.put(None)
+
+    def _company(self, spec):
+        name = spec.get("company")
+        if name is None:
+            if len(self.companies) == 1:
+                return next(iter(self.companies))
+            raise ValueError(f"'company' is required (one of: {', '.join(sorted(self.companies))})")
+        slug = company_slug(str(name))
+        if slug not in self.companies:
+            raise ValueError(f"Unknown company '{name}'")
+        return slug
+
+    def _job_spec(self, spec):
+        """Validated job fields from a request body; raises ValueError."""
+        if not isinstance(spec, dict):
+            raise ValueError("A job is a JSON object")
+        try:
+            from_date, to_date = parse_period(f"{spec['from']}:{spec['to']}")
+        except KeyError as e:
+            raise ValueError(f"Missing {e}") from None
+        except argparse.ArgumentTypeError as e:
+            raise ValueError(str(e)) from None
+        job = {
+            "company": self._company(spec),
+            "from": f"{from_date:%d-%m-%Y}",
+            "to": f"{to_date:%d-%m-%Y}",
+            "format": spec.get("format", "xlsx"),
+            "renderer": spec.get("renderer", "classic"),
+            "writer": spec.get("writer", "openpyxl"),
+            "chunk": spec.get("chunk"),
+            "refresh": _flag(spec, "refresh"),
+            "offline": _flag(spec, "offline"),
+            "aggregate_duplicates": _flag(spec, "aggregate_duplicates"),
+            "unmapped_report": _flag(spec, "unmapped_report"),
+            "compare": _flag(spec, "compare"),
+        }
+        if job["format"] not in FORMATS:
+            raise ValueError(f"'format' must be one of: {', '.join(FORMATS)}")
+        if job["format"] == "pdf" and not pdf_available():
+            raise ValueError("'pdf' output needs WeasyPrint on the service machine (pip install weasyprint)")
+        if job["renderer"] not in RENDERERS:
+            raise ValueError(f"'renderer' must be one of: {', '.join(RENDERERS)}")
+        if job["writer"] not in WRITERS:
+            raise ValueError(f"'writer' must be one of: {', '.join(WRITERS)}")
+        if not writer_available(job["writer"]):
+            raise ValueError(f"The '{job['writer']}' writer needs XlsxWriter on the service machine "
+                             "(pip install xlsxwriter)")
+        if job["chunk"] not in (None, "month", "quarter"):
+            raise ValueError("'chunk' must be month or quarter")
+        if job["offline"] and job["refresh"]:
+            raise ValueError("'offline' can't be combined with 'refresh'")
+        return job
+
+    def submit(self, specs, source="http"):
+        """Validate and queue one job spec or a list of them; returns their job dicts (all or none queued)."""
+        specs = specs if isinstance(specs, list) else [specs]
+        if not specs:
+            raise ValueError("No jobs given")
+        jobs = [self._job_spec(spec) for spec in specs]
+        submitted = []
+        for job in jobs:
+            job_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+            job.update(id=job_id, source=source, status="queued", dir=str(self.service_dir / "jobs" / job_id),
+                       submitted=datetime.now().isoformat(timespec="seconds"), started=None, finished=None,
+                       seconds=None, reports=[], error=None, timings={})
+            with self._changed:
+                self.jobs[job_id] = job
+            fut = self._pools[job["company"]].submit(run_job, dict(job))
+            fut.add_done_callback(lambda f, job_id=job_id: self._finish(job_id, f))
+            submitted.append(self.get(job_id))
+        return submitted
+
+    def _finish(self, job_id, fut):
+        crashed = False
+        try:
+            result = fut.result()
+        except BrokenProcessPool as e:
+            crashed = True
+            result = {"error": f"worker crashed: {e}"}
+        except BaseException as e:  # cancelled at shutdown
+            result = {"error": f"{type(e).__name__}: {e}"}
+        with self._changed:
+            job = self.jobs[job_id]
+            job.update(result)
+            job["status"] = "failed" if job["error"] else "done"
+            job["finished"] = datetime.now().isoformat(timespec="seconds")
+            self._prune()
+            self._changed.notify_all()
+        if crashed:
+            self._restart_pool(job["company"])
+        Path(job["dir"]).mkdir(parents=True, exist_ok=True)
+        (Path(job["dir"]) / "job.json").write_text(json.dumps(self.get(job_id), indent=2), encoding="utf-8")
+        self._drop_finished(job_id)
+
+    def _restart_pool(self, slug):
+        """Replace a pool whose worker died (every job queued on it fails with it)."""
+        with self._changed:
+            if self._pools[slug] in self._broken:
+                return
+            self._broken.add(self._pools[slug])
+            self._pools[slug] = self._new_pool(slug)
+        print(f"⚠️ Worker pool for {self.companies[slug]['name']} restarted.")
+
+    def _prune(self):
+        finished = [i for i, j in self.jobs.items() if j["status"] in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id):
+        """A snapshot of the job (None if unknown)."""
+        with self._changed:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def list(self):
+        with self._changed:
+            ids = list(self.jobs)
+        return [job for job in (self.get(i) for i in reversed(ids)) if job is not None]
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finishes or timeout passes; returns its snapshot."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.jobs.get(job_id, {}).get("status") in (None, "done", "failed"),
+                                   timeout)
+        return self.get(job_id)
+
+    def events(self, job_id):
+        """Yield the job's snapshot each time its status changes, ending with done/failed."""
+        last = None
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self.jobs.get(job_id, {}).get("status") != last)
+            job = self.get(job_id)
+            if job is None:
+                return
+            last = job["status"]
+            yield job
+            if last in ("done", "failed"):
+                return
+
+    # --- file-drop inbox ---
+    def watch_inbox(self, inbox, stop, poll=INBOX_POLL):
+        """Submit every *.json dropped into inbox until stop (a threading.Event) is set."""
+        inbox = Path(inbox)
+        for sub in ("accepted", "done", "failed"):
+            (inbox / sub).mkdir(parents=True, exist_ok=True)
+        while not stop.is_set():
+            for path in sorted(inbox.glob("*.json"), key=lambda p: p.stat().st_mtime):
+                self._accept_drop(inbox, path)
+            stop.wait(poll)
+
+    def _accept_drop(self, inbox, path):
+        accepted = inbox / "accepted" / path.name
+        try:
+            os.replace(path, accepted)   # claim the file before reading it
+            with open(accepted, encoding="utf-8") as f:
+                specs = json.load(f)
+            if isinstance(specs, dict) and "jobs" in specs:
+                specs = specs["jobs"]
+            with self._changed:
+                # register before submitting: a fast job may finish before submit() returns
+                self._drops[accepted] = pending = {"ids": [], "left": None}
+            jobs = self.submit(specs, source=f"inbox:{path.name}")
+        except (OSError, ValueError) as e:
+            with self._changed:
+                self._drops.pop(accepted, None)
+            if accepted.exists():
+                shutil.move(str(accepted), str(inbox / "failed" / path.name))
+                (inbox / "failed" / f"{path.stem}.result.json").write_text(
+                    json.dumps({"error": str(e)}, indent=2), encoding="utf-8")
+            print(f"❌ {path.name}: {e}")
+            return
+        with self._changed:
+            pending["ids"] = [job["id"] for job in jobs]
+            pending["left"] = {i for i in pending["ids"]
+                               if self.jobs.get(i, {}).get("status") not in ("done", "failed")}
+        print(f"📥 {path.name}: {len(jobs)} jobs queued")
+        if not pending["left"]:
+            self._complete_drop(accepted)
+
+    def _drop_finished(self, job_id):
+        done = []
+        with self._changed:
+            for path, pending in self._drops.items():
+                if pending["left"] and job_id in pending["left"]:
+                    pending["left"].discard(job_id)
+                    if not pending["left"]:
+                        done.append(path)
+        for path in done:
+            self._complete_drop(path)
+
+    def _complete_drop(self, accepted):
+        with self._changed:
+            pending = self._drops.pop(accepted, None)
+        if pending is None:
+            return
+        jobs = [self.get(i) or {"id": i} for i in pending["ids"]]
+        folder = "failed" if any(job.get("error") for job in jobs) else "done"
+        target = accepted.parent.parent / folder
+        shutil.move(str(accepted), str(target / accepted.name))
+        (target / f"{accepted.stem}.result.json").write_text(json.dumps(jobs, indent=2), encoding="utf-8")
+
+
+# ==========================================================
+# HTTP API
+# ==========================================================
+JOB_PATH = re.compile(r"^/jobs/([\w-]+)(?:/(events|log|files/([^/]+)))?$")
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    def _send_json(self, obj, status=200):
+        body = json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_file(self, path, content_type):
+        body = Path(path).read_bytes()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == "/health":
+            jobs = service.list()
+            return self._send_json({
+                "status": "ok",
+                "companies": [c["name"] for c in service.companies.values()],
+                "workers": service.workers,
+                "jobs": {s: sum(j["status"] == s for j in jobs) for s in ("queued", "running", "done", "failed")},
+            })
+        if self.path == "/jobs":
+            return self._send_json(service.list())
+        match = JOB_PATH.match(self.path)
+        job = service.get(match.group(1)) if match else None
+        if job is None:
+            return self._send_json({"error": "not found"}, 404)
+        if match.group(2) is None:
+            return self._send_json(job)
+        if match.group(2) == "events":
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()   # HTTP/1.0: the stream ends when the connection closes
+            for snapshot in service.events(job["id"]):
+                self.wfile.write(json.dumps(snapshot, ensure_ascii=False).encode("utf-8") + b"\n")
+                self.wfile.flush()
+            return
+        job_dir = Path(job["dir"])
+        if match.group(2) == "log":
+            if not (job_dir / "job.log").exists():
+                return self._send_json({"error": "no log yet"}, 404)
+            return self._send_file(job_dir / "job.log", "text/plain; charset=utf-8")
+        name = match.group(3)
+        if name not in job["reports"] or not (job_dir / name).exists():
+            return self._send_json({"error": "not found"}, 404)
+        return self._send_file(job_dir / name, CONTENT_TYPES.get(Path(name).suffix, "application/octet-stream"))
+
+    def do_POST(self):
+        if self.path != "/jobs":
+            return self._send_json({"error": "not found"}, 404)
+        try:
+            specs = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+            jobs = self.server.service.submit(specs)
+        except ValueError as e:   # includes malformed JSON
+            return self._send_json({"error": str(e)}, 400)
+        self._send_json(jobs if isinstance(specs, list) else jobs[0], 202)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def start_service(companies, port=0, workers=1, service_dir=SERVICE_DIR, inbox=None, timeout=None,
+                  retries=None, verbose=False):
+    """
+    Start the pools (waiting for their workers to warm up), the HTTP API and
+    the optional inbox watcher in background threads.
+    Returns (server, url); call stop_service(server) when done. port=0 picks a free port.
+    """
+    service = VegaService(companies, workers, service_dir, timeout, retries)
+    service.warm_up()
+    server = ThreadingHTTPServer((HOST, port), ServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    server.stop_inbox = threading.Event()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    if inbox is not None:
+        threading.Thread(target=service.watch_inbox, args=(inbox, server.stop_inbox), daemon=True).start()
+    return server, f"http://{HOST}:{server.server_address[1]}"
+
+
+def stop_service(server):
+    server.stop_inbox.set()
+    server.shutdown()
+    server.service.close()
+
+
+# ==========================================================
+# CLI
+# ==========================================================
+def _print_job(job):
+    status = {"queued": "⏳", "running": "⚙️", "done": "✅", "failed": "❌"}.get(job["status"], "•")
+    line = f"{status} {job['id']}  {job['company']}  {job['from']} to {job['to']}  {job['status']}"
+    if job["seconds"] is not None:
+        line += f" in {job['seconds']:.2f}s"
+    print(line)
+    if job["error"]:
+        print(f"   {job['error']}")
+    for name in job["reports"]:
+        print(f"   → {Path(job['dir']) / name}")
+
+
+def serve(args):
+    if args.companies:
+        companies, _ = load_companies(args.companies)
+    else:
+        companies = [default_company(args.tally_url)]
+    if not companies:
+        print("No companies configured.")
+        raise SystemExit(1)
+    print(f"Starting {args.workers} worker(s) for {len(companies)} company(ies) ...")
+    t0 = time.perf_counter()
+    server, url = start_service(companies, args.port, args.workers, args.service_dir, args.inbox,
+                                args.timeout, args.retries, verbose=args.verbose)
+    print(f"✅ VEGA service warm in {time.perf_counter() - t0:.1f}s, listening on {url}")
+    if args.inbox:
+        print(f"📥 Watching {args.inbox} for job files")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Stopping (running jobs finish first) ...")
+        stop_service(server)
+
+
+def submit(args):
+    import requests
+
+    spec = {"from": args.from_date, "to": args.to_date, "format": args.format, "renderer": args.renderer,
+            "writer": args.writer, "refresh": args.refresh, "offline": args.offline,
+            "aggregate_duplicates": args.aggregate_duplicates, "unmapped_report": args.unmapped_report,
+            "compare": args.compare}
+    if args.company:
+        spec["company"] = args.company
+    if args.chunk:
+        spec["chunk"] = args.chunk
+    res = requests.post(f"{args.url}/jobs", json=spec, timeout=30)
+    if res.status_code != 202:
+        print(f"❌ {res.json().get('error', res.text)}")
+        raise SystemExit(1)
+    job = res.json()
+    _print_job(job)
+    if not args.wait:
+        return
+    with requests.get(f"{args.url}/jobs/{job['id']}/events", stream=True, timeout=None) as events:
+        for line in events.iter_lines():
+            if line:
+                job = json.loads(line)
+                _print_job(job)
+    if job["status"] != "done":
+        raise SystemExit(1)
+
+
+def status(args):
+    import requests
+
+    path = f"/jobs/{args.job_id}" if args.job_id else "/jobs"
+    res = requests.get(f"{args.url}{path}", timeout=30)
+    if res.status_code != 200:
+        print(f"❌ {res.json().get('error', res.text)}")
+        raise SystemExit(1)
+    for job in (res.json() if isinstance(res.json(), list) else [res.json()]):
+        _print_job(job)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("serve", help="run the service")
+    p.add_argument("--port", type=int, default=PORT)
+    p.add_argument("--workers", type=int, default=1, help="warm worker processes per company")
+    p.add_argument("--companies", help="companies file (see multi_company.py); default: this repository's company")
+    p.add_argument("--tally-url", help="Tally HTTP server for the default company")
+    p.add_argument("--inbox", help="folder watched for *.json job files")
+    p.add_argument("--service-dir", default=str(SERVICE_DIR), help="where job folders are written")
+    p.add_argument("--timeout", type=float, help="seconds to wait for a Tally response")
+    p.add_argument("--retries", type=int, help="retries on connection errors / 5xx")
+    p.add_argument("--verbose", action="store_true", help="log every HTTP request")
+    p.set_defaults(func=serve)
+
+    p = sub.add_parser("submit", help="queue a report job")
+    p.add_argument("--from", dest="from_date", required=True, help="DD-MM-YYYY")
+    p.add_argument("--to", dest="to_date", required=True, help="DD-MM-YYYY")
+    p.add_argument("--company", help="company name (required when the service has several)")
+    p.add_argument("--format", choices=FORMATS, default="xlsx")
+    p.add_argument("--renderer", choices=RENDERERS, default="classic")
+    p.add_argument("--writer", choices=list(WRITERS), default="openpyxl")
+    p.add_argument("--chunk", choices=["month", "quarter"])
+    p.add_argument("--refresh", action="store_true")
+    p.add_argument("--offline", action="store_true")
+    p.add_argument("--aggregate-duplicates", action="store_true")
+    p.add_argument("--unmapped-report", action="store_true")
+    p.add_argument("--compare", action="store_true", help="also write comparison_<period>.xlsx from the P&L history")
+    p.add_argument("--wait", action="store_true", help="stream the job's status until it finishes")
+
+    p.add_argument("--url", default=f"http://{HOST}:{PORT}", help="service address")
+    p.set_defaults(func=submit)
+
+    p = sub.add_parser("status", help="show one job or all jobs")
+    p.add_argument("job_id", nargs="?")
+    p.add_argument("--url", default=f"http://{HOST}:{PORT}", help="service address")
+    p.set_defaults(func=status)
+    args = ap.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()